@@ -13,8 +13,7 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-import copy
-import json
+import threading
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -24,14 +23,40 @@ config.register_opts()
 
 from mistral.db.v2 import api as db_v2_api
 from mistral import exceptions as exc
+from mistral.rpc import clients as rpc_clients
 from mistral.workflow import utils as wf_utils
 from mistral_lib import actions as mistral_lib
 
+from st2mistral.utils import batch
+from st2mistral.utils import cache
+from st2mistral.utils import circuit
+from st2mistral.utils import concurrency
 from st2mistral.utils import http
+from st2mistral.utils import idempotency
+from st2mistral.utils import jsonutils
+from st2mistral.utils import logutils
+from st2mistral.utils import redact
+from st2mistral.utils import results
+from st2mistral.utils import retry
+from st2mistral.utils import spool
 
 
 LOG = logging.getLogger(__name__)
 
+# The name of a task execution does not change. The TTL only bounds how long
+# the names of the tasks which are done are kept.
+TASK_CACHE_TTL_SEC = 600
+
+# The lease of a spooled execution covers the retries of the dispatch so
+# the execution is not dispatched twice by the senders of the spool.
+SPOOL_LEASE_MARGIN_SEC = 60
+
+_TASK_NAMES = None
+_TASK_NAMES_LOCK = threading.Lock()
+
+_SENDER = None
+_SENDER_LOCK = threading.Lock()
+
 
 def _get_execution(execution_id, version='v2'):
     methods = {
@@ -44,6 +69,135 @@ def _get_execution(execution_id, version='v2'):
         return None
 
 
+def _get_task_name(task_id):
+    """Return the name of the task execution.
+
+    The names are cached so the items of a with-items task do not look up
+    the same task execution in the database for each dispatch.
+    """
+    global _TASK_NAMES
+
+    with _TASK_NAMES_LOCK:
+        if _TASK_NAMES is None:
+            _TASK_NAMES = cache.TTLCache(
+                'task_execution',
+                max_size=cfg.CONF.st2.action_task_cache_size,
+                ttl=TASK_CACHE_TTL_SEC
+            )
+
+    name = _TASK_NAMES.get(task_id)
+
+    if name is None:
+        name = db_v2_api.get_task_execution(task_id).name
+        _TASK_NAMES.set(task_id, name)
+
+    return name
+
+
+def reset_task_names():
+    global _TASK_NAMES
+
+    with _TASK_NAMES_LOCK:
+        _TASK_NAMES = None
+
+
+def _get_root_execution_id(st2_context, default=None):
+    """Return the id of the root st2 execution of the workflow.
+
+    The st2 context of the nested workflows holds the context of each
+    parent up to the root execution.
+    """
+    parent = st2_context.get('parent')
+
+    while isinstance(parent, dict) and isinstance(parent.get('parent'), dict):
+        parent = parent['parent']
+
+    if isinstance(parent, dict) and parent.get('execution_id'):
+        return parent['execution_id']
+
+    return default
+
+
+def _get_sender():
+    """Return the sender of the spooled executions, None if disabled.
+
+    The senders are started once per process by the first execution run
+    by the process, which only the executors run. The executions spooled
+    before a restart are dispatched then, or once the plugin is loaded if
+    action_spool_start_on_load is set for the executors.
+    """
+    global _SENDER
+
+    path = cfg.CONF.st2.action_spool_path
+
+    if not path:
+        return None
+
+    with _SENDER_LOCK:
+        if _SENDER is None or _SENDER.spool.path != path:
+            policy = retry.RetryPolicy(
+                deadline_msec=cfg.CONF.st2.action_retry_stop_max_msec
+            )
+
+            _SENDER = spool.Sender(
+                spool.Spool('st2.action', path),
+                _send_spooled,
+                num_senders=cfg.CONF.st2.action_spool_senders,
+                max_attempts=cfg.CONF.st2.action_spool_max_attempts,
+                lease_sec=(
+                    policy.deadline + policy.read_timeout +
+                    SPOOL_LEASE_MARGIN_SEC
+                )
+            )
+
+        sender = _SENDER
+
+    sender.start()
+
+    return sender
+
+
+def _send_spooled(item):
+    """Dispatch the spooled execution and report an error to the engine.
+
+    The result of an execution dispatched is reported by st2 with the
+    callback. The error of an execution which cannot be dispatched is
+    reported to the engine as the error of the action execution.
+    """
+    error = item.get('error')
+    action_ex_id = item['action_context']['action_execution_id']
+
+    if error is None:
+        action = St2Action(
+            item['ref'], item['parameters'], item['st2_context']
+        )
+
+        try:
+            result = action.dispatch(item['action_context'])
+        except exc.ActionException as e:
+            result = wf_utils.Result(error='%s' % e)
+
+        if not isinstance(result, wf_utils.Result):
+            return None
+
+        error = result.error
+
+    try:
+        rpc_clients.get_engine_client().on_action_complete(
+            action_ex_id, wf_utils.Result(error=error)
+        )
+    except Exception as e:
+        LOG.warning(
+            'Failed to report the error of the spooled action execution %s '
+            'to the engine: %s', action_ex_id, e
+        )
+
+        # The error is kept so the execution is not dispatched again.
+        return dict(item, error=error)
+
+    return None
+
+
 def _build_callback_url(action_context, version='v2'):
     if version == 'v2':
         return ('http://%s:%s/v2/action_executions/%s' % (
@@ -55,6 +209,10 @@ def _build_callback_url(action_context, version='v2'):
 
 class St2Action(mistral_lib.Action):
 
+    # An instance is created per action execution so the attributes are
+    # kept in slots instead of a dict per instance.
+    __slots__ = ('ref', 'parameters', 'st2_context', 'st2_context_log_safe')
+
     def __init__(self, ref, parameters=None, st2_context=None):
         if not st2_context or not st2_context.get('api_url'):
             raise exc.ActionException(
@@ -66,8 +224,7 @@ class St2Action(mistral_lib.Action):
         self.ref = ref
         self.parameters = parameters
         self.st2_context = st2_context
-        self.st2_context_log_safe = copy.deepcopy(st2_context)
-        self.st2_context_log_safe.pop('auth_token', None)
+        self.st2_context_log_safe = redact.RedactedView(st2_context)
 
     def run(self, context):
         action_context = {
@@ -77,22 +234,72 @@ class St2Action(mistral_lib.Action):
         }
 
         if context.execution.task_id:
-            task_ex = db_v2_api.get_task_execution(context.execution.task_id)
-            action_context['task_execution_id'] = task_ex.id
-            action_context['task_name'] = task_ex.name
+            task_id = context.execution.task_id
+            action_context['task_execution_id'] = task_id
+            action_context['task_name'] = _get_task_name(task_id)
 
         if context.execution.action_execution_id:
             action_ex_id = context.execution.action_execution_id
             action_context['action_execution_id'] = action_ex_id
 
-        LOG.info(
+        logutils.log(
+            LOG, logging.INFO,
             'Running %s [action_context=%s, ref=%s, '
-            'parameters=%s, st2_context=%s]' % (
-                self.__class__.__name__, action_context, self.ref,
-                self.parameters, self.st2_context_log_safe
-            )
+            'parameters=%s, st2_context=%s]',
+            self.__class__.__name__, action_context, self.ref,
+            logutils.cap(self.parameters),
+            logutils.cap(self.st2_context_log_safe),
+            sample=True
         )
 
+        if self._spool(action_context):
+            return None
+
+        return self.dispatch(action_context)
+
+    def _spool(self, action_context):
+        """Spool the execution to be dispatched in the background.
+
+        :rtype: ``bool`` True if spooled, False if it must be dispatched now
+        """
+        sender = _get_sender()
+
+        # The error of a dispatch can only be reported for a known action
+        # execution.
+        if sender is None or not action_context.get('action_execution_id'):
+            return False
+
+        try:
+            if len(sender.spool) >= cfg.CONF.st2.action_spool_max_items:
+                LOG.warning(
+                    'The spool %s is full. %s [action_context=%s, ref=%s] '
+                    'is dispatched synchronously.', sender.spool.path,
+                    self.__class__.__name__, action_context, self.ref
+                )
+
+                return False
+
+            sender.spool.append({
+                'ref': self.ref,
+                'parameters': self.parameters,
+                'st2_context': self.st2_context,
+                'action_context': action_context
+            })
+        except Exception as e:
+            LOG.warning(
+                'Failed to spool %s [action_context=%s, ref=%s]. It is '
+                'dispatched synchronously. %s', self.__class__.__name__,
+                action_context, self.ref, e
+            )
+
+            return False
+
+        sender.wake()
+
+        return True
+
+    def dispatch(self, action_context):
+        """Send the execution request to st2 and return the action result."""
         endpoint = self.st2_context['api_url'] + '/executions'
 
         st2_action_context = {
@@ -101,7 +308,7 @@ class St2Action(mistral_lib.Action):
         }
 
         headers = {
-            'st2-context': json.dumps(st2_action_context)
+            'st2-context': jsonutils.dumps(st2_action_context)
         }
 
         token = None
@@ -128,16 +335,89 @@ class St2Action(mistral_lib.Action):
         if self.parameters:
             body['parameters'] = self.parameters
 
-        LOG.info(
-            'Sending HTTP request for %s [action_context=%s, '
-            'ref=%s, parameters=%s, st2_context=%s]' % (
+        # The requests of an action execution carry the same key so st2 can
+        # recognize a request sent again. An action execution acknowledged
+        # by st2 already (i.e. run again on a message redelivered or sent
+        # again from the spool) is not dispatched again.
+        idempotency_key = idempotency.get_key(
+            action_context.get('action_execution_id')
+        )
+
+        recorded = idempotency.get_record(idempotency_key)
+
+        if recorded:
+            LOG.info(
+                '%s [action_context=%s, ref=%s] is already dispatched as the '
+                'st2 execution %s and is not dispatched again.',
                 self.__class__.__name__, action_context, self.ref,
-                self.parameters, self.st2_context_log_safe
+                recorded['id']
             )
+
+            return {
+                'content': {'id': recorded['id']},
+                'status': recorded['status'],
+                'deduplicated': True
+            }
+
+        if idempotency_key:
+            headers[idempotency.HEADER] = idempotency_key
+
+        logutils.log(
+            LOG, logging.INFO,
+            'Sending HTTP request for %s [action_context=%s, '
+            'ref=%s, parameters=%s, st2_context=%s]',
+            self.__class__.__name__, action_context, self.ref,
+            logutils.cap(self.parameters),
+            logutils.cap(self.st2_context_log_safe),
+            sample=True
+        )
+
+        policy = retry.RetryPolicy(
+            deadline_msec=cfg.CONF.st2.action_retry_stop_max_msec
         )
 
+        max_bytes = cfg.CONF.st2.action_response_max_bytes
+
         try:
-            resp = http.post(endpoint, body, headers=headers, token=token)
+            # The dispatches over the concurrency limit of the st2 API wait
+            # in a queue if the adaptive concurrency is enabled. The queue is
+            # drained fairly across the root workflow executions.
+            flow = _get_root_execution_id(
+                self.st2_context, action_context['workflow_execution_id']
+            )
+
+            limit = concurrency.limit(
+                self.st2_context['api_url'], flow=flow,
+                name=action_context['workflow_name']
+            )
+
+            with limit as slot:
+                # The executions of a fan-out (i.e. with-items) are sent in
+                # batch if enabled and sent individually otherwise.
+                resp = batch.dispatch(
+                    self.st2_context['api_url'], body, st2_action_context,
+                    token=token, policy=policy,
+                    idempotency_key=idempotency_key
+                )
+
+                if resp is None:
+                    resp = http.post(
+                        endpoint, body, headers=headers, token=token,
+                        policy=policy, stream=True
+                    )
+
+                slot.error = concurrency.is_overloaded(resp.status_code)
+
+                # The response is streamed so a misbehaving st2 cannot make
+                # the executor buffer an unbounded body.
+                content, truncated = http.read_content(resp, max_bytes)
+        except (circuit.CircuitOpenError,
+                concurrency.LimitExceededError) as e:
+            raise exc.ActionException(
+                'Failed to run %s [action_context=%s, ref=%s]: %s' % (
+                    self.__class__.__name__, action_context, self.ref, e
+                )
+            )
         except Exception as e:
             raise exc.ActionException(
                 'Failed to send HTTP request for %s [action_context=%s, '
@@ -147,35 +427,58 @@ class St2Action(mistral_lib.Action):
                 )
             )
 
-        LOG.info(
+        logutils.log(
+            LOG, logging.INFO,
             'Received HTTP response for %s [action_context=%s, '
-            'ref=%s, parameters=%s, st2_context=%s]:\n%s\n%s' % (
-                self.__class__.__name__, action_context, self.ref,
-                self.parameters, self.st2_context_log_safe,
-                resp.status_code, resp.content
-            )
+            'ref=%s, parameters=%s, st2_context=%s]:\n%s\n%s',
+            self.__class__.__name__, action_context, self.ref,
+            logutils.cap(self.parameters),
+            logutils.cap(self.st2_context_log_safe),
+            resp.status_code, logutils.cap(content),
+            sample=True
         )
 
-        try:
-            content = resp.json()
-        except Exception as e:
-            content = resp.content
-
-        result = {
-            'content': content,
-            'status': resp.status_code,
-            'headers': dict(resp.headers.items()),
-            'url': resp.url,
-            'history': resp.history,
-            'encoding': resp.encoding,
-            'reason': resp.reason,
-            'cookies': dict(resp.cookies.items()),
-            'elapsed': resp.elapsed.total_seconds()
-        }
+        reject = (
+            truncated and
+            cfg.CONF.st2.action_response_oversize == 'reject'
+        )
 
-        if resp.status_code not in range(200, 307):
+        if truncated:
+            LOG.warning(
+                'The HTTP response for %s [action_context=%s, ref=%s] '
+                'exceeds the max size of %s bytes and is %s.' % (
+                    self.__class__.__name__, action_context, self.ref,
+                    max_bytes, 'rejected' if reject else 'truncated'
+                )
+            )
+
+        if reject:
+            content = (
+                'The HTTP response from st2 exceeds the max size of %s '
+                'bytes.' % max_bytes
+            )
+        elif truncated:
+            # The content may be cut in the middle of a character and must
+            # be valid text for Mistral to serialize the result.
+            content = content.decode('utf-8', 'ignore')
+        else:
+            # The content over the budget of the compact result profile is
+            # kept truncated instead of being deserialized.
+            content, truncated = results.truncate(content)
+
+            if not truncated:
+                try:
+                    content = jsonutils.loads(content)
+                except Exception:
+                    pass
+
+        result = results.build(resp, content, truncated=truncated)
+
+        if reject or resp.status_code not in range(200, 307):
             return wf_utils.Result(error=result)
 
+        idempotency.record(idempotency_key, resp.status_code, content)
+
         return result
 
     def is_sync(self):
@@ -183,3 +486,9 @@ class St2Action(mistral_lib.Action):
 
     def test(self):
         return None
+
+
+# The executions are only run by the executors so the senders are started
+# at load only if the executors are configured to.
+if cfg.CONF.st2.action_spool_path and cfg.CONF.st2.action_spool_start_on_load:
+    _get_sender()
@@ -17,6 +17,8 @@ import os
 import mistralclient.api.httpclient as api
 from mistralclient import auth
 
+from st2mistral.utils import tokenfile
+
 
 class St2AuthHandler(auth.AuthHandler):
 
@@ -27,7 +29,9 @@ class St2AuthHandler(auth.AuthHandler):
         not be processed in mistralclient. It will be passed to the mistral
         server for validation. If auth token is not provided in the request,
         the plugin will look for the ST2_AUTH_TOKEN in the environment
-        variables.
+        variables. Otherwise if the username and password are provided, a
+        token is minted from st2 auth and cached in a file of the user so
+        the next invocations reuse it until shortly before it expires.
 
         :param req: Request dict containing list of parameters required
             for server side authentication.
@@ -41,6 +45,9 @@ class St2AuthHandler(auth.AuthHandler):
         if not auth_token:
             auth_token = os.environ.get('ST2_AUTH_TOKEN')
 
+        if not auth_token:
+            auth_token = self._get_cached_token(req)
+
         auth_response = {
             'mistral_url': req.get('mistral_url'),
             api.AUTH_TOKEN: auth_token,
@@ -49,3 +56,23 @@ class St2AuthHandler(auth.AuthHandler):
         }
 
         return auth_response
+
+    def _get_cached_token(self, req):
+        auth_url = req.get('auth_url') or os.environ.get('ST2_AUTH_URL')
+        username = req.get('username')
+        password = req.get('password') or req.get('api_key')
+
+        if not (auth_url and username and password):
+            return None
+
+        verify = False if req.get('insecure') else (req.get('cacert') or True)
+
+        token_file = tokenfile.TokenFile(
+            tokenfile.get_cache_path(auth_url, username)
+        )
+
+        return token_file.get_token(
+            lambda: tokenfile.mint_token(
+                auth_url, username, password, verify=verify
+            )
+        )
@@ -12,6 +12,9 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
+import threading
+import time
+
 from six.moves import http_client
 
 from oslo_config import cfg
@@ -20,11 +23,84 @@ from oslo_log import log as logging
 from mistral import auth
 from mistral import exceptions as exc
 
+from st2mistral.utils import cache
 from st2mistral.utils import http
+from st2mistral.utils import jsonutils
+from st2mistral.utils import refresh
+from st2mistral.utils import retry
+from st2mistral.utils import singleflight
 
 
 LOG = logging.getLogger(__name__)
 
+_TOKEN_CACHE = None
+_REJECTED_TOKEN_CACHE = None
+_TOKEN_CACHE_LOCK = threading.Lock()
+_VALIDATIONS = singleflight.SingleFlight('auth_token')
+_REFRESHER = None
+
+
+def _create_cache(name, max_size, ttl):
+    path = cfg.CONF.st2.token_cache_path
+
+    if path:
+        return cache.SharedTTLCache(name, path, max_size=max_size, ttl=ttl)
+
+    return cache.TTLCache(name, max_size=max_size, ttl=ttl)
+
+
+def get_token_cache():
+    """Return the cache of the validated auth tokens."""
+    global _TOKEN_CACHE
+
+    with _TOKEN_CACHE_LOCK:
+        if _TOKEN_CACHE is None:
+            _TOKEN_CACHE = _create_cache(
+                'auth_token',
+                cfg.CONF.st2.token_cache_size,
+                cfg.CONF.st2.token_ttl_sec
+            )
+
+    return _TOKEN_CACHE
+
+
+def get_rejected_token_cache():
+    """Return the cache of the auth tokens rejected by st2 auth."""
+    global _REJECTED_TOKEN_CACHE
+
+    with _TOKEN_CACHE_LOCK:
+        if _REJECTED_TOKEN_CACHE is None:
+            _REJECTED_TOKEN_CACHE = _create_cache(
+                'auth_token_rejected',
+                cfg.CONF.st2.rejected_token_cache_size,
+                cfg.CONF.st2.rejected_token_ttl_sec
+            )
+
+    return _REJECTED_TOKEN_CACHE
+
+
+def get_refresher():
+    """Return the background refresher of the validated auth tokens."""
+    global _REFRESHER
+
+    with _TOKEN_CACHE_LOCK:
+        if _REFRESHER is None:
+            _REFRESHER = refresh.Refresher(
+                'auth_token',
+                max_concurrency=cfg.CONF.st2.token_refresh_max_concurrency
+            )
+
+    return _REFRESHER
+
+
+def reset_caches():
+    global _TOKEN_CACHE, _REJECTED_TOKEN_CACHE, _REFRESHER
+
+    with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE = None
+        _REJECTED_TOKEN_CACHE = None
+        _REFRESHER = None
+
 
 class St2AuthHandler(auth.AuthHandler):
 
@@ -34,12 +110,74 @@ class St2AuthHandler(auth.AuthHandler):
         if not token:
             raise exc.UnauthorizedException('Auth token is not provided.')
 
+        # The tokens validated within the token TTL are not validated again.
+        # The tokens still in use close to their expiry are validated again
+        # in the background while the cached validation is used.
+        key = cache.get_digest(token)
+        valid, expires = get_token_cache().get_with_expiry(key)
+
+        if valid:
+            if expires - time.time() < cfg.CONF.st2.token_refresh_ahead_sec:
+                get_refresher().submit(
+                    key, lambda: self._refresh(token, key)
+                )
+
+            return
+
+        if get_rejected_token_cache().get(key):
+            raise exc.UnauthorizedException('Unable to verify auth token.')
+
+        policy = retry.RetryPolicy(
+            deadline_msec=cfg.CONF.st2.auth_retry_stop_max_msec
+        )
+
+        # The concurrent validations of the same token share a single call
+        # to st2 auth which cannot last longer than the retry deadline and
+        # the read timeout of the last attempt.
+        try:
+            valid = _VALIDATIONS.do(
+                key,
+                lambda: self._validate(token, key, policy),
+                timeout=policy.deadline + policy.read_timeout
+            )
+        except singleflight.CallTimeoutError as e:
+            LOG.error('Unable to verify auth token. %s' % str(e))
+            raise exc.UnauthorizedException('Unable to verify auth token.')
+
+        if not valid:
+            raise exc.UnauthorizedException('Unable to verify auth token.')
+
+    def _validate(self, token, key, policy):
+        """Validate the token with st2 auth and cache the outcome.
+
+        :rtype: ``bool`` False if the token is rejected by st2 auth
+        """
         data = {'token': token}
         headers = {'St2-Api-Key': cfg.CONF.st2.api_key}
         url = cfg.CONF.st2.auth_url + '/tokens/validate'
-        resp = http.post(url, data, headers=headers)
 
-        if (resp.status_code != http_client.OK or
-                not resp.json().get('valid', False)):
+        resp = http.post(url, data, headers=headers, policy=policy)
+
+        if resp.status_code != http_client.OK:
             LOG.error('Unable to verify auth token. %s' % str(resp.content))
             raise exc.UnauthorizedException('Unable to verify auth token.')
+
+        # Only the tokens explicitly rejected by st2 auth are cached. Errors
+        # of st2 auth are not so the token is validated again next time.
+        if not jsonutils.loads(resp.content).get('valid', False):
+            LOG.error('Unable to verify auth token. %s' % str(resp.content))
+            get_token_cache().delete(key)
+            get_rejected_token_cache().set(key, True)
+            return False
+
+        get_token_cache().set(key, True)
+
+        return True
+
+    def _refresh(self, token, key):
+        policy = retry.RetryPolicy(
+            deadline_msec=cfg.CONF.st2.auth_retry_stop_max_msec
+        )
+
+        # The cached validation is kept until it expires if st2 auth fails.
+        return 'valid' if self._validate(token, key, policy) else 'rejected'
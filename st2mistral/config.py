@@ -26,6 +26,30 @@ st2_opts = [
         default='https://localhost/auth',
         help='Auth endpoint for st2.'
     ),
+    cfg.ListOpt(
+        'auth_urls',
+        default=[],
+        help='Equivalent base URLs of the st2 auth replicas. Requests to '
+             'any of them are balanced across the replicas by latency and '
+             'health.'
+    ),
+    cfg.ListOpt(
+        'api_urls',
+        default=[],
+        help='Equivalent base URLs of the st2 API replicas. Requests to '
+             'any of them, such as the api_url in the st2 context, are '
+             'balanced across the replicas by latency and health.'
+    ),
+    cfg.ListOpt(
+        'unix_sockets',
+        default=[],
+        help='Base URLs of st2 APIs running on the same host mapped to the '
+             'Unix domain socket they listen on, in the <base url>=<socket '
+             'path> format (i.e. https://localhost/api=/run/st2api.sock). '
+             'Requests to these URLs are sent in plain HTTP over the socket. '
+             'Base URLs with the http+unix scheme and the percent encoded '
+             'socket path as the host are also supported.'
+    ),
     cfg.StrOpt(
         'api_key',
         help='API key to authenticate with the auth '
@@ -36,6 +60,44 @@ st2_opts = [
         default=300,
         help='The amount of time before cached auth token is expired.'
     ),
+    cfg.IntOpt(
+        'token_cache_size',
+        default=1024,
+        help='Max number of validated auth tokens cached by the Mistral API. '
+             'The least recently used tokens are evicted first.'
+    ),
+    cfg.StrOpt(
+        'token_cache_path',
+        help='Path of a SQLite file where the validated and rejected auth '
+             'tokens are cached and shared by all the Mistral API worker '
+             'processes of the host. The tokens are cached per process if '
+             'not set.'
+    ),
+    cfg.IntOpt(
+        'rejected_token_ttl_sec',
+        default=30,
+        help='The amount of time an auth token rejected by st2 auth is '
+             'rejected by the Mistral API without being validated again. '
+             'Zero to disable the cache of rejected tokens.'
+    ),
+    cfg.IntOpt(
+        'rejected_token_cache_size',
+        default=1024,
+        help='Max number of rejected auth tokens cached by the Mistral API.'
+    ),
+    cfg.IntOpt(
+        'token_refresh_ahead_sec',
+        default=30,
+        help='Cached auth tokens still in use within this amount of time '
+             'before they expire are validated again in the background. '
+             'Zero to disable the background validation.'
+    ),
+    cfg.IntOpt(
+        'token_refresh_max_concurrency',
+        default=2,
+        help='Max number of auth tokens validated in the background at the '
+             'same time per process.'
+    ),
     cfg.IntOpt(
         'retry_exp_msec',
         default=1000,
@@ -50,6 +112,293 @@ st2_opts = [
         'retry_stop_max_msec',
         default=180000,
         help='Max time to stop retrying.'
+    ),
+    cfg.IntOpt(
+        'auth_retry_stop_max_msec',
+        help='Max time to stop retrying auth token validation. Defaults to '
+             'retry_stop_max_msec.'
+    ),
+    cfg.IntOpt(
+        'action_retry_stop_max_msec',
+        help='Max time to stop retrying st2 action execution requests. '
+             'Defaults to retry_stop_max_msec.'
+    ),
+    cfg.IntOpt(
+        'notifier_retry_stop_max_msec',
+        help='Max time to stop retrying workflow event publishing to st2. '
+             'Defaults to retry_stop_max_msec.'
+    ),
+    cfg.IntOpt(
+        'st2kv_retry_stop_max_msec',
+        help='Max time to stop retrying st2 datastore lookups. Defaults to '
+             'retry_stop_max_msec.'
+    ),
+    cfg.FloatOpt(
+        'connect_timeout_sec',
+        default=10,
+        help='Timeout for establishing a connection to st2.'
+    ),
+    cfg.FloatOpt(
+        'read_timeout_sec',
+        default=60,
+        help='Timeout for waiting on a response from st2 once connected.'
+    ),
+    cfg.IntOpt(
+        'pool_connections',
+        default=10,
+        help='Number of connection pools to cache per st2 endpoint.'
+    ),
+    cfg.IntOpt(
+        'pool_maxsize',
+        default=10,
+        help='Max number of keep-alive connections to save in the pool '
+             'for each st2 endpoint.'
+    ),
+    cfg.BoolOpt(
+        'pool_block',
+        default=False,
+        help='Block when no free connection is available in the pool '
+             'instead of opening a connection that is not reused.'
+    ),
+    cfg.BoolOpt(
+        'eventlet_cooperative',
+        default=True,
+        help='Cooperate with the eventlet hub when eventlet is installed. '
+             'The retry backoff yields to the other green threads, the '
+             'requests are sent from the native thread pool if the socket '
+             'module is not monkey patched and the SQLite queries are '
+             'always run in the native thread pool.'
+    ),
+    cfg.IntOpt(
+        'max_inflight_requests',
+        default=0,
+        help='Max number of concurrent requests to st2 per process. The '
+             'requests over the limit wait for a free slot. Zero for no '
+             'limit.'
+    ),
+    cfg.BoolOpt(
+        'circuit_breaker_enabled',
+        default=True,
+        help='Fail calls to a st2 endpoint fast while it is unhealthy.'
+    ),
+    cfg.IntOpt(
+        'circuit_failure_threshold',
+        default=5,
+        help='Number of consecutive failures before the circuit breaker '
+             'for a st2 endpoint is opened.'
+    ),
+    cfg.IntOpt(
+        'circuit_reset_timeout_sec',
+        default=30,
+        help='Time the circuit breaker stays open before trial calls are '
+             'let through to the st2 endpoint.'
+    ),
+    cfg.IntOpt(
+        'circuit_half_open_max_calls',
+        default=1,
+        help='Number of trial calls let through while the circuit breaker '
+             'is half open.'
+    ),
+    cfg.StrOpt(
+        'request_compression',
+        default='none',
+        choices=['none', 'gzip', 'deflate'],
+        help='Content encoding used to compress large request bodies sent '
+             'to st2. The st2 API or the proxy in front of it must accept '
+             'compressed request bodies.'
+    ),
+    cfg.IntOpt(
+        'request_compression_min_bytes',
+        default=16384,
+        help='Min size of the request body before it is compressed.'
+    ),
+    cfg.IntOpt(
+        'action_response_max_bytes',
+        default=0,
+        help='Max size of the st2 response read by the st2.action action. '
+             'Zero for no limit.'
+    ),
+    cfg.StrOpt(
+        'action_response_oversize',
+        default='truncate',
+        choices=['truncate', 'reject'],
+        help='How the st2.action action handles a response larger than '
+             'action_response_max_bytes. The content of the result is '
+             'truncated and flagged or the result is turned into an error.'
+    ),
+    cfg.StrOpt(
+        'action_result_profile',
+        default='full',
+        choices=['full', 'compact'],
+        help='Fields of the st2 response kept in the result of the '
+             'st2.action action persisted by Mistral. The full profile '
+             'keeps the whole response and the compact profile only the '
+             'content, status and reason.'
+    ),
+    cfg.IntOpt(
+        'action_result_content_max_bytes',
+        default=0,
+        help='Max size of the content kept in the result of the st2.action '
+             'action with the compact profile. A larger content is '
+             'truncated and flagged. Zero for no limit.'
+    ),
+    cfg.IntOpt(
+        'action_task_cache_size',
+        default=1000,
+        help='Max number of task execution names cached by the st2.action '
+             'action so the items of a with-items task do not look up the '
+             'task execution in the database. Zero to disable the cache.'
+    ),
+    cfg.IntOpt(
+        'action_batch_window_msec',
+        default=0,
+        help='Time the st2.action executions dispatched concurrently to the '
+             'same st2 API are collected to be sent in a single request to '
+             'the batch endpoint. Zero to send each execution individually.'
+    ),
+    cfg.IntOpt(
+        'action_batch_max_size',
+        default=100,
+        help='Max number of st2.action executions sent in a batch. The '
+             'batch is sent before the end of the window once full.'
+    ),
+    cfg.StrOpt(
+        'action_batch_path',
+        default='/executions/batch',
+        help='Path of the st2 API endpoint accepting a list of executions. '
+             'The executions are sent individually if it is not available.'
+    ),
+    cfg.BoolOpt(
+        'action_adaptive_concurrency',
+        default=False,
+        help='Limit the st2.action executions dispatched concurrently to '
+             'each st2 API with a limit which adapts to its latency and '
+             'errors. The dispatches over the limit wait in a queue.'
+    ),
+    cfg.IntOpt(
+        'action_concurrency_initial',
+        default=20,
+        help='Initial limit of the st2.action dispatches in flight to a st2 '
+             'API.'
+    ),
+    cfg.IntOpt(
+        'action_concurrency_min',
+        default=1,
+        help='Min limit of the st2.action dispatches in flight to a st2 API.'
+    ),
+    cfg.IntOpt(
+        'action_concurrency_max',
+        default=200,
+        help='Max limit of the st2.action dispatches in flight to a st2 API.'
+    ),
+    cfg.IntOpt(
+        'action_concurrency_max_wait_sec',
+        default=60,
+        help='Max time a st2.action dispatch waits in the queue before it '
+             'fails.'
+    ),
+    cfg.FloatOpt(
+        'action_concurrency_latency_tolerance',
+        default=2.0,
+        help='Ratio of the latency of a st2.action dispatch to the lowest '
+             'recent latency over which the limit is decreased.'
+    ),
+    cfg.FloatOpt(
+        'action_concurrency_backoff_ratio',
+        default=0.75,
+        help='Ratio the limit is multiplied by when a st2.action dispatch '
+             'fails, is throttled or is too slow.'
+    ),
+    cfg.DictOpt(
+        'action_dispatch_weights',
+        default={},
+        help='Weights of the workflows (i.e. examples.mistral-basic:4) in '
+             'the share of the st2.action dispatches in flight when they '
+             'are queued by the adaptive concurrency limit. The queued '
+             'dispatches are drained fairly across the root workflow '
+             'executions. The default weight is 1.'
+    ),
+    cfg.StrOpt(
+        'action_spool_path',
+        help='Path of the SQLite file the st2.action executions are spooled '
+             'to. The action returns once the execution is spooled and the '
+             'execution is dispatched in the background. The error of an '
+             'execution which cannot be dispatched is reported to the '
+             'engine. Executions are dispatched synchronously if not set.'
+    ),
+    cfg.IntOpt(
+        'action_spool_senders',
+        default=4,
+        help='Number of threads of each process dispatching the st2.action '
+             'executions spooled.'
+    ),
+    cfg.BoolOpt(
+        'action_spool_start_on_load',
+        default=False,
+        help='Start the senders of the spool when the st2.action action is '
+             'loaded instead of on the first st2.action run by the process, '
+             'so the executions spooled before a restart are dispatched '
+             'right away. Only set it in the configuration of the '
+             'executors since the engine and the API load the action too.'
+    ),
+    cfg.IntOpt(
+        'action_spool_max_attempts',
+        default=20,
+        help='Max number of attempts to dispatch a spooled st2.action '
+             'execution or report its error to the engine. The execution '
+             'is dropped from the spool after. Zero for no limit.'
+    ),
+    cfg.IntOpt(
+        'action_spool_max_items',
+        default=10000,
+        help='Max number of st2.action executions in the spool. The '
+             'executions are dispatched synchronously once it is full.'
+    ),
+    cfg.IntOpt(
+        'action_idempotency_ttl_sec',
+        default=86400,
+        help='Time the st2.action executions acknowledged by st2 are '
+             'recorded so an action execution run again is not dispatched '
+             'again. The record is kept in the spool file if the spool is '
+             'enabled and in memory otherwise.'
+    ),
+    cfg.IntOpt(
+        'action_idempotency_cache_size',
+        default=10000,
+        help='Max number of st2.action executions acknowledged recorded. '
+             'Zero to disable the record.'
+    ),
+    cfg.IntOpt(
+        'log_max_field_chars',
+        default=1024,
+        help='Max number of characters of the large fields (i.e. parameters, '
+             'st2 context and response body) in the st2mistral log lines. '
+             'Zero for no limit.'
+    ),
+    cfg.IntOpt(
+        'log_sample_burst',
+        default=0,
+        help='Max number of repetitive st2mistral log lines with the same '
+             'message emitted per sampling interval. The number of lines '
+             'suppressed is added to the next line emitted. Zero to log '
+             'every line.'
+    ),
+    cfg.IntOpt(
+        'log_sample_interval_sec',
+        default=10,
+        help='Interval of the sampling of the repetitive log lines.'
+    ),
+    cfg.StrOpt(
+        'metrics_textfile',
+        help='Path of the file the HTTP client metrics are periodically '
+             'written to in the Prometheus text format (i.e. for the node '
+             'exporter textfile collector). The %(pid)s placeholder is '
+             'replaced with the process id.'
+    ),
+    cfg.IntOpt(
+        'metrics_textfile_interval_sec',
+        default=15,
+        help='Interval between writes of the metrics textfile.'
     )
 ]
 
@@ -13,9 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
 import yaml
 
+from st2mistral.utils import jsonutils
+
 __all__ = [
     'from_json_string',
     'from_yaml_string',
@@ -26,7 +27,7 @@ __all__ = [
 
 
 def from_json_string(context, value):
-    return json.loads(value)
+    return jsonutils.loads(value)
 
 
 def from_yaml_string(context, value):
@@ -34,13 +35,13 @@ def from_yaml_string(context, value):
 
 
 def to_complex(context, value):
-    return json.dumps(value)
+    return jsonutils.dumps(value)
 
 
 def to_json_string(context, value, indent=4, sort_keys=False,
                    separators=(',', ':')):
-    return json.dumps(value, indent=indent, separators=separators,
-                      sort_keys=sort_keys)
+    return jsonutils.dumps(value, indent=indent, separators=separators,
+                           sort_keys=sort_keys)
 
 
 def to_yaml_string(context, value, indent=4, allow_unicode=True):
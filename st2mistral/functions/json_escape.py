@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import json
+from st2mistral.utils import jsonutils
 
 __all__ = [
     'json_escape'
@@ -33,4 +33,4 @@ def json_escape(context, value):
     arbitrary value
     """
 
-    return json.dumps(value).strip('"')
+    return jsonutils.dumps(value).strip('"')
@@ -12,7 +12,6 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-import copy
 from six.moves import http_client
 
 from oslo_config import cfg
@@ -22,7 +21,12 @@ from st2mistral import config
 config.register_opts()
 
 from mistral import exceptions as exc
+from st2mistral.utils import circuit
 from st2mistral.utils import http
+from st2mistral.utils import jsonutils
+from st2mistral.utils import logutils
+from st2mistral.utils import redact
+from st2mistral.utils import retry
 
 LOG = logging.getLogger(__name__)
 
@@ -43,8 +47,7 @@ def st2kv_(context, key, decrypt=False):
     env = context['__env']
     actions_env = env.get('__actions', {})
     st2_ctx = actions_env.get('st2.action', {}).get('st2_context', {})
-    st2_ctx_log_safe = copy.deepcopy(st2_ctx)
-    st2_ctx_log_safe.pop('auth_token', None)
+    st2_ctx_log_safe = redact.RedactedView(st2_ctx)
 
     if 'auth_token' in st2_ctx:
         token = st2_ctx.get('auth_token')
@@ -61,15 +64,26 @@ def st2kv_(context, key, decrypt=False):
     endpoint = st2_ctx['api_url'] + '/keys/' + key_id
     params = {'decrypt': decrypt, 'scope': scope}
 
-    LOG.info(
+    logutils.log(
+        LOG, logging.INFO,
         'Sending HTTP request for custom YAQL function st2kv '
-        '[url=%s, st2_context=%s]' % (
-            endpoint, st2_ctx_log_safe
-        )
+        '[url=%s, st2_context=%s]',
+        endpoint, logutils.cap(st2_ctx_log_safe),
+        sample=True
     )
 
     try:
-        resp = http.get(endpoint, params=params, token=token)
+        policy = retry.RetryPolicy(
+            deadline_msec=cfg.CONF.st2.st2kv_retry_stop_max_msec
+        )
+
+        resp = http.get(endpoint, params=params, token=token, policy=policy)
+    except circuit.CircuitOpenError as e:
+        raise exc.CustomYaqlException(
+            'Failed to retrieve key %s from StackStorm datastore: %s' % (
+                key, e
+            )
+        )
     except Exception as e:
         raise exc.CustomYaqlException(
             'Failed to send HTTP request for custom YAQL function st2kv '
@@ -90,4 +104,4 @@ def st2kv_(context, key, decrypt=False):
             )
         )
 
-    return resp.json().get('value', None)
+    return jsonutils.loads(resp.content).get('value', None)
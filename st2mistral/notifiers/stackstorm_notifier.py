@@ -12,10 +12,10 @@
 #    See the License for the specific language governing permissions and
 #    limitations under the License.
 
-import json
 import six
 from six.moves import http_client
 
+from oslo_config import cfg
 from oslo_log import log as logging
 
 from st2mistral import config
@@ -27,7 +27,11 @@ from mistral.notifiers import notification_events as events
 from mistral.workflow import data_flow
 from mistral.workflow import states
 
+from st2mistral.utils import circuit
 from st2mistral.utils import http
+from st2mistral.utils import jsonutils
+from st2mistral.utils import logutils
+from st2mistral.utils import retry
 
 
 LOG = logging.getLogger(__name__)
@@ -48,7 +52,10 @@ def get_st2_ctx(data):
 
 def try_json_loads(s):
     try:
-        return json.loads(s) if s and isinstance(s, six.string_types) else s
+        if s and isinstance(s, six.string_types):
+            return jsonutils.loads(s)
+
+        return s
     except Exception:
         return s
 
@@ -57,13 +64,15 @@ def on_workflow_status_update(ex_id, data, event, timestamp, **kwargs):
     root_id = data.get('root_execution_id') or ex_id
 
     if root_id != ex_id:
-        LOG.info(
+        logutils.log(
+            LOG, logging.INFO,
             '[%s] The workflow event %s for subworkflow %s is '
             'not published to st2. This is expected because it '
             'does not have a corresponding execution record in st2.',
             root_id,
             event,
-            ex_id
+            ex_id,
+            sample=True
         )
 
         return
@@ -123,21 +132,35 @@ def on_workflow_status_update(ex_id, data, event, timestamp, **kwargs):
 
                 body['result']['tasks'].append(task_result)
 
-    LOG.info(
+    logutils.log(
+        LOG, logging.INFO,
         '[%s] The workflow event %s for %s will be published to st2.',
         root_id,
         event,
-        ex_id
+        ex_id,
+        sample=True
     )
 
-    resp = http.put(endpoint, body, token=st2_token)
+    policy = retry.RetryPolicy(
+        deadline_msec=cfg.CONF.st2.notifier_retry_stop_max_msec
+    )
+
+    try:
+        resp = http.put(endpoint, body, token=st2_token, policy=policy)
+    except circuit.CircuitOpenError as e:
+        raise Exception(
+            '[%s] Unable to publish the workflow event %s for %s to st2. %s' %
+            (root_id, event, ex_id, e)
+        )
 
     if resp.status_code == http_client.OK:
-        LOG.info(
+        logutils.log(
+            LOG, logging.INFO,
             '[%s] The workflow event %s for %s is published to st2.',
             root_id,
             event,
-            ex_id
+            ex_id,
+            sample=True
         )
     else:
         raise Exception(
@@ -150,14 +173,16 @@ def trigger_workflow_event(
         root_id, task_ex_id, task_event,
         wf_event, wf_ex_data, timestamp, **kwargs):
 
-    LOG.info(
+    logutils.log(
+        LOG, logging.INFO,
         '[%s] The task event %s for %s triggers '
         'workflow event %s for %s to st2.',
         root_id,
         task_event,
         task_ex_id,
         wf_event,
-        wf_ex_data['id']
+        wf_ex_data['id'],
+        sample=True
     )
 
     on_workflow_status_update(
@@ -178,11 +203,13 @@ def on_task_status_update(ex_id, data, event, timestamp, **kwargs):
 
     root_id = wf_ex_data.get('root_execution_id') or wf_ex_data.get('id')
 
-    LOG.info(
+    logutils.log(
+        LOG, logging.INFO,
         '[%s] The task event %s for %s will be processed for st2.',
         root_id,
         event,
-        ex_id
+        ex_id,
+        sample=True
     )
 
     if wf_ex_data['state'] == states.CANCELLED:
@@ -257,11 +284,13 @@ def on_task_status_update(ex_id, data, event, timestamp, **kwargs):
             parent_ctx = st2_ctx.get('parent', {}).get('mistral', {})
             parent_wf_ex_id = parent_ctx.get('workflow_execution_id')
 
-    LOG.info(
+    logutils.log(
+        LOG, logging.INFO,
         '[%s] The task event %s for %s is processed for st2.',
         root_id,
         event,
-        ex_id
+        ex_id,
+        sample=True
     )
 
 
@@ -285,11 +314,13 @@ class St2Notifier(base.NotificationPublisher):
         func = EVENT_FUNCTION_MAP.get(event)
 
         if not func:
-            LOG.info(
+            logutils.log(
+                LOG, logging.INFO,
                 'The event %s for %s is not processed for st2 '
                 'because there is no event handler defined.',
                 event,
-                ex_id
+                ex_id,
+                sample=True
             )
 
             return
@@ -0,0 +1,134 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the dispatch of a large fan-out to an overloaded st2 API.
+
+The stub st2 API serves a few requests concurrently at its best. Beyond
+that, its latency grows faster than the number of requests in flight so
+its throughput collapses under the load (i.e. contention on the database
+or the message bus). The executor threads dispatch the executions as
+St2Action does with and without the adaptive concurrency limit.
+
+Usage: python -m st2mistral.tests.benchmarks.adaptive_concurrency
+    [threads] [seconds]
+"""
+
+import sys
+import threading
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import concurrency
+from st2mistral.utils import http
+
+SERVICE_TIME_SEC = 0.02
+CAPACITY = 6
+
+
+def get_handler():
+    state = {'inflight': 0}
+    lock = threading.Lock()
+
+    def handler(method, path, headers, body):
+        with lock:
+            state['inflight'] += 1
+            load = max(1.0, state['inflight'] / float(CAPACITY))
+
+        try:
+            time.sleep(SERVICE_TIME_SEC * load ** 1.5)
+        finally:
+            with lock:
+                state['inflight'] -= 1
+
+        return 201, {'id': '123'}
+
+    return handler
+
+
+def dispatch(api_url):
+    with concurrency.limit(api_url) as slot:
+        resp = http.post(
+            api_url + '/executions', {'action': 'core.noop'}, token='foobar'
+        )
+
+        slot.error = concurrency.is_overloaded(resp.status_code)
+
+    assert resp.status_code == 201
+
+
+def run(api_url, num_threads, duration):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def worker():
+        while time.time() < stop_at:
+            started = time.time()
+            dispatch(api_url)
+
+            with lock:
+                latencies.append(time.time() - started)
+
+    threads = [threading.Thread(target=worker) for i in range(num_threads)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    limiter = concurrency.get_limiter(api_url)
+    concurrency.reset_limiters()
+    http.reset_sessions()
+
+    return (
+        len(latencies) / float(duration),
+        latencies[len(latencies) // 2],
+        latencies[int(len(latencies) * 0.99)],
+        limiter.limit if limiter else None
+    )
+
+
+def main(num_threads=200, duration=10):
+    conf = cfg.CONF
+    conf.set_override('circuit_breaker_enabled', False, group='st2')
+    conf.set_override('pool_maxsize', num_threads, group='st2')
+    conf.set_override('eventlet_cooperative', False, group='st2')
+
+    server = base.StubServer(get_handler()).start()
+    api_url = server.url + '/api/v1'
+
+    try:
+        for name, enabled in [('unlimited', False), ('adaptive', True)]:
+            conf.set_override(
+                'action_adaptive_concurrency', enabled, group='st2'
+            )
+
+            rate, p50, p99, limit = run(api_url, num_threads, duration)
+            print(
+                '%-9s %6.0f dispatches per second, p50 %6.0f ms, '
+                'p99 %6.0f ms, limit %s' % (
+                    name, rate, p50 * 1000, p99 * 1000, limit
+                )
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,119 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the dispatch of a with-items fan-out to a stub st2 API.
+
+The executor threads dispatch the executions as St2Action does, either
+individually, in batches or individually once the batch endpoint is
+found not available. The stub st2 API takes 2 msec per request.
+
+Usage: python -m st2mistral.tests.benchmarks.batch_dispatch [executions]
+"""
+
+import json
+import sys
+import threading
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import batch
+from st2mistral.utils import http
+
+
+def dispatch(api_url, i):
+    body = {'action': 'core.noop', 'parameters': {'item': i}}
+    context = {'parent': {'execution_id': '123'}}
+    resp = batch.dispatch(api_url, body, context, token='foobar')
+
+    if resp is None:
+        resp = http.post(
+            api_url + '/executions', body, token='foobar',
+            headers={'st2-context': json.dumps(context)}
+        )
+
+    assert resp.status_code == 201
+
+
+def run(api_url, num_executions, num_threads=50):
+    pending = list(range(num_executions))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not pending:
+                    return
+
+                i = pending.pop()
+
+            dispatch(api_url, i)
+
+    threads = [threading.Thread(target=worker) for i in range(num_threads)]
+    started = time.time()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.time() - started
+    batch.reset()
+    http.reset_sessions()
+
+    return num_executions / elapsed
+
+
+def main(num_executions=5000):
+    conf = cfg.CONF
+    conf.set_override('circuit_breaker_enabled', False, group='st2')
+    conf.set_override('pool_maxsize', 50, group='st2')
+    conf.set_override('eventlet_cooperative', False, group='st2')
+    batch_available = [True]
+
+    def handler(method, path, headers, body):
+        time.sleep(0.002)
+
+        if not path.endswith('/batch'):
+            return 201, {'id': '123'}
+
+        if not batch_available[0]:
+            return 404, {'faultstring': 'Not found'}
+
+        items = json.loads(body.decode('utf-8'))
+
+        return 200, [{'status': 201, 'body': {'id': '123'}} for i in items]
+
+    server = base.StubServer(handler).start()
+    api_url = server.url + '/api/v1'
+
+    try:
+        for name, window, available in [
+            ('individual', 0, True),
+            ('batched', 5, True),
+            ('fallback', 5, False)
+        ]:
+            conf.set_override('action_batch_window_msec', window, group='st2')
+            batch_available[0] = available
+            rate = run(api_url, num_executions)
+            print('%-11s %8.0f dispatches per second' % (name, rate))
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,164 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the executor thread occupancy of the St2Action dispatches.
+
+The executor threads dispatch the executions synchronously as St2Action
+does by default or append them to the spool drained by the senders in
+the background. The occupancy is the time an executor thread is blocked
+per dispatch. The stub st2 API runs in another process and takes 50 msec
+per request.
+
+Usage: python -m st2mistral.tests.benchmarks.dispatch_spool [executions]
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import http
+from st2mistral.utils import spool
+
+NUM_EXECUTOR_THREADS = 16
+
+
+def send(item):
+    resp = http.post(item['endpoint'], item['body'], token='foobar')
+    http.read_content(resp, 0)
+
+    assert resp.status_code == 201
+
+
+def run(api_url, num_executions, sender=None):
+    pending = list(range(num_executions))
+    lock = threading.Lock()
+    occupancy = []
+
+    def executor():
+        while True:
+            with lock:
+                if not pending:
+                    return
+
+                i = pending.pop()
+
+            item = {
+                'endpoint': api_url + '/executions',
+                'body': {'action': 'core.noop', 'parameters': {'i': i}}
+            }
+
+            started = time.time()
+
+            if sender:
+                sender.spool.append(item)
+                sender.wake()
+            else:
+                send(item)
+
+            with lock:
+                occupancy.append(time.time() - started)
+
+    threads = [
+        threading.Thread(target=executor)
+        for i in range(NUM_EXECUTOR_THREADS)
+    ]
+
+    started = time.time()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    returned = time.time() - started
+
+    while sender and len(sender.spool):
+        time.sleep(0.01)
+
+    dispatched = time.time() - started
+    occupancy.sort()
+
+    return (
+        sum(occupancy) / len(occupancy), occupancy[int(len(occupancy) * 0.99)],
+        returned, dispatched
+    )
+
+
+def handler(method, path, headers, body):
+    time.sleep(0.05)
+
+    return 201, {'id': '123'}
+
+
+def serve(queue):
+    server = base.StubServer(handler).start()
+    queue.put(server.url)
+    server.thread.join()
+
+
+def main(num_executions=1000):
+    conf = cfg.CONF
+    conf.set_override('circuit_breaker_enabled', False, group='st2')
+    conf.set_override('eventlet_cooperative', False, group='st2')
+
+    queue = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(queue,))
+    server.daemon = True
+    server.start()
+
+    api_url = queue.get() + '/api/v1'
+    tmp_dir = tempfile.mkdtemp()
+
+    try:
+        for name, num_senders in [('sync', 0), ('spool', 16), ('spool', 32)]:
+            sender = None
+
+            if num_senders:
+                sender = spool.Sender(
+                    spool.Spool('bench', os.path.join(tmp_dir, name)),
+                    send, num_senders=num_senders
+                )
+
+                sender.start()
+
+            mean, p99, returned, dispatched = run(
+                api_url, num_executions, sender
+            )
+
+            if sender:
+                sender.stop()
+
+            print(
+                '%-5s %2s senders: occupancy mean %6.2f ms, p99 %6.2f ms per '
+                'dispatch; returned in %5.2f s, dispatched in %5.2f s' % (
+                    name, num_senders, mean * 1000, p99 * 1000, returned,
+                    dispatched
+                )
+            )
+    finally:
+        server.terminate()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
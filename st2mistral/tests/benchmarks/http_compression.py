@@ -0,0 +1,90 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark request body compression against a local stub st2 API.
+
+The stub server simulates a link of limited bandwidth by holding each
+request for the time it takes to transfer the body received.
+
+Usage: python -m st2mistral.tests.benchmarks.http_compression [mbps]
+"""
+
+import sys
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import http
+
+
+def get_notifier_body(num_tasks):
+    tasks = [
+        {
+            'id': 'task-%s' % i,
+            'name': 'task%s' % i,
+            'workflow_execution_id': 'wf-1',
+            'workflow_name': 'examples.mistral-bench',
+            'state': 'SUCCESS',
+            'state_info': None,
+            'input': {'cmd': 'echo %s' % i, 'timeout': 60},
+            'published': {'var%s' % i: 'value %s' % i},
+            'result': {'stdout': 'output of task %s' % i, 'stderr': '',
+                       'return_code': 0, 'succeeded': True}
+        }
+        for i in range(num_tasks)
+    ]
+
+    return {'status': 'succeeded', 'result': {'tasks': tasks}}
+
+
+def run(encoding, body, mbps, iterations=5):
+    cfg.CONF.set_override('request_compression', encoding, group='st2')
+    received = []
+
+    def handler(method, path, headers, content):
+        received.append(len(content))
+        time.sleep(len(content) * 8.0 / (mbps * 1000000))
+        return 200, {}
+
+    server = base.StubServer(handler).start()
+
+    try:
+        started = time.time()
+
+        for i in range(iterations):
+            http.put(server.url + '/executions/123', body)
+
+        elapsed = (time.time() - started) / iterations
+    finally:
+        server.stop()
+        http.reset_sessions()
+
+    return received[-1], elapsed
+
+
+def main(mbps=100):
+    body = get_notifier_body(5000)
+
+    print('Notifier body with 5000 tasks over a %s Mbps link' % mbps)
+
+    for encoding in ['none', 'gzip', 'deflate']:
+        size, elapsed = run(encoding, body, mbps)
+        print('%-8s %10d bytes sent %8.1f ms per request' % (
+            encoding, size, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main(*[float(arg) for arg in sys.argv[1:]])
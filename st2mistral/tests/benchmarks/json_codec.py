@@ -0,0 +1,54 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the JSON codec on the notifier body of a large workflow.
+
+Usage: python -m st2mistral.tests.benchmarks.json_codec [num_tasks]
+"""
+
+import json
+import sys
+import timeit
+
+from st2mistral.tests.benchmarks import http_compression
+from st2mistral.utils import jsonutils
+
+
+def main(num_tasks=5000, number=20):
+    body = http_compression.get_notifier_body(int(num_tasks))
+    docs = [json.dumps(task['input']) for task in body['result']['tasks']]
+    backends = ['json', 'orjson'] if jsonutils.orjson else ['json']
+
+    print('Notifier body with %s tasks' % num_tasks)
+
+    elapsed = timeit.timeit(lambda: json.dumps(body), number=number)
+    print('%-20s %8.2f ms' % ('encode (previous)', elapsed * 1000 / number))
+
+    for backend in backends:
+        jsonutils.set_backend(backend)
+
+        elapsed = timeit.timeit(lambda: jsonutils.encode(body), number=number)
+        print('%-20s %8.2f ms' % ('encode (%s)' % backend,
+                                  elapsed * 1000 / number))
+
+        elapsed = timeit.timeit(
+            lambda: [jsonutils.loads(doc) for doc in docs], number=number
+        )
+        print('%-20s %8.2f ms' % ('task inputs (%s)' % backend,
+                                  elapsed * 1000 / number))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,105 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the CPU time of the St2Action log lines per dispatch.
+
+The three log lines of a dispatch are formatted eagerly with the full
+parameters, st2 context and response body or with the logging helpers,
+with the INFO level enabled to a file and disabled.
+
+Usage: python -m st2mistral.tests.benchmarks.logging_overhead [dispatches]
+"""
+
+import logging
+import os
+import sys
+import time
+
+from oslo_config import cfg
+
+from st2mistral import config
+from st2mistral.utils import logutils
+
+LOG = logging.getLogger('st2mistral.benchmarks.logging_overhead')
+
+
+def eager(parameters, st2_context, content):
+    for msg in ['Running', 'Sending HTTP request for']:
+        LOG.info(
+            '%s St2Action [ref=%s, parameters=%s, st2_context=%s]' % (
+                msg, 'core.noop', parameters, st2_context
+            )
+        )
+
+    LOG.info(
+        'Received HTTP response for St2Action [ref=%s, parameters=%s, '
+        'st2_context=%s]:\n%s\n%s' % (
+            'core.noop', parameters, st2_context, 201, content
+        )
+    )
+
+
+def lazy(parameters, st2_context, content):
+    for msg in ['Running', 'Sending HTTP request for']:
+        logutils.log(
+            LOG, logging.INFO,
+            '%s St2Action [ref=%s, parameters=%s, st2_context=%s]',
+            msg, 'core.noop', logutils.cap(parameters),
+            logutils.cap(st2_context), sample=True
+        )
+
+    logutils.log(
+        LOG, logging.INFO,
+        'Received HTTP response for St2Action [ref=%s, parameters=%s, '
+        'st2_context=%s]:\n%s\n%s',
+        'core.noop', logutils.cap(parameters), logutils.cap(st2_context),
+        201, logutils.cap(content), sample=True
+    )
+
+
+def run(func, num_dispatches):
+    parameters = {'items': ['item-%s' % i for i in range(2000)]}
+    st2_context = {
+        'api_url': 'http://127.0.0.1:9101/v1',
+        'parent': dict(('k%s' % i, 'v' * 20) for i in range(200))
+    }
+    content = b'{"result": "' + b'x' * 100000 + b'"}'
+
+    started = time.process_time()
+
+    for i in range(num_dispatches):
+        func(parameters, st2_context, content)
+
+    return (time.process_time() - started) / num_dispatches * 1000000
+
+
+def main(num_dispatches=500):
+    cfg.CONF.register_opts(config.st2_opts, group='st2')
+    handler = logging.FileHandler(os.devnull)
+    LOG.addHandler(handler)
+    LOG.propagate = False
+
+    for level in [logging.INFO, logging.WARNING]:
+        LOG.setLevel(level)
+
+        for name, func in [('eager', eager), ('lazy', lazy)]:
+            cpu = run(func, num_dispatches)
+            print('%-5s %-7s %10.1f usec CPU per dispatch' % (
+                logging.getLevelName(level), name, cpu
+            ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
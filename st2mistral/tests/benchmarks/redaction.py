@@ -0,0 +1,104 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the bytes allocated per dispatch for the log-safe st2 context.
+
+The st2 context of a workflow with a large parent context and notify
+settings is made log-safe by a deep copy without the auth token or by
+the redacted view, and kept on a St2Action-like instance with a dict or
+with slots.
+
+Usage: python -m st2mistral.tests.benchmarks.redaction [dispatches]
+"""
+
+import copy
+import sys
+import tracemalloc
+
+from st2mistral.utils import redact
+
+
+class DictAction(object):
+
+    def __init__(self, ref, parameters, st2_context):
+        self.ref = ref
+        self.parameters = parameters
+        self.st2_context = st2_context
+        self.st2_context_log_safe = copy.deepcopy(st2_context)
+        self.st2_context_log_safe.pop('auth_token', None)
+
+
+class SlotsAction(object):
+
+    __slots__ = ('ref', 'parameters', 'st2_context', 'st2_context_log_safe')
+
+    def __init__(self, ref, parameters, st2_context):
+        self.ref = ref
+        self.parameters = parameters
+        self.st2_context = st2_context
+        self.st2_context_log_safe = redact.RedactedView(st2_context)
+
+
+def get_st2_context():
+    return {
+        'api_url': 'http://127.0.0.1:9101/v1',
+        'auth_token': 'foobar',
+        'endpoint': 'http://127.0.0.1:9101/v1/actionexecutions',
+        'notify': {
+            'on-complete': {
+                'routes': ['slack', 'email'],
+                'message': 'Task completed.',
+                'data': dict(('k%s' % i, 'v%s' % i) for i in range(20))
+            }
+        },
+        'skip_notify_tasks': ['task%s' % i for i in range(20)],
+        'parent': {
+            'execution_id': '5a1b2c3d4e5f6a7b8c9d0e1f',
+            'user': 'stanley',
+            'pack': 'examples',
+            'trigger': dict(('k%s' % i, 'v%s' % i) for i in range(50)),
+            'parameters': dict(
+                ('p%s' % i, ['item%s' % j for j in range(10)])
+                for i in range(50)
+            )
+        }
+    }
+
+
+def run(action_cls, num_dispatches):
+    st2_context = get_st2_context()
+    actions = []
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    for i in range(num_dispatches):
+        actions.append(action_cls('core.noop', {'i': i}, st2_context))
+
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    return allocated / float(num_dispatches)
+
+
+def main(num_dispatches=1000):
+    for name, action_cls in [('deepcopy', DictAction),
+                             ('view', SlotsAction)]:
+        allocated = run(action_cls, num_dispatches)
+        print('%-9s %10.0f bytes allocated per dispatch' % (name, allocated))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,141 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the size and serialization time of the St2Action result.
+
+The result of the st2 response to an execution request is built with the
+full and compact profiles, with and without a content budget, and
+serialized to JSON the way Mistral stores it in the database.
+
+Usage: python -m st2mistral.tests.benchmarks.result_profile [number]
+"""
+
+import datetime
+import json
+import sys
+import timeit
+
+import requests
+from requests import structures
+
+from oslo_config import cfg
+
+from st2mistral import config
+from st2mistral.utils import jsonutils
+from st2mistral.utils import results
+
+
+def get_response():
+    execution = {
+        'id': '5a1b2c3d4e5f6a7b8c9d0e1f',
+        'status': 'requested',
+        'start_timestamp': '2017-01-01T00:00:00.000000Z',
+        'action': {
+            'ref': 'core.local',
+            'description': 'Action that executes an arbitrary Linux command '
+                           'on the localhost.',
+            'runner_type': 'local-shell-cmd',
+            'parameters': dict(
+                ('p%s' % i, {'type': 'string', 'description': 'x' * 60})
+                for i in range(15)
+            )
+        },
+        'runner': {
+            'name': 'local-shell-cmd',
+            'description': 'A runner to execute local actions as a fixed '
+                           'user.',
+            'runner_parameters': dict(
+                ('r%s' % i, {'type': 'string', 'description': 'y' * 60})
+                for i in range(15)
+            )
+        },
+        'liveaction': {
+            'id': '5a1b2c3d4e5f6a7b8c9d0e20',
+            'action': 'core.local',
+            'parameters': {'cmd': 'echo foobar'}
+        },
+        'parameters': {'cmd': 'echo foobar'},
+        'context': {'user': 'stanley', 'pack': 'core'},
+        'web_url': 'https://st2.example.com/#/history/5a1b2c3d4e5f6a7b8c9d0e1f'
+    }
+
+    content = jsonutils.encode(execution)
+
+    resp = requests.Response()
+    resp.status_code = 201
+    resp.reason = 'Created'
+    resp.url = 'http://127.0.0.1:9101/v1/executions'
+    resp.encoding = 'utf-8'
+    resp.elapsed = datetime.timedelta(milliseconds=15)
+    resp.headers = structures.CaseInsensitiveDict({
+        'Access-Control-Allow-Origin': 'http://127.0.0.1:3000',
+        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,'
+                                        'X-Auth-Token,St2-Api-Key,'
+                                        'X-Request-ID',
+        'Access-Control-Expose-Headers': 'Content-Type,X-Limit,'
+                                         'X-Total-Count,X-Request-ID',
+        'Content-Type': 'application/json',
+        'Content-Length': str(len(content)),
+        'Date': 'Sun, 01 Jan 2017 00:00:00 GMT',
+        'X-Request-ID': '2a5c8d6e-7f80-4b91-a2c3-d4e5f6a7b8c9'
+    })
+
+    return resp, content
+
+
+def get_result(resp, content):
+    content, truncated = results.truncate(content)
+
+    if not truncated:
+        content = jsonutils.loads(content)
+
+    return results.build(resp, content, truncated=truncated)
+
+
+def serialize(result):
+    # Mistral falls back to the string of the values JSON cannot serialize
+    # (i.e. the responses of the redirect history).
+    return json.dumps(result, default=str)
+
+
+def main(number=20000):
+    cfg.CONF.register_opts(config.st2_opts, group='st2')
+    resp, content = get_response()
+
+    profiles = [
+        ('full', 'full', 0),
+        ('compact', 'compact', 0),
+        ('compact 512B', 'compact', 512)
+    ]
+
+    for name, profile, max_bytes in profiles:
+        cfg.CONF.set_override('action_result_profile', profile, group='st2')
+        cfg.CONF.set_override(
+            'action_result_content_max_bytes', max_bytes, group='st2'
+        )
+
+        row = serialize(get_result(resp, content))
+        elapsed = timeit.timeit(
+            lambda: serialize(get_result(resp, content)), number=number
+        )
+
+        print('%-13s %6d bytes per row %8.1f usec to build and serialize' % (
+            name, len(row.encode('utf-8')), elapsed * 1000000 / number
+        ))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,111 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the cold start token validation of the Mistral API workers.
+
+Each worker process authenticates the same requests as the Mistral auth
+plugin does against a stub st2 auth which takes 10 msec per validation.
+The tokens are cached per worker process or shared in a SQLite file.
+
+Usage: python -m st2mistral.tests.benchmarks.token_cache [workers] [tokens]
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import cache
+from st2mistral.utils import http
+
+
+def authenticate(token_cache, url, token):
+    key = cache.get_digest(token)
+
+    if token_cache.get(key):
+        return
+
+    http.post(url, {'token': token})
+    token_cache.set(key, True)
+
+
+def worker(path, url, tokens, num_requests):
+    if path:
+        token_cache = cache.SharedTTLCache('auth_token', path)
+    else:
+        token_cache = cache.TTLCache('auth_token')
+
+    for i in range(num_requests):
+        authenticate(token_cache, url, random.choice(tokens))
+
+
+def run(server, path, num_workers, num_tokens, num_requests=500):
+    url = server.url + '/tokens/validate'
+    tokens = ['token-%s' % i for i in range(num_tokens)]
+    del server.requests[:]
+
+    processes = [
+        multiprocessing.Process(
+            target=worker, args=(path, url, tokens, num_requests)
+        )
+        for i in range(num_workers)
+    ]
+
+    started = time.time()
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    elapsed = time.time() - started
+
+    return len(server.requests), num_workers * num_requests / elapsed
+
+
+def main(num_workers=8, num_tokens=100):
+    cfg.CONF.set_override('circuit_breaker_enabled', False, group='st2')
+    tmp_dir = tempfile.mkdtemp()
+
+    def handler(*args):
+        time.sleep(0.01)
+        return 200, {'valid': True}
+
+    server = base.StubServer(handler).start()
+
+    try:
+        for name, path in [
+            ('per process', None),
+            ('shared', os.path.join(tmp_dir, 'tokens.sqlite'))
+        ]:
+            validations, rate = run(server, path, num_workers, num_tokens)
+            print(
+                '%-12s %5d validations sent to st2 auth, %6.0f requests '
+                'authenticated per second' % (name, validations, rate)
+            )
+    finally:
+        server.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
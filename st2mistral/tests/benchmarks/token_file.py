@@ -0,0 +1,71 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the token overhead of each mistral CLI invocation.
+
+Each invocation either mints a token from a stub st2 auth which takes 20
+msec per token, as the batch tooling does today, or gets the token from
+the cache file of the mistralclient plugin.
+
+Usage: python -m st2mistral.tests.benchmarks.token_file [invocations]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import tokenfile
+
+
+def run(invoke, num_invocations):
+    started = time.time()
+
+    for i in range(num_invocations):
+        invoke()
+
+    return (time.time() - started) / num_invocations * 1000
+
+
+def main(num_invocations=200):
+    tmp_dir = tempfile.mkdtemp()
+    path = os.path.join(tmp_dir, 'mistral-token')
+
+    def handler(*args):
+        time.sleep(0.02)
+        return 201, {'token': 'foobar', 'expiry': '2030-01-01T00:00:00Z'}
+
+    server = base.StubServer(handler).start()
+    auth_url = server.url + '/auth'
+
+    def mint():
+        return tokenfile.mint_token(auth_url, 'st2', 'pass')
+
+    def invoke_cached():
+        tokenfile.TokenFile(path).get_token(mint)
+
+    try:
+        for name, invoke in [('mint', mint), ('cached', invoke_cached)]:
+            overhead = run(invoke, num_invocations)
+            print('%-7s %8.3f msec per invocation' % (name, overhead))
+    finally:
+        server.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,70 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark requests per second to a local stub st2 API over TCP and UDS.
+
+Usage: python -m st2mistral.tests.benchmarks.unix_socket [requests]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo_config import cfg
+
+from st2mistral.tests.unit import base
+from st2mistral.utils import http
+
+
+def run(server, url, num_requests, keep_alive=True):
+    body = {'action': 'core.noop', 'parameters': {'cmd': 'echo foobar'}}
+    started = time.time()
+
+    for i in range(num_requests):
+        if not keep_alive:
+            http.reset_sessions()
+
+        http.post(url + '/v1/executions', body)
+
+    elapsed = time.time() - started
+    http.reset_sessions()
+
+    return num_requests / elapsed
+
+
+def main(num_requests=2000):
+    cfg.CONF.set_override('circuit_breaker_enabled', False, group='st2')
+    tmp_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(tmp_dir, 'st2api.sock')
+    tcp_server = base.StubServer().start()
+    unix_server = base.StubServer(socket_path=socket_path).start()
+
+    try:
+        for keep_alive in [False, True]:
+            print('Keep-alive %s' % ('enabled' if keep_alive else 'disabled'))
+
+            for name, server in [('tcp', tcp_server), ('uds', unix_server)]:
+                rps = run(server, server.url, num_requests, keep_alive)
+                print('%-6s %8.0f requests per second' % (name, rps))
+    finally:
+        tcp_server.stop()
+        unix_server.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
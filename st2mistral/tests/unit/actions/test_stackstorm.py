@@ -0,0 +1,75 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from st2mistral.tests.unit import base
+
+base.stub_mistral()
+
+from st2mistral.actions import stackstorm
+
+
+class FakeTaskExecution(object):
+
+    def __init__(self, task_id):
+        self.id = task_id
+        self.name = 'task-%s' % task_id
+
+
+class TaskNameTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(TaskNameTestCase, self).setUp()
+        stackstorm.reset_task_names()
+        self.addCleanup(stackstorm.reset_task_names)
+
+        self.queries = []
+
+        def get_task_execution(task_id):
+            self.queries.append(task_id)
+            return FakeTaskExecution(task_id)
+
+        original = stackstorm.db_v2_api.get_task_execution
+        stackstorm.db_v2_api.get_task_execution = get_task_execution
+        self.addCleanup(
+            setattr, stackstorm.db_v2_api, 'get_task_execution', original
+        )
+
+    def test_task_name_cached(self):
+        # The items of a with-items task look up the same task execution.
+        for i in range(1000):
+            self.assertEqual(stackstorm._get_task_name('t1'), 'task-t1')
+
+        self.assertEqual(self.queries, ['t1'])
+
+        self.assertEqual(stackstorm._get_task_name('t2'), 'task-t2')
+        self.assertEqual(self.queries, ['t1', 't2'])
+
+    def test_cache_disabled(self):
+        self.override_config('action_task_cache_size', 0)
+
+        for i in range(1000):
+            self.assertEqual(stackstorm._get_task_name('t1'), 'task-t1')
+
+        self.assertEqual(len(self.queries), 1000)
+
+    def test_cache_size(self):
+        self.override_config('action_task_cache_size', 1)
+
+        for i in range(10):
+            stackstorm._get_task_name('t1')
+            stackstorm._get_task_name('t2')
+
+        # The names of the tasks evict each other.
+        self.assertEqual(len(self.queries), 20)
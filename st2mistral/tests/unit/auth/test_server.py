@@ -0,0 +1,170 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from st2mistral.tests.unit import base
+
+base.stub_mistral()
+
+from mistral import exceptions as exc
+
+from st2mistral.auth import server
+from st2mistral.utils import cache
+
+
+class FakeRequest(object):
+
+    def __init__(self, token):
+        self.headers = {'X-Auth-Token': token}
+
+
+class St2AuthHandlerTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(St2AuthHandlerTestCase, self).setUp()
+        server.reset_caches()
+        self.addCleanup(server.reset_caches)
+
+        self.status = 200
+        self.delay = 0
+
+        def handler(method, path, headers, body):
+            time.sleep(self.delay)
+            return self.status, {'valid': b'"good"' in body}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+        self.override_config('auth_url', self.server.url)
+        self.override_config('auth_retry_stop_max_msec', 0)
+        self.handler = server.St2AuthHandler()
+
+    def authenticate(self, token):
+        self.handler.authenticate(FakeRequest(token))
+
+    def assertRejected(self, token):
+        self.assertRaises(
+            exc.UnauthorizedException, self.authenticate, token
+        )
+
+    def test_valid_token_cached(self):
+        self.authenticate('good')
+        self.authenticate('good')
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(
+            server.get_token_cache().get(cache.get_digest('good'))
+        )
+
+    def test_rejected_token_cached(self):
+        self.assertRejected('bad')
+        self.assertRejected('bad')
+
+        # The token rejected by st2 auth is not validated again.
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(
+            server.get_rejected_token_cache().get(cache.get_digest('bad'))
+        )
+
+    def test_rejected_token_expired(self):
+        self.override_config('rejected_token_ttl_sec', 1)
+
+        self.assertRejected('bad')
+        self.assertRejected('bad')
+        self.assertEqual(len(self.server.requests), 1)
+
+        time.sleep(1.1)
+        self.assertRejected('bad')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_rejected_token_cache_size(self):
+        self.override_config('rejected_token_cache_size', 1)
+
+        self.assertRejected('bad1')
+        self.assertRejected('bad2')
+
+        # The first token was evicted by the second one.
+        self.assertRejected('bad2')
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertRejected('bad1')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_server_error_not_cached(self):
+        self.status = 500
+
+        self.assertRejected('good')
+        self.assertRejected('good')
+        self.assertEqual(len(self.server.requests), 2)
+
+        # The token is validated once st2 auth is back.
+        self.status = 200
+        self.authenticate('good')
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertIsNone(
+            server.get_rejected_token_cache().get(cache.get_digest('good'))
+        )
+
+    def test_connection_error_not_cached(self):
+        self.server.stop()
+
+        self.assertRaises(Exception, self.authenticate, 'bad')
+        self.assertRaises(Exception, self.authenticate, 'bad')
+
+        self.assertIsNone(
+            server.get_rejected_token_cache().get(cache.get_digest('bad'))
+        )
+        self.assertEqual(len(server.get_rejected_token_cache()), 0)
+
+    def test_concurrent_validations_coalesced(self):
+        self.delay = 0.2
+        errors = []
+
+        def authenticate():
+            try:
+                self.authenticate('good')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=authenticate) for i in range(10)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_hot_token_refreshed_ahead(self):
+        self.override_config('eventlet_cooperative', False)
+        self.override_config('token_ttl_sec', 60)
+        self.override_config('token_refresh_ahead_sec', 120)
+
+        self.authenticate('good')
+
+        # The cached validation is used while the token is validated again
+        # in the background.
+        self.authenticate('good')
+
+        for i in range(100):
+            if len(self.server.requests) >= 2:
+                break
+
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.server.requests), 2)
@@ -0,0 +1,229 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import sys
+import threading
+import types
+import unittest2
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+from six.moves.urllib import parse as urlparse
+
+from oslo_config import cfg
+
+from st2mistral import config
+from st2mistral.utils import circuit
+from st2mistral.utils import endpoints
+from st2mistral.utils import green
+from st2mistral.utils import http
+from st2mistral.utils import metrics
+
+
+def register_opts():
+    # The st2 options are registered directly because config.register_opts
+    # also imports the api options from mistral which is not required here.
+    if 'st2' not in cfg.CONF:
+        cfg.CONF.register_opts(config.st2_opts, group='st2')
+
+
+register_opts()
+
+
+def _add_stub_module(name, **attrs):
+    module = sys.modules.get(name)
+
+    if module is None:
+        module = types.ModuleType(name)
+        sys.modules[name] = module
+
+        if '.' in name:
+            parent, child = name.rsplit('.', 1)
+            setattr(_add_stub_module(parent), child, module)
+
+    for attr, value in attrs.items():
+        setattr(module, attr, value)
+
+    return module
+
+
+def stub_mistral():
+    """Stub the mistral modules imported by the plugins if not installed.
+
+    The stubs only provide what the plugins use so the plugins can be
+    tested without mistral. The functions of the stubs raise unless they
+    are replaced by the tests. The real modules are used if installed.
+    """
+    try:
+        import mistral  # noqa
+        return
+    except ImportError:
+        pass
+
+    if 'mistral' in sys.modules:
+        return
+
+    def not_stubbed(*args, **kwargs):
+        raise NotImplementedError('Not stubbed.')
+
+    class MistralException(Exception):
+        pass
+
+    class Result(object):
+
+        def __init__(self, data=None, error=None):
+            self.data = data
+            self.error = error
+
+    cfg.CONF.register_opts(
+        [cfg.StrOpt('host'), cfg.IntOpt('port')], group='api'
+    )
+
+    _add_stub_module('mistral.config')
+    _add_stub_module('mistral.auth', AuthHandler=object)
+    _add_stub_module(
+        'mistral.exceptions',
+        MistralException=MistralException,
+        ActionException=type('ActionException', (MistralException,), {}),
+        NotFoundException=type('NotFoundException', (MistralException,), {}),
+        UnauthorizedException=type(
+            'UnauthorizedException', (MistralException,), {}
+        )
+    )
+    _add_stub_module(
+        'mistral.db.v2.api',
+        get_execution=not_stubbed,
+        get_task_execution=not_stubbed
+    )
+    _add_stub_module('mistral.rpc.clients', get_engine_client=not_stubbed)
+    _add_stub_module('mistral.workflow.utils', Result=Result)
+    _add_stub_module('mistral_lib.actions', Action=object)
+
+
+class St2TestCase(unittest2.TestCase):
+    """Test case which resets the state shared by the HTTP client.
+
+    The sessions, circuit breakers, endpoint groups, in-flight limiter and
+    metrics of the process are reset before and after each test.
+    """
+
+    def setUp(self):
+        super(St2TestCase, self).setUp()
+
+        for reset in (http.reset_sessions, circuit.reset_breakers,
+                      endpoints.reset_groups, green.reset_limiter,
+                      metrics.reset):
+            reset()
+            self.addCleanup(reset)
+
+    def override_config(self, name, value, group='st2'):
+        cfg.CONF.set_override(name, value, group=group)
+        self.addCleanup(cfg.CONF.clear_override, name, group=group)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on purpose (i.e. timeouts) are expected.
+        pass
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn,
+                               socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class StubServer(object):
+    """Local keep-alive HTTP server which mimics the st2 API.
+
+    The handler is a callable which takes the method, path, headers and
+    raw body of the request and returns a tuple of status code and the
+    response body. The response body is serialized to JSON if it is not
+    a string. All the requests received are kept in the requests list.
+    The server listens on the Unix domain socket if a path is provided.
+    """
+
+    def __init__(self, handler=None, socket_path=None):
+        self.handler = handler or (lambda *args: (200, {}))
+        self.requests = []
+        self.lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Avoid the delayed ACK stall of the keep-alive responses.
+            disable_nagle_algorithm = not socket_path
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else b''
+
+                with stub.lock:
+                    stub.requests.append(
+                        (self.command, self.path, dict(self.headers), body)
+                    )
+
+                status, content = stub.handler(
+                    self.command, self.path, self.headers, body
+                )
+
+                if not isinstance(content, bytes):
+                    if not isinstance(content, str):
+                        content = json.dumps(content)
+                    content = content.encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = _handle
+
+        if socket_path:
+            self.server = _ThreadingUnixHTTPServer(socket_path, Handler)
+        else:
+            self.server = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+
+        self.socket_path = socket_path
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        if self.socket_path:
+            return 'http+unix://%s' % urlparse.quote(self.socket_path, '')
+
+        return 'http://%s:%s' % self.server.server_address
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
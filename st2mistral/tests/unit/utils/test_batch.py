@@ -0,0 +1,171 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import time
+
+import requests
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import batch
+from st2mistral.utils import http
+
+
+class BatchDispatchTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(BatchDispatchTestCase, self).setUp()
+        self.override_config('eventlet_cooperative', False)
+        self.override_config('action_batch_window_msec', 50)
+        self.override_config('retry_stop_max_msec', 0)
+        batch.reset()
+        self.addCleanup(batch.reset)
+
+        self.batch_status = 200
+
+        def handler(method, path, headers, body):
+            if self.batch_status != 200:
+                return self.batch_status, {'faultstring': 'foobar'}
+
+            items = json.loads(body.decode('utf-8'))
+
+            return 200, [
+                {'status': 201, 'body': {'action': i['body']['action']}}
+                for i in items
+            ]
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+        self.api_url = self.server.url + '/api/v1'
+
+    def dispatch_all(self, num_calls):
+        results = [None] * num_calls
+
+        def target(i):
+            results[i] = batch.dispatch(
+                self.api_url, {'action': 'core.a%s' % i}, {'parent': i},
+                token='foobar'
+            )
+
+        threads = [
+            threading.Thread(target=target, args=(i,))
+            for i in range(num_calls)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_disabled(self):
+        self.override_config('action_batch_window_msec', 0)
+
+        self.assertIsNone(batch.dispatch(self.api_url, {}, {}))
+        self.assertEqual(len(self.server.requests), 0)
+
+    def test_batched(self):
+        results = self.dispatch_all(10)
+
+        self.assertEqual(len(self.server.requests), 1)
+        method, path, headers, body = self.server.requests[0]
+        self.assertEqual(path, '/api/v1/executions/batch')
+        self.assertEqual(headers['X-Auth-Token'], 'foobar')
+        self.assertEqual(len(json.loads(body.decode('utf-8'))), 10)
+
+        for i, resp in enumerate(results):
+            self.assertEqual(resp.status_code, 201)
+            self.assertDictEqual(resp.json(), {'action': 'core.a%s' % i})
+
+            content, truncated = http.read_content(resp, 10)
+            self.assertEqual(content, resp.content[:10])
+            self.assertTrue(truncated)
+
+    def test_idempotency_key(self):
+        self.override_config('action_batch_max_size', 1)
+
+        batch.dispatch(
+            self.api_url, {'action': 'core.a'}, {}, idempotency_key='foo'
+        )
+        batch.dispatch(self.api_url, {'action': 'core.b'}, {})
+
+        items = [
+            json.loads(r[3].decode('utf-8'))[0] for r in self.server.requests
+        ]
+
+        self.assertEqual(items[0]['idempotency_key'], 'foo')
+        self.assertNotIn('idempotency_key', items[1])
+
+    def test_flushed_when_full(self):
+        self.override_config('action_batch_window_msec', 10000)
+        self.override_config('action_batch_max_size', 5)
+
+        started = time.time()
+        results = self.dispatch_all(5)
+
+        self.assertLess(time.time() - started, 5)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual([r.status_code for r in results], [201] * 5)
+
+    def test_batch_endpoint_not_available(self):
+        self.batch_status = 404
+
+        self.assertEqual(self.dispatch_all(5), [None] * 5)
+        self.assertEqual(len(self.server.requests), 1)
+
+        # The batch endpoint is not tried again.
+        self.assertIsNone(batch.dispatch(self.api_url, {}, {}))
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_batch_error(self):
+        self.batch_status = 500
+
+        for resp in self.dispatch_all(3):
+            self.assertEqual(resp.status_code, 500)
+            self.assertDictEqual(resp.json(), {'faultstring': 'foobar'})
+
+    def test_unknown_outcome(self):
+        self.override_config('action_batch_max_size', 3)
+
+        # The outcome of the executions is unknown but the batch was
+        # accepted so they are not sent again individually.
+        self.server.handler = lambda *args: (200, [{'status': 201}])
+
+        for resp in self.dispatch_all(3):
+            self.assertEqual(resp.status_code, 502)
+
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.server.handler = lambda *args: (
+            200, [{'status': 201, 'body': {}}, 'foobar', {'body': {}}]
+        )
+
+        results = self.dispatch_all(3)
+        self.assertEqual(
+            sorted(r.status_code for r in results), [201, 502, 502]
+        )
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_connection_error(self):
+        self.server.stop()
+
+        self.assertRaises(
+            requests.exceptions.ConnectionError,
+            batch.dispatch, self.api_url, {}, {}
+        )
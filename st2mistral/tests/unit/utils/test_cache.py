@@ -0,0 +1,232 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import cache
+from st2mistral.utils import metrics
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(TTLCacheTestCase, self).setUp()
+        self.clock = FakeClock()
+        self.cache = cache.TTLCache(
+            'test', max_size=3, ttl=60, clock=self.clock
+        )
+
+    def get_count(self, name, **labels):
+        labels['cache'] = 'test'
+        key = (name, tuple(sorted(labels.items())))
+
+        return metrics.get_stats().get(key, 0)
+
+    def test_get_digest(self):
+        digest = cache.get_digest(u'foobar')
+
+        self.assertEqual(digest, cache.get_digest(b'foobar'))
+        self.assertEqual(len(digest), 64)
+        self.assertNotIn('foobar', digest)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get('k1'))
+        self.cache.set('k1', 'v1')
+        self.assertEqual(self.cache.get('k1'), 'v1')
+        self.assertIn('k1', self.cache)
+
+        self.assertEqual(self.get_count('cache_hits_total'), 1)
+        self.assertEqual(self.get_count('cache_misses_total'), 1)
+
+    def test_get_with_expiry(self):
+        self.assertEqual(self.cache.get_with_expiry('k1'), (None, None))
+        self.cache.set('k1', 'v1')
+        self.clock.now += 10
+
+        self.assertEqual(self.cache.get_with_expiry('k1'), ('v1', 1060.0))
+
+    def test_expired(self):
+        self.cache.set('k1', 'v1')
+        self.cache.set('k2', 'v2', ttl=120)
+        self.clock.now += 60
+
+        self.assertNotIn('k1', self.cache)
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(self.cache.get('k2'), 'v2')
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(
+            self.get_count('cache_evictions_total', reason='expired'), 1
+        )
+
+    def test_evict_least_recently_used(self):
+        for key in ['k1', 'k2', 'k3']:
+            self.cache.set(key, key)
+
+        self.cache.get('k1')
+        self.cache.set('k4', 'k4')
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get('k2'))
+
+        for key in ['k1', 'k3', 'k4']:
+            self.assertEqual(self.cache.get(key), key)
+
+        self.assertEqual(
+            self.get_count('cache_evictions_total', reason='capacity'), 1
+        )
+
+    def test_disabled(self):
+        self.cache.ttl = 0
+        self.cache.set('k1', 'v1')
+
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_delete_and_clear(self):
+        self.cache.set('k1', 'v1')
+        self.cache.set('k2', 'v2')
+        self.cache.delete('k1')
+        self.cache.delete('k3')
+
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+class SharedTTLCacheTestCase(TTLCacheTestCase):
+
+    def setUp(self):
+        super(SharedTTLCacheTestCase, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.path = os.path.join(tmp_dir, 'tokens.sqlite')
+        self.cache = self.create_cache()
+
+    def create_cache(self):
+        return cache.SharedTTLCache(
+            'test', self.path, max_size=3, ttl=60, clock=self.clock
+        )
+
+    def test_expired(self):
+        self.cache.set('k1', 'v1')
+        self.cache.set('k2', 'v2', ttl=120)
+        self.clock.now += 60
+
+        self.assertNotIn('k1', self.cache)
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(self.cache.get('k2'), 'v2')
+        self.assertEqual(len(self.cache), 1)
+
+    def test_evict_least_recently_used(self):
+        # The entries closest to expire are evicted first.
+        for i, key in enumerate(['k1', 'k2', 'k3']):
+            self.cache.set(key, key, ttl=60 + i)
+
+        self.cache.get('k1')
+        self.cache.set('k4', 'k4')
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(
+            self.get_count('cache_evictions_total', reason='capacity'), 1
+        )
+
+    def test_shared_between_instances(self):
+        other = self.create_cache()
+        self.cache.set('k1', {'valid': True})
+
+        self.assertEqual(other.get('k1'), {'valid': True})
+
+        other.delete('k1')
+        self.assertIsNone(self.cache.get('k1'))
+
+    def test_shared_between_processes(self):
+        def worker(start):
+            shared = cache.SharedTTLCache('test', self.path, max_size=1000)
+
+            for i in range(start, start + 50):
+                shared.set('k%s' % i, i)
+
+        processes = [
+            multiprocessing.Process(target=worker, args=(i * 50,))
+            for i in range(4)
+        ]
+
+        threads = [
+            threading.Thread(target=worker, args=(200 + i * 50,))
+            for i in range(2)
+        ]
+
+        for worker_ in processes + threads:
+            worker_.start()
+
+        for worker_ in processes + threads:
+            worker_.join()
+
+        for process in processes:
+            self.assertEqual(process.exitcode, 0)
+
+        shared = cache.SharedTTLCache('test', self.path, max_size=1000)
+        self.assertEqual(len(shared), 300)
+        self.assertEqual(shared.get('k123'), 123)
+
+    def test_database_error(self):
+        self.cache = cache.SharedTTLCache(
+            'test', os.path.join(self.path, 'foobar')
+        )
+
+        self.cache.set('k1', 'v1')
+
+        self.assertIsNone(self.cache.get('k1'))
+        self.assertEqual(len(self.cache), 0)
+        self.assertGreater(self.get_count('cache_errors_total'), 0)
+
+    def test_file_mode(self):
+        self.cache.set('k1', 'v1')
+
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_unsafe_file(self):
+        path = os.path.join(os.path.dirname(self.path), 'unsafe.sqlite')
+        shared = cache.SharedTTLCache('test', path, clock=self.clock)
+        shared.set('k1', 'v1')
+
+        # The entries of a file others can write to are not trusted.
+        os.chmod(path, 0o622)
+        shared = cache.SharedTTLCache('test', path, clock=self.clock)
+
+        self.assertIsNone(shared.get('k1'))
+        shared.set('k2', 'v2')
+        self.assertIsNone(shared.get('k2'))
+        self.assertGreater(self.get_count('cache_errors_total'), 0)
@@ -0,0 +1,137 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import circuit
+from st2mistral.utils import http
+from st2mistral.utils import metrics
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(CircuitBreakerTestCase, self).setUp()
+        self.clock = FakeClock()
+        self.breaker = circuit.CircuitBreaker(
+            'http://st2', failure_threshold=3, reset_timeout=10,
+            clock=self.clock
+        )
+
+    def _fail(self, count):
+        for i in range(count):
+            self.breaker.before_call()
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self._fail(2)
+        self.breaker.record_success()
+        self._fail(2)
+        self.assertEqual(self.breaker.state, circuit.CLOSED)
+
+        self._fail(1)
+        self.assertEqual(self.breaker.state, circuit.OPEN)
+        self.assertRaises(circuit.CircuitOpenError, self.breaker.before_call)
+
+    def test_half_open_trial_success_closes(self):
+        self._fail(3)
+        self.clock.now += 10
+        self.assertEqual(self.breaker.state, circuit.HALF_OPEN)
+
+        self.breaker.before_call()
+        self.assertRaises(circuit.CircuitOpenError, self.breaker.before_call)
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, circuit.CLOSED)
+        self.breaker.before_call()
+
+    def test_half_open_trial_failure_reopens(self):
+        self._fail(3)
+        self.clock.now += 10
+        self.breaker.before_call()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, circuit.OPEN)
+
+        self.clock.now += 5
+        self.assertRaises(circuit.CircuitOpenError, self.breaker.before_call)
+
+    def test_transition_counters(self):
+        self._fail(3)
+        self.clock.now += 10
+        self.breaker.before_call()
+        self.breaker.record_success()
+
+        def count(from_state, to_state):
+            key = ('http_circuit_transitions_total', (
+                ('from_state', from_state),
+                ('pool', 'http://st2'),
+                ('to_state', to_state)
+            ))
+
+            return metrics.get_stats().get(key, 0)
+
+        self.assertEqual(count(circuit.CLOSED, circuit.OPEN), 1)
+        self.assertEqual(count(circuit.OPEN, circuit.HALF_OPEN), 1)
+        self.assertEqual(count(circuit.HALF_OPEN, circuit.CLOSED), 1)
+
+
+class HTTPCircuitBreakerTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(HTTPCircuitBreakerTestCase, self).setUp()
+        self.override_config('circuit_failure_threshold', 2)
+        self.override_config('retry_exp_msec', 1)
+        self.override_config('retry_exp_max_msec', 1)
+        self.override_config('retry_stop_max_msec', 100)
+        self.server = base.StubServer(lambda *args: (503, {})).start()
+        self.addCleanup(self.server.stop)
+
+    def test_server_errors_open_circuit(self):
+        url = self.server.url + '/executions'
+
+        # The retries stop as soon as the circuit is opened.
+        self.assertRaises(circuit.CircuitOpenError, http.post, url, {})
+        self.assertRaises(circuit.CircuitOpenError, http.post, url, {})
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_circuit_per_base_url(self):
+        self.server.handler = lambda method, path, *args: (
+            (503, {}) if path.startswith('/api/') else (200, {})
+        )
+
+        self.assertRaises(
+            circuit.CircuitOpenError,
+            http.post, self.server.url + '/api/v1/executions', {}
+        )
+
+        # The auth served by the same host is still reachable.
+        resp = http.post(self.server.url + '/auth/v1/tokens/validate', {})
+        self.assertEqual(resp.status_code, 200)
+
+    def test_disabled(self):
+        self.override_config('circuit_breaker_enabled', False)
+        url = self.server.url + '/executions'
+
+        self.assertEqual(http.post(url, {}).status_code, 503)
+        self.assertGreater(len(self.server.requests), 2)
@@ -0,0 +1,220 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import concurrency
+from st2mistral.utils import metrics
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class AdaptiveLimiterTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(AdaptiveLimiterTestCase, self).setUp()
+        self.clock = FakeClock()
+        self.limiter = concurrency.AdaptiveLimiter(
+            'http://st2', initial_limit=4, max_limit=10, max_wait=0.05,
+            clock=self.clock
+        )
+
+    def _round_trip(self, latency, error=False):
+        started = [self.limiter.acquire() for i in range(self.limiter.limit)]
+        self.clock.now += latency
+
+        for s in started:
+            self.limiter.release(s, error=error)
+
+    def test_increased_while_used(self):
+        self._round_trip(1)
+        self.assertEqual(self.limiter.limit, 4)
+        self._round_trip(1)
+        self.assertEqual(self.limiter.limit, 5)
+
+        for i in range(20):
+            self._round_trip(1)
+
+        self.assertEqual(self.limiter.limit, 10)
+
+        # The limit is not increased while it is barely used.
+        limiter = concurrency.AdaptiveLimiter(
+            'http://st2', initial_limit=4, clock=self.clock
+        )
+
+        for i in range(10):
+            limiter.release(limiter.acquire())
+
+        self.assertEqual(limiter.limit, 4)
+
+    def test_decreased_once_per_round_trip_on_error(self):
+        self._round_trip(1, error=True)
+        self.assertEqual(self.limiter.limit, 3)
+        self._round_trip(1, error=True)
+        self.assertEqual(self.limiter.limit, 2)
+
+        for i in range(10):
+            self._round_trip(1, error=True)
+
+        self.assertEqual(self.limiter.limit, 1)
+
+        stats = metrics.get_stats()
+        key = (
+            'action_concurrency_decreases_total',
+            (('pool', 'http://st2'), ('reason', 'error'))
+        )
+        self.assertEqual(stats[key], 12)
+
+    def test_decreased_on_latency(self):
+        self._round_trip(1)
+        self._round_trip(1.5)
+        self.assertEqual(self.limiter.limit, 5)
+
+        self._round_trip(3)
+        self.assertEqual(self.limiter.limit, 3)
+
+    def test_queued_up_to_max_wait(self):
+        started = [self.limiter.acquire() for i in range(4)]
+        self.assertEqual(self.limiter.inflight, 4)
+
+        self.assertRaises(
+            concurrency.LimitExceededError, self.limiter.acquire
+        )
+
+        def release():
+            time.sleep(0.01)
+            self.limiter.release(started.pop())
+
+        thread = threading.Thread(target=release)
+        thread.start()
+        self.limiter.acquire()
+        thread.join()
+
+        self.assertEqual(self.limiter.inflight, 4)
+
+    def test_queue_drained_fairly(self):
+        limiter = concurrency.AdaptiveLimiter(
+            'http://st2', initial_limit=1, max_limit=1, max_wait=5,
+            clock=self.clock
+        )
+
+        served = []
+        started = [limiter.acquire()]
+        threads = []
+
+        def dispatch(flow, name, weight, i):
+            with limiter.slot(flow=flow, name=name, weight=weight):
+                served.append((flow, i))
+
+        def queue(flow, name, weight, i):
+            thread = threading.Thread(
+                target=dispatch, args=(flow, name, weight, i)
+            )
+
+            thread.start()
+            threads.append(thread)
+
+            # The calls are queued in order.
+            while limiter.queued < len(threads):
+                time.sleep(0.001)
+
+        # The fan-out of the first workflow is queued before the others.
+        for i in range(6):
+            queue('wf1', 'fanout', 1, i)
+
+        for i in range(2):
+            queue('wf2', 'small', 1, i)
+
+        for i in range(4):
+            queue('wf3', 'important', 2, i)
+
+        depth = metrics.get_gauges()[(
+            'action_queue_depth',
+            (('pool', 'http://st2'), ('workflow', 'fanout'))
+        )]
+
+        self.assertEqual(depth, 6)
+
+        limiter.release(started[0])
+
+        for thread in threads:
+            thread.join()
+
+        # The workflow weighted twice is served twice as often and the
+        # remaining items of the fan-out are served last.
+        self.assertListEqual(served, [
+            ('wf3', 0), ('wf1', 0), ('wf2', 0), ('wf3', 1),
+            ('wf3', 2), ('wf1', 1), ('wf2', 1), ('wf3', 3),
+            ('wf1', 2), ('wf1', 3), ('wf1', 4), ('wf1', 5)
+        ])
+
+        self.assertEqual(limiter.queued, 0)
+
+    def test_get_weight(self):
+        self.override_config(
+            'action_dispatch_weights', {'foo': '4', 'bar': 'x', 'baz': '0'}
+        )
+
+        self.assertEqual(concurrency.get_weight('foo'), 4.0)
+        self.assertEqual(concurrency.get_weight('bar'), 1.0)
+        self.assertEqual(concurrency.get_weight('baz'), 1.0)
+        self.assertEqual(concurrency.get_weight('qux'), 1.0)
+        self.assertEqual(concurrency.get_weight(None), 1.0)
+
+    def test_slot_flagged_on_error(self):
+        def fail():
+            with self.limiter.slot():
+                raise ValueError('foobar')
+
+        self._round_trip(1)
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(self.limiter.inflight, 0)
+        self.assertEqual(self.limiter.limit, 3)
+
+    def test_limit(self):
+        concurrency.reset_limiters()
+        self.addCleanup(concurrency.reset_limiters)
+
+        with concurrency.limit('http://st2/api/v1') as slot:
+            self.assertIsNone(slot.started)
+
+        self.assertIsNone(concurrency.get_limiter('http://st2/api/v1'))
+
+        self.override_config('action_adaptive_concurrency', True)
+        limiter = concurrency.get_limiter('http://st2/api/v1')
+
+        self.assertIs(limiter, concurrency.get_limiter('http://st2/auth/v1'))
+        self.assertEqual(limiter.limit, 20)
+
+        with concurrency.limit('http://st2/api/v1'):
+            self.assertEqual(limiter.inflight, 1)
+
+        self.assertEqual(limiter.inflight, 0)
+
+    def test_is_overloaded(self):
+        self.assertTrue(concurrency.is_overloaded(429))
+        self.assertTrue(concurrency.is_overloaded(503))
+        self.assertFalse(concurrency.is_overloaded(201))
+        self.assertFalse(concurrency.is_overloaded(404))
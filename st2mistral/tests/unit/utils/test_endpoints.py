@@ -0,0 +1,123 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import circuit
+from st2mistral.utils import endpoints
+from st2mistral.utils import http
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class EndpointGroupTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(EndpointGroupTestCase, self).setUp()
+        self.clock = FakeClock()
+        self.group = endpoints.EndpointGroup(
+            ['https://st2a/api', 'https://st2b/api/'], clock=self.clock
+        )
+
+    def test_match(self):
+        self.assertEqual(
+            self.group.match('https://st2b/api/executions'),
+            'https://st2b/api'
+        )
+        self.assertIsNone(self.group.match('https://st2b/apiv2/executions'))
+        self.assertIsNone(self.group.match('https://st2c/api/executions'))
+
+    def test_choose_lower_latency(self):
+        self.group.record(self.group.choose(), 0.0, True)
+        self.group.record('https://st2a/api', 0.5, True)
+        self.group.record('https://st2b/api', 0.01, True)
+
+        for i in range(10):
+            base_url = self.group.choose()
+            self.assertEqual(base_url, 'https://st2b/api')
+            self.group.record(base_url, 0.01, True)
+
+    def test_choose_avoids_failed_replica(self):
+        self.group.record('https://st2b/api', 0.01, True)
+        self.group.record('https://st2a/api', 0.5, True)
+        self.group.record('https://st2b/api', 0.01, False)
+
+        self.assertEqual(self.group.choose(), 'https://st2a/api')
+
+        self.clock.now += 10
+        self.assertEqual(self.group.choose(), 'https://st2b/api')
+
+    def test_choose_excluded(self):
+        self.group.record('https://st2a/api', 0.01, True)
+        self.group.record('https://st2b/api', 0.5, True)
+
+        self.assertEqual(
+            self.group.choose(exclude=['https://st2a/api']),
+            'https://st2b/api'
+        )
+
+        # Excluded replicas are used when no other replica is left.
+        self.assertEqual(
+            self.group.choose(exclude=self.group.base_urls),
+            'https://st2a/api'
+        )
+
+
+class HTTPFailoverTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(HTTPFailoverTestCase, self).setUp()
+        self.override_config('retry_exp_msec', 1)
+        self.override_config('retry_exp_max_msec', 1)
+
+        self.server = base.StubServer().start()
+        self.addCleanup(self.server.stop)
+
+        dead_server = base.StubServer()
+        dead_server.server.server_close()
+        self.dead_url = dead_server.url
+
+        self.override_config('api_urls', [
+            self.dead_url + '/api/v1', self.server.url + '/api/v1'
+        ])
+
+    def test_failover_to_healthy_replica(self):
+        for i in range(5):
+            resp = http.get(self.dead_url + '/api/v1/keys/k1')
+            self.assertEqual(resp.status_code, 200)
+
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.requests[0][1], '/api/v1/keys/k1')
+
+    def test_failover_when_circuit_open(self):
+        self.override_config('circuit_failure_threshold', 1)
+        breaker = circuit.get_breaker(self.dead_url + '/api')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit.OPEN)
+
+        for i in range(5):
+            resp = http.post(self.dead_url + '/api/v1/executions', {})
+            self.assertEqual(resp.status_code, 200)
+
+    def test_url_not_in_group(self):
+        http.get(self.server.url + '/other/keys/k1')
+        self.assertEqual(self.server.requests[0][1], '/other/keys/k1')
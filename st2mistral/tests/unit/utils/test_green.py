@@ -0,0 +1,143 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import unittest2
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import green
+from st2mistral.utils import http
+from st2mistral.utils import metrics
+
+
+class GreenTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(GreenTestCase, self).setUp()
+        self.lock = threading.Lock()
+        self.inflight = 0
+        self.max_inflight = 0
+
+        def handler(*args):
+            with self.lock:
+                self.inflight += 1
+                self.max_inflight = max(self.max_inflight, self.inflight)
+
+            time.sleep(0.2)
+
+            with self.lock:
+                self.inflight -= 1
+
+            return 200, {}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+    def test_inflight_limit(self):
+        self.override_config('max_inflight_requests', 2)
+        self.override_config('pool_maxsize', 5)
+
+        threads = [
+            threading.Thread(
+                target=http.get, args=(self.server.url + '/v1/keys/k1',)
+            )
+            for i in range(5)
+        ]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.max_inflight, 2)
+        self.assertEqual(
+            metrics.get_stats()[('http_inflight_waits_total', ())], 3
+        )
+
+    @unittest2.skipIf(green.eventlet is None, 'eventlet is not installed')
+    def test_native_threads_not_cooperative(self):
+        self.override_config('eventlet_cooperative', True)
+        self.override_config('max_inflight_requests', 2)
+        self.override_config('pool_maxsize', 5)
+
+        # The hub of the main thread runs green threads while the native
+        # threads send their requests.
+        green.eventlet.spawn(lambda: None).wait()
+        self.assertTrue(green.is_cooperative())
+
+        cooperative = []
+
+        def get():
+            cooperative.append(green.is_cooperative())
+            http.get(self.server.url + '/v1/keys/k1')
+
+        threads = [threading.Thread(target=get) for i in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+
+        self.assertEqual(cooperative, [False] * 5)
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.max_inflight, 2)
+
+    def test_no_inflight_limit(self):
+        self.override_config('max_inflight_requests', 0)
+
+        with green.limit():
+            http.get(self.server.url + '/v1/keys/k1')
+
+        self.assertNotIn(
+            ('http_inflight_waits_total', ()), metrics.get_stats()
+        )
+
+    @unittest2.skipIf(green.eventlet is None, 'eventlet is not installed')
+    def test_green_threads_not_blocked(self):
+        self.override_config('eventlet_cooperative', True)
+        self.override_config('max_inflight_requests', 1)
+        ticks = []
+
+        def ticker():
+            while len(ticks) < 1000:
+                ticks.append(time.time())
+                green.eventlet.sleep(0.01)
+
+        ticker_thread = green.eventlet.spawn(ticker)
+        requests = [
+            green.eventlet.spawn(http.get, self.server.url + '/v1/keys/k1')
+            for i in range(2)
+        ]
+
+        started = time.time()
+
+        for request in requests:
+            self.assertEqual(request.wait().status_code, 200)
+
+        elapsed = time.time() - started
+        ticker_thread.kill()
+
+        # The requests are sent one at a time and the ticker kept running
+        # while the socket of the requests were blocked.
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertEqual(self.max_inflight, 1)
+        self.assertGreater(len(ticks), 20)
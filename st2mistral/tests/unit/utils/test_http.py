@@ -0,0 +1,194 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import zlib
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import http
+from st2mistral.utils import metrics
+
+
+class HTTPClientTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(HTTPClientTestCase, self).setUp()
+        self.server = base.StubServer().start()
+        self.addCleanup(self.server.stop)
+
+    def test_session_shared_per_host(self):
+        session = http.get_session(self.server.url + '/executions')
+
+        self.assertIs(session, http.get_session(self.server.url + '/keys/k1'))
+        self.assertIsNot(session, http.get_session('https://st2.example.com'))
+
+    def test_connections_reused(self):
+        for i in range(10):
+            resp = http.post(self.server.url + '/executions', {'i': i},
+                             token='foobar')
+            self.assertEqual(resp.status_code, 200)
+
+        stats = http.get_pool_stats()[self.server.url]
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['requests'], 10)
+
+        counters = metrics.get_stats()
+        key = ('http_requests_total',
+               (('method', 'POST'), ('pool', self.server.url)))
+        self.assertEqual(counters[key], 10)
+
+        # The pool stats are exported along with the other metrics.
+        metrics.collect()
+        gauges = metrics.get_gauges()
+        labels = (('pool', self.server.url),)
+        self.assertEqual(
+            gauges[('http_pool_connections_created', labels)], 1
+        )
+        self.assertEqual(gauges[('http_pool_requests', labels)], 10)
+
+    def test_connections_shared_across_threads(self):
+        self.override_config('pool_maxsize', 4)
+
+        def worker():
+            for i in range(5):
+                http.get(self.server.url + '/keys/k1')
+
+        threads = [threading.Thread(target=worker) for i in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        stats = http.get_pool_stats()[self.server.url]
+        self.assertLessEqual(stats['connections_created'], 4)
+        self.assertEqual(stats['requests'], 20)
+
+    def test_request_headers(self):
+        http.put(self.server.url + '/executions/123', {'status': 'running'},
+                 headers={'foo': 'bar'}, token='foobar')
+
+        method, path, headers, body = self.server.requests[0]
+        self.assertEqual(method, 'PUT')
+        self.assertEqual(path, '/executions/123')
+        self.assertEqual(headers['X-Auth-Token'], 'foobar')
+        self.assertEqual(headers['foo'], 'bar')
+        self.assertEqual(headers['Content-Type'], 'application/json')
+        self.assertDictEqual(json.loads(body.decode('utf-8')),
+                             {'status': 'running'})
+
+    def test_request_not_compressed_by_default(self):
+        data = {'result': 'x' * 100000}
+        http.put(self.server.url + '/executions/123', data)
+
+        method, path, headers, body = self.server.requests[0]
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertDictEqual(json.loads(body.decode('utf-8')), data)
+
+    def test_request_compressed(self):
+        self.override_config('request_compression_min_bytes', 1024)
+        data = {'result': 'x' * 100000}
+
+        for encoding, wbits in [('gzip', 16 + zlib.MAX_WBITS),
+                                ('deflate', zlib.MAX_WBITS)]:
+            self.override_config('request_compression', encoding)
+            http.post(self.server.url + '/executions', data)
+
+            method, path, headers, body = self.server.requests[-1]
+            self.assertEqual(headers['Content-Encoding'], encoding)
+            self.assertLess(len(body), 1024)
+
+            content = zlib.decompress(body, wbits).decode('utf-8')
+            self.assertDictEqual(json.loads(content), data)
+
+    def test_small_request_not_compressed(self):
+        self.override_config('request_compression', 'gzip')
+        self.override_config('request_compression_min_bytes', 1024)
+        http.post(self.server.url + '/executions', {'action': 'core.noop'})
+
+        method, path, headers, body = self.server.requests[0]
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_endpoint_templates(self):
+        urls = {
+            'https://st2/api/v1/executions': '/executions',
+            'https://st2/api/v1/executions/': '/executions',
+            'https://st2/api/v1/executions/123': '/executions/{id}',
+            'https://st2/api/v1/keys/system.k1': '/keys/{key}',
+            'https://st2/auth/v1/tokens/validate': '/tokens/validate',
+            'https://st2/api/v1/actions': 'other'
+        }
+
+        for url, template in urls.items():
+            self.assertEqual(http.get_endpoint_template(url), template)
+
+    def test_instrumentation(self):
+        http.put(self.server.url + '/v1/executions/123', {'status': 'running'})
+        http.get(self.server.url + '/v1/keys/k1')
+
+        labels = (('endpoint', '/executions/{id}'), ('method', 'PUT'))
+        counters = metrics.get_stats()
+
+        self.assertEqual(
+            counters[('http_responses_total', (('code', 200),) + labels)], 1
+        )
+        self.assertEqual(
+            counters[('http_request_bytes_total', labels)],
+            len(b'{"status":"running"}')
+        )
+        self.assertEqual(counters[('http_response_bytes_total', labels)], 2)
+
+        histogram = metrics.get_histograms()[
+            ('http_request_duration_seconds', labels)
+        ]
+
+        self.assertEqual(histogram['count'], 1)
+
+        histogram = metrics.get_histograms()[(
+            'http_request_duration_seconds',
+            (('endpoint', '/keys/{key}'), ('method', 'GET'))
+        )]
+
+        self.assertEqual(histogram['count'], 1)
+
+    def test_read_content(self):
+        self.server.handler = lambda *args: (200, {'id': 'x' * 1000})
+
+        for i in range(3):
+            resp = http.post(self.server.url + '/executions', {}, stream=True)
+            content, truncated = http.read_content(resp, 2048)
+            self.assertFalse(truncated)
+            self.assertEqual(len(json.loads(content.decode('utf-8'))['id']),
+                             1000)
+
+        # The connection is reused when the response is read completely.
+        stats = http.get_pool_stats()[self.server.url]
+        self.assertEqual(stats['connections_created'], 1)
+
+    def test_read_content_truncated(self):
+        self.server.handler = lambda *args: (200, 'x' * 1000000)
+
+        resp = http.post(self.server.url + '/executions', {}, stream=True)
+        content, truncated = http.read_content(resp, 1000, chunk_size=512)
+        self.assertTrue(truncated)
+        self.assertEqual(content, b'x' * 1000)
+
+        resp = http.post(self.server.url + '/executions', {}, stream=True)
+        content, truncated = http.read_content(resp, 0)
+        self.assertFalse(truncated)
+        self.assertEqual(len(content), 1000000)
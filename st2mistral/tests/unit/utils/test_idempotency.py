@@ -0,0 +1,132 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import cache
+from st2mistral.utils import http
+from st2mistral.utils import idempotency
+from st2mistral.utils import retry
+
+
+class IdempotencyTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(IdempotencyTestCase, self).setUp()
+        self.override_config('eventlet_cooperative', False)
+        idempotency.reset()
+        self.addCleanup(idempotency.reset)
+
+        self.executions = []
+        self.keys = {}
+        self.lock = threading.Lock()
+
+        def handler(method, path, headers, body):
+            key = headers.get(idempotency.HEADER)
+
+            with self.lock:
+                if key and key in self.keys:
+                    return 201, {'id': self.keys[key]}
+
+                execution_id = 'execution-%s' % len(self.executions)
+                self.executions.append(execution_id)
+
+                if key:
+                    self.keys[key] = execution_id
+
+                # The connection drops before the response of the first
+                # execution created arrives.
+                if len(self.executions) == 1:
+                    raise Exception('Connection dropped.')
+
+            return 201, {'id': execution_id}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+    def post(self, headers=None):
+        policy = retry.RetryPolicy(
+            deadline_msec=5000, backoff_msec=10, backoff_max_msec=10
+        )
+
+        return http.post(
+            self.server.url + '/api/v1/executions', {'action': 'core.noop'},
+            headers=headers, policy=policy
+        )
+
+    def test_retry_without_key_duplicated(self):
+        resp = self.post()
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.executions, ['execution-0', 'execution-1'])
+
+    def test_retry_with_key_deduplicated(self):
+        key = idempotency.get_key('123')
+        resp = self.post(headers={idempotency.HEADER: key})
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json(), {'id': 'execution-0'})
+        self.assertEqual(self.executions, ['execution-0'])
+
+        self.assertEqual(len(self.server.requests), 2)
+
+        for request in self.server.requests:
+            self.assertEqual(request[2][idempotency.HEADER], key)
+
+    def test_record(self):
+        key = idempotency.get_key('123')
+
+        self.assertEqual(key, 'mistral-action-execution-123')
+        self.assertIsNone(idempotency.get_key(None))
+        self.assertIsNone(idempotency.get_record(key))
+        self.assertIsNone(idempotency.get_record(None))
+
+        idempotency.record(key, 201, {'id': 'execution-0'})
+        idempotency.record(idempotency.get_key('456'), 201, b'{"id"')
+
+        self.assertEqual(
+            idempotency.get_record(key), {'status': 201, 'id': 'execution-0'}
+        )
+        self.assertEqual(
+            idempotency.get_record(idempotency.get_key('456')),
+            {'status': 201, 'id': None}
+        )
+
+    def test_record_shared_with_spool(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.override_config(
+            'action_spool_path', os.path.join(tmp_dir, 'spool.db')
+        )
+
+        key = idempotency.get_key('123')
+        idempotency.record(key, 201, {'id': 'execution-0'})
+
+        self.assertIsInstance(
+            idempotency._get_cache(), cache.SharedTTLCache
+        )
+
+        # The record survives a restart of the process.
+        idempotency.reset()
+
+        self.assertEqual(
+            idempotency.get_record(key), {'status': 201, 'id': 'execution-0'}
+        )
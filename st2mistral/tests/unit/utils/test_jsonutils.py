@@ -0,0 +1,120 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import datetime
+import json
+
+import unittest2
+
+from st2mistral.utils import jsonutils
+
+
+VALUES = [
+    None,
+    True,
+    0,
+    -1,
+    2 ** 63,
+    2 ** 70,
+    -2 ** 63 - 1,
+    -2 ** 70,
+    0.1,
+    -0.0,
+    1e16,
+    1.5e-07,
+    1e-05,
+    -9.5e-05,
+    0.0001,
+    123456789.123,
+    '',
+    'foobar',
+    u'café   \U0001f600',
+    'quote " backslash \\ slash / control \x01 \x1f \n \t \x7f',
+    '1e5 is a string',
+    [],
+    [1, 'a', None, [2.5, {'b': False}]],
+    {},
+    {'a': 1, 'z': {'y': [1, 2, 3]}, 'b': 'c'},
+    {1: 'int key', 'str': 'str key'},
+    collections.OrderedDict([('b', 1), ('a', 2)]),
+    (1, 2, 3)
+]
+
+
+class JSONCodecTestCase(unittest2.TestCase):
+
+    def setUp(self):
+        super(JSONCodecTestCase, self).setUp()
+        self.addCleanup(jsonutils.set_backend, jsonutils.get_backend())
+
+    def _get_backends(self):
+        return ['json', 'orjson'] if jsonutils.orjson else ['json']
+
+    def test_encode_same_as_stdlib(self):
+        for backend in self._get_backends():
+            jsonutils.set_backend(backend)
+
+            for value in VALUES:
+                expected = json.dumps(
+                    value, separators=(',', ':'), ensure_ascii=False
+                ).encode('utf-8')
+
+                self.assertEqual(jsonutils.encode(value), expected)
+
+    def test_dumps_same_as_stdlib(self):
+        for backend in self._get_backends():
+            jsonutils.set_backend(backend)
+
+            for value in VALUES:
+                self.assertEqual(jsonutils.dumps(value), json.dumps(value))
+                self.assertEqual(
+                    jsonutils.dumps(value, separators=(',', ':'),
+                                    ensure_ascii=False),
+                    json.dumps(value, separators=(',', ':'),
+                               ensure_ascii=False)
+                )
+                self.assertEqual(
+                    jsonutils.dumps(value, indent=4),
+                    json.dumps(value, indent=4)
+                )
+
+    def test_loads_same_as_stdlib(self):
+        docs = [json.dumps(value) for value in VALUES]
+        docs += ['NaN', '[Infinity]', '{"a": 1, "a": 2}']
+
+        for backend in self._get_backends():
+            jsonutils.set_backend(backend)
+
+            for doc in docs:
+                expected = json.loads(doc)
+                actual = jsonutils.loads(doc)
+                self.assertEqual(repr(actual), repr(expected))
+
+                actual = jsonutils.loads(doc.encode('utf-8'))
+                self.assertEqual(repr(actual), repr(expected))
+
+    def test_errors_same_as_stdlib(self):
+        for backend in self._get_backends():
+            jsonutils.set_backend(backend)
+
+            self.assertRaises(ValueError, jsonutils.loads, '{"a": ')
+            self.assertRaises(TypeError, jsonutils.encode, object())
+            self.assertRaises(
+                TypeError, jsonutils.encode, datetime.datetime.utcnow()
+            )
+
+    def test_set_unknown_backend(self):
+        self.assertRaises(ValueError, jsonutils.set_backend, 'foobar')
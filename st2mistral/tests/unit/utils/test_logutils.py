@@ -0,0 +1,112 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import logutils
+from st2mistral.utils import redact
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        super(RecordingHandler, self).__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class Unformattable(object):
+
+    def __str__(self):
+        raise AssertionError('Formatted while the level is disabled.')
+
+
+class LogUtilsTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(LogUtilsTestCase, self).setUp()
+        logutils.reset_sampling()
+        self.addCleanup(logutils.reset_sampling)
+
+        self.logger = logging.getLogger('st2mistral.tests.logutils')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def test_cap(self):
+        self.assertEqual(str(logutils.cap('abcdef', 10)), 'abcdef')
+        self.assertEqual(str(logutils.cap('abcdef', 4)), 'abcd...(truncated)')
+        self.assertEqual(str(logutils.cap({'a': 1}, 0)), "{'a': 1}")
+
+        self.override_config('log_max_field_chars', 3)
+        self.assertEqual('%s' % logutils.cap([1, 2]), '[1,...(truncated)')
+
+    def test_cap_formatted_as_str(self):
+        values = [
+            {'a': [1, (2,), (3, 4)], 'b': {'c': u'd', 'e': None}},
+            redact.RedactedView({'a': 'b', 'auth_token': 'foobar'}),
+            b'abc',
+            ('a', 1.5)
+        ]
+
+        for value in values:
+            self.assertEqual(str(logutils.cap(value, 1000)), '%s' % (value,))
+
+    def test_cap_large_value(self):
+        value = {'items': ['x' * 100000 for i in range(1000)]}
+        text = str(logutils.cap(value, 100))
+
+        self.assertEqual(text, ('%s' % value)[:100] + '...(truncated)')
+
+    def test_not_formatted_if_level_disabled(self):
+        logutils.log(self.logger, logging.DEBUG, 'foo %s', Unformattable())
+        self.assertEqual(self.handler.messages, [])
+
+        logutils.log(
+            self.logger, logging.INFO, 'foo %s', logutils.cap('bar', 10)
+        )
+        self.assertEqual(self.handler.messages, ['foo bar'])
+
+    def test_not_sampled_by_default(self):
+        for i in range(20):
+            logutils.log(self.logger, logging.INFO, 'foo %s', i, sample=True)
+
+        self.assertEqual(len(self.handler.messages), 20)
+
+    def test_sampled(self):
+        self.override_config('log_sample_burst', 2)
+        self.override_config('log_sample_interval_sec', 3600)
+
+        for i in range(5):
+            logutils.log(self.logger, logging.INFO, 'foo %s', i, sample=True)
+            logutils.log(self.logger, logging.INFO, 'bar %s', i, sample=True)
+
+        self.assertEqual(
+            self.handler.messages, ['foo 0', 'bar 0', 'foo 1', 'bar 1']
+        )
+
+        # The lines suppressed are reported with the next interval.
+        self.override_config('log_sample_interval_sec', 0)
+        logutils.log(self.logger, logging.INFO, 'foo %s', 5, sample=True)
+
+        self.assertEqual(
+            self.handler.messages[-1], 'foo 5 (3 similar lines suppressed)'
+        )
@@ -0,0 +1,119 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import stat
+import tempfile
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import metrics
+
+
+class MetricsTestCase(base.St2TestCase):
+
+    def test_counters(self):
+        metrics.incr('requests_total', endpoint='/executions')
+        metrics.incr('requests_total', 2, endpoint='/executions')
+        metrics.incr('requests_total', endpoint='/keys/{key}')
+
+        stats = metrics.get_stats()
+        self.assertEqual(
+            stats[('requests_total', (('endpoint', '/executions'),))], 3
+        )
+        self.assertEqual(
+            stats[('requests_total', (('endpoint', '/keys/{key}'),))], 1
+        )
+
+    def test_gauges(self):
+        metrics.gauge('queue_depth', 3, workflow='foo')
+        metrics.gauge('queue_depth', 1, workflow='foo')
+
+        gauges = metrics.get_gauges()
+        self.assertEqual(gauges[('queue_depth', (('workflow', 'foo'),))], 1)
+
+    def test_histograms(self):
+        for value in [0.001, 0.2, 0.2, 100]:
+            metrics.observe('duration_seconds', value, buckets=(0.1, 1.0))
+
+        histogram = metrics.get_histograms()[('duration_seconds', ())]
+        self.assertListEqual(histogram['counts'], [1, 2, 1])
+        self.assertEqual(histogram['count'], 4)
+        self.assertAlmostEqual(histogram['sum'], 100.401)
+
+    def test_dump_prometheus(self):
+        metrics.incr('requests_total', code=200, endpoint='/executions')
+        metrics.gauge('queue_depth', 2, workflow='foo')
+        metrics.observe('duration_seconds', 0.2, buckets=(0.1, 1.0),
+                        endpoint='/executions')
+
+        expected = '\n'.join([
+            '# TYPE st2mistral_requests_total counter',
+            'st2mistral_requests_total'
+            '{code="200",endpoint="/executions"} 1',
+            '# TYPE st2mistral_queue_depth gauge',
+            'st2mistral_queue_depth{workflow="foo"} 2',
+            '# TYPE st2mistral_duration_seconds histogram',
+            'st2mistral_duration_seconds_bucket'
+            '{endpoint="/executions",le="0.1"} 0',
+            'st2mistral_duration_seconds_bucket'
+            '{endpoint="/executions",le="1.0"} 1',
+            'st2mistral_duration_seconds_bucket'
+            '{endpoint="/executions",le="+Inf"} 1',
+            'st2mistral_duration_seconds_sum{endpoint="/executions"} 0.2',
+            'st2mistral_duration_seconds_count{endpoint="/executions"} 1',
+            ''
+        ])
+
+        self.assertEqual(metrics.dump_prometheus(), expected)
+
+    def test_write_textfile(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'st2mistral.prom')
+
+        metrics.incr('requests_total')
+        metrics.write_textfile(path)
+
+        with open(path) as f:
+            self.assertEqual(f.read(), metrics.dump_prometheus())
+
+        self.assertListEqual(os.listdir(tmp_dir), ['st2mistral.prom'])
+
+        # The collector usually runs as another user.
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+        self.assertEqual(mode, 0o644)
+
+    def test_textfile_path(self):
+        self.assertEqual(
+            metrics._get_textfile_path('/tmp/st2-%(pid)s-100%.prom', 42),
+            '/tmp/st2-42-100%.prom'
+        )
+
+    def test_collector_written_to_textfile(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'st2mistral.prom')
+
+        def collector():
+            metrics.gauge('pool_size', 4, pool='foo')
+
+        metrics.register_collector(collector)
+        self.addCleanup(metrics._COLLECTORS.remove, collector)
+        metrics.write_textfile(path)
+
+        with open(path) as f:
+            self.assertIn('st2mistral_pool_size{pool="foo"} 4\n', f.read())
@@ -0,0 +1,58 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import redact
+
+
+class RedactedViewTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(RedactedViewTestCase, self).setUp()
+        self.st2_context = {
+            'api_url': 'http://127.0.0.1:9101/v1',
+            'auth_token': 'foobar',
+            'parent': {'execution_id': '123'}
+        }
+
+        self.view = redact.RedactedView(self.st2_context)
+
+    def test_secret_keys_hidden(self):
+        expected = {
+            'api_url': 'http://127.0.0.1:9101/v1',
+            'parent': {'execution_id': '123'}
+        }
+
+        self.assertDictEqual(dict(self.view), expected)
+        self.assertEqual(len(self.view), 2)
+        self.assertNotIn('auth_token', self.view)
+        self.assertRaises(KeyError, self.view.__getitem__, 'auth_token')
+        self.assertEqual(self.view['parent'], {'execution_id': '123'})
+        self.assertEqual(repr(self.view), repr(expected))
+        self.assertEqual('%s' % self.view, str(expected))
+
+    def test_not_copied(self):
+        self.assertIs(self.view['parent'], self.st2_context['parent'])
+        self.assertIn('auth_token', self.st2_context)
+
+        self.st2_context['notify'] = {}
+        self.assertIn('notify', self.view)
+
+    def test_none(self):
+        view = redact.RedactedView(None)
+
+        self.assertEqual(len(view), 0)
+        self.assertEqual(str(view), '{}')
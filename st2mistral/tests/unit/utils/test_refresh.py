@@ -0,0 +1,93 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import metrics
+from st2mistral.utils import refresh
+
+
+class RefresherTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(RefresherTestCase, self).setUp()
+        self.override_config('eventlet_cooperative', False)
+        self.refresher = refresh.Refresher('test', max_concurrency=2)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def get_count(self, outcome):
+        key = (
+            'cache_refresh_total',
+            (('cache', 'test'), ('outcome', outcome))
+        )
+
+        return metrics.get_stats().get(key, 0)
+
+    def wait_for(self, outcome, count=1):
+        for i in range(500):
+            if self.get_count(outcome) >= count:
+                return
+
+            time.sleep(0.01)
+
+        self.fail('Refresh outcome %s not counted.' % outcome)
+
+    def test_refresh_outcomes(self):
+        self.assertTrue(self.refresher.submit('k1', lambda: 'valid'))
+        self.assertTrue(self.refresher.submit('k2', lambda: 'rejected'))
+        self.wait_for('valid')
+        self.wait_for('rejected')
+
+        def fail():
+            raise ValueError('foobar')
+
+        self.assertTrue(self.refresher.submit('k3', fail))
+        self.wait_for('error')
+
+    def test_refresh_once_per_key(self):
+        calls = []
+
+        def slow():
+            calls.append(1)
+            self.release.wait(5)
+            return 'valid'
+
+        self.assertTrue(self.refresher.submit('k1', slow))
+        self.assertFalse(self.refresher.submit('k1', slow))
+
+        self.release.set()
+        self.wait_for('valid')
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(self.refresher.submit('k1', lambda: 'valid'))
+        self.wait_for('valid', count=2)
+
+    def test_max_concurrency(self):
+        def slow():
+            self.release.wait(5)
+            return 'valid'
+
+        self.assertTrue(self.refresher.submit('k1', slow))
+        self.assertTrue(self.refresher.submit('k2', slow))
+        self.assertFalse(self.refresher.submit('k3', slow))
+        self.assertEqual(self.get_count('skipped'), 1)
+
+        self.release.set()
+        self.wait_for('valid', count=2)
+        self.assertTrue(self.refresher.submit('k3', lambda: 'valid'))
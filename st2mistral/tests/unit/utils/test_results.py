@@ -0,0 +1,91 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import requests
+from requests import structures
+import six
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import jsonutils
+from st2mistral.utils import results
+
+
+def get_response():
+    resp = requests.Response()
+    resp.status_code = 201
+    resp.reason = 'Created'
+    resp.url = 'http://127.0.0.1:9101/v1/executions'
+    resp.encoding = 'utf-8'
+    resp.elapsed = datetime.timedelta(milliseconds=15)
+    resp.headers = structures.CaseInsensitiveDict({
+        'Content-Type': 'application/json',
+        'Content-Length': '19'
+    })
+
+    return resp
+
+
+class ResultsTestCase(base.St2TestCase):
+
+    def test_full_profile(self):
+        result = results.build(get_response(), {'id': '123'})
+
+        self.assertDictEqual(result, {
+            'content': {'id': '123'},
+            'status': 201,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Content-Length': '19'
+            },
+            'url': 'http://127.0.0.1:9101/v1/executions',
+            'history': [],
+            'encoding': 'utf-8',
+            'reason': 'Created',
+            'cookies': {},
+            'elapsed': 0.015
+        })
+
+    def test_compact_profile(self):
+        self.override_config('action_result_profile', 'compact')
+        result = results.build(get_response(), b'{"id"', truncated=True)
+
+        self.assertDictEqual(result, {
+            'content': b'{"id"',
+            'status': 201,
+            'reason': 'Created',
+            'truncated': True
+        })
+
+    def test_truncate(self):
+        self.override_config('action_result_content_max_bytes', 4)
+
+        # The budget only applies to the compact profile.
+        self.assertEqual(results.truncate(b'abcdef'), (b'abcdef', False))
+
+        self.override_config('action_result_profile', 'compact')
+        self.assertEqual(results.truncate(b'abcd'), (b'abcd', False))
+        self.assertEqual(results.truncate(b'abcdef'), (u'abcd', True))
+
+        # The character cut by the budget is dropped from the text.
+        content, truncated = results.truncate(u'abc\xe9f'.encode('utf-8'))
+        self.assertEqual((content, truncated), (u'abc', True))
+        self.assertIsInstance(content, six.text_type)
+        self.assertEqual(jsonutils.loads(jsonutils.dumps(content)), u'abc')
+
+        self.override_config('action_result_content_max_bytes', 0)
+        self.assertEqual(results.truncate(b'abcdef'), (b'abcdef', False))
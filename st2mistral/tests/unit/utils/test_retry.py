@@ -0,0 +1,223 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import requests
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import http
+from st2mistral.utils import retry
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class RetryPolicyTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(RetryPolicyTestCase, self).setUp()
+        self.time = FakeTime()
+
+    def _policy(self, **kwargs):
+        kwargs.setdefault('deadline_msec', 10000)
+        kwargs.setdefault('backoff_msec', 1000)
+        kwargs.setdefault('backoff_max_msec', 4000)
+
+        return retry.RetryPolicy(
+            clock=self.time.clock, sleep=self.time.sleep, **kwargs
+        )
+
+    def _call(self, policy, method, results):
+        calls = []
+
+        def func(timeout, attempt):
+            calls.append(timeout)
+            result = results.pop(0)
+
+            if isinstance(result, Exception):
+                raise result
+
+            return result
+
+        return policy.call(method, func), calls
+
+    def test_config_read_at_call_time(self):
+        self.override_config('retry_stop_max_msec', 5000)
+        self.override_config('read_timeout_sec', 7)
+
+        policy = retry.RetryPolicy()
+        self.assertEqual(policy.deadline, 5.0)
+        self.assertEqual(policy.read_timeout, 7)
+
+        policy = retry.RetryPolicy(deadline_msec=2000)
+        self.assertEqual(policy.deadline, 2.0)
+
+    def test_full_jitter_backoff(self):
+        policy = self._policy()
+
+        for attempt in range(10):
+            delay = policy.get_backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(4.0, 2 ** attempt))
+
+    def test_timeout_capped_by_deadline(self):
+        policy = self._policy(connect_timeout=10, read_timeout=60)
+        self.assertEqual(policy.get_timeout(30), (10, 30))
+        self.assertEqual(policy.get_timeout(100), (10, 60))
+
+    def test_retry_connection_error(self):
+        ok = FakeResponse(200)
+        error = requests.exceptions.ConnectionError()
+        resp, calls = self._call(self._policy(), 'POST', [error, error, ok])
+
+        self.assertIs(resp, ok)
+        self.assertEqual(len(calls), 3)
+
+    def test_retry_stops_at_deadline(self):
+        errors = [requests.exceptions.ConnectionError()] * 100
+        policy = self._policy(deadline_msec=5000)
+
+        self.assertRaises(
+            requests.exceptions.ConnectionError,
+            self._call, policy, 'POST', errors
+        )
+
+        self.assertLess(self.time.now, 5.0)
+
+    def test_read_timeout_retried_for_idempotent_methods_only(self):
+        ok = FakeResponse(200)
+        error = requests.exceptions.ReadTimeout()
+
+        resp, calls = self._call(self._policy(), 'GET', [error, ok])
+        self.assertIs(resp, ok)
+
+        self.assertRaises(
+            requests.exceptions.ReadTimeout,
+            self._call, self._policy(), 'POST', [error, ok]
+        )
+
+    def test_retry_after(self):
+        ok = FakeResponse(200)
+        busy = FakeResponse(429, {'Retry-After': '3'})
+        resp, calls = self._call(self._policy(), 'POST', [busy, ok])
+
+        self.assertIs(resp, ok)
+        self.assertEqual(self.time.sleeps, [3.0])
+        self.assertTrue(busy.closed)
+        self.assertFalse(ok.closed)
+
+    def test_retry_after_beyond_deadline(self):
+        unavailable = FakeResponse(503, {'Retry-After': '60'})
+        resp, calls = self._call(self._policy(), 'PUT', [unavailable])
+
+        self.assertIs(resp, unavailable)
+        self.assertEqual(self.time.sleeps, [])
+        self.assertFalse(unavailable.closed)
+
+    def test_parse_retry_after(self):
+        now = int(time.time())
+        date = time.strftime(
+            '%a, %d %b %Y %H:%M:%S GMT', time.gmtime(now + 30)
+        )
+
+        self.assertEqual(retry.parse_retry_after(date, now), 30)
+        self.assertEqual(retry.parse_retry_after('5'), 5.0)
+        self.assertIsNone(retry.parse_retry_after('foobar'))
+        self.assertIsNone(retry.parse_retry_after(None))
+
+
+class HTTPTimeoutTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(HTTPTimeoutTestCase, self).setUp()
+        def handler(method, path, headers, body):
+            time.sleep(0.5)
+            return 200, {}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+    def test_read_timeout(self):
+        policy = retry.RetryPolicy(deadline_msec=0, read_timeout=0.1)
+
+        self.assertRaises(
+            requests.exceptions.ReadTimeout,
+            http.post, self.server.url + '/executions', {}, policy=policy
+        )
+
+
+class HTTPRetryTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(HTTPRetryTestCase, self).setUp()
+        self.statuses = [503, 201]
+
+        def handler(method, path, headers, body):
+            return self.statuses.pop(0), {}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+    def test_retried_streamed_response_released(self):
+        self.override_config('pool_maxsize', 1)
+        self.override_config('pool_block', True)
+        self.override_config('circuit_breaker_enabled', False)
+
+        policy = retry.RetryPolicy(
+            deadline_msec=10000, backoff_msec=10, backoff_max_msec=10
+        )
+        resps = []
+
+        def post():
+            resps.append(http.post(
+                self.server.url + '/executions', {}, policy=policy,
+                stream=True
+            ))
+
+        # The retry blocks on the pool of a single connection if the
+        # connection of the 503 response is not released.
+        thread = threading.Thread(target=post)
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(resps[0].status_code, 201)
+        self.assertEqual(len(self.server.requests), 2)
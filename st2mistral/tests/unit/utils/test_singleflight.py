@@ -0,0 +1,124 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import http
+from st2mistral.utils import metrics
+from st2mistral.utils import singleflight
+
+
+class SingleFlightTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(SingleFlightTestCase, self).setUp()
+        self.flight = singleflight.SingleFlight('test')
+        self.release = threading.Event()
+
+        def handler(*args):
+            self.release.wait(5)
+            return 200, {'valid': True}
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+        self.addCleanup(self.release.set)
+
+    def burst(self, func, num_calls=10, timeout=None):
+        results = []
+
+        def target():
+            try:
+                results.append(self.flight.do('k1', func, timeout=timeout))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=target) for i in range(num_calls)]
+
+        for thread in threads:
+            thread.start()
+
+        # Let the call in flight finish once every caller is waiting on it.
+        stats_key = ('singleflight_shared_total', (('group', 'test'),))
+
+        for i in range(500):
+            if metrics.get_stats().get(stats_key, 0) >= num_calls - 1:
+                break
+
+            time.sleep(0.01)
+
+        self.release.set()
+
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_single_upstream_call_per_burst(self):
+        url = self.server.url + '/tokens/validate'
+
+        def validate():
+            return http.post(url, {'token': 'foobar'}).json()
+
+        results = self.burst(validate)
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(results, [{'valid': True}] * 10)
+
+        # The next burst sends a new call.
+        self.release.clear()
+        self.burst(validate)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_error_propagated(self):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            self.release.wait(5)
+            raise ValueError('foobar')
+
+        results = self.burst(fail)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 10)
+
+        for result in results:
+            self.assertIsInstance(result, ValueError)
+            self.assertEqual(str(result), 'foobar')
+
+    def test_timeout(self):
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            self.release.wait(5)
+            return 'done'
+
+        leader = threading.Thread(target=self.flight.do, args=('k1', slow))
+        leader.start()
+        started.wait(5)
+
+        self.assertRaises(
+            singleflight.CallTimeoutError,
+            self.flight.do, 'k1', slow, timeout=0.05
+        )
+
+        self.release.set()
+        leader.join()
+
+        self.assertEqual(self.flight.do('k1', lambda: 'again'), 'again')
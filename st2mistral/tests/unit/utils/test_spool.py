@@ -0,0 +1,263 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import sqlite3
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+import unittest2
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import green
+from st2mistral.utils import metrics
+from st2mistral.utils import spool
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SpoolTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(SpoolTestCase, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'spool.db')
+        self.clock = FakeClock()
+        self.spool = spool.Spool('test', self.path, clock=self.clock)
+
+    def test_lease(self):
+        self.spool.append({'i': 1})
+        self.spool.append({'i': 2})
+
+        leased = self.spool.lease(1, 10)
+        self.assertEqual([i[1:] for i in leased], [({'i': 1}, 0)])
+
+        # The items leased are not leased again until the lease expires.
+        leased = self.spool.lease(10, 10)
+        self.assertEqual([i[1:] for i in leased], [({'i': 2}, 0)])
+        self.assertEqual(self.spool.lease(10, 10), [])
+
+        self.clock.now += 10
+        self.assertEqual(len(self.spool.lease(10, 10)), 2)
+
+        self.spool.delete(leased[0][0])
+        self.assertEqual(len(self.spool), 1)
+
+    def test_defer(self):
+        item_id = self.spool.append({'i': 1})
+
+        self.spool.defer(item_id, 5)
+        self.assertEqual(self.spool.lease(10, 10), [])
+
+        self.clock.now += 5
+        self.spool.defer(item_id, 0, item={'i': 1, 'error': 'foobar'})
+        self.assertEqual(
+            self.spool.lease(10, 10),
+            [(item_id, {'i': 1, 'error': 'foobar'}, 2)]
+        )
+
+    @unittest2.skipIf(green.eventlet is None, 'eventlet is not installed')
+    def test_green_threads_not_blocked(self):
+        self.override_config('eventlet_cooperative', True)
+        self.spool.append({'i': 1})
+        ticks = []
+
+        def ticker():
+            while True:
+                ticks.append(time.time())
+                green.eventlet.sleep(0.01)
+
+        # The append waits on the lock of the database held by another
+        # connection in a native thread while the ticker keeps running.
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+
+        def release():
+            green.eventlet.sleep(0.3)
+            conn.execute('COMMIT')
+
+        ticker_thread = green.eventlet.spawn(ticker)
+        green.eventlet.spawn(release)
+        appender = green.eventlet.spawn(self.spool.append, {'i': 2})
+
+        self.assertIsNotNone(appender.wait())
+        ticker_thread.kill()
+        conn.close()
+
+        self.assertEqual(len(self.spool), 2)
+        self.assertGreater(len(ticks), 10)
+
+    @unittest2.skipIf(green.eventlet is None, 'eventlet is not installed')
+    def test_green_threads_not_blocked_when_monkey_patched(self):
+        self.spool.append({'i': 1})
+
+        # The append runs in a process monkey patched as Mistral is. It
+        # waits on the lock of the database held here while the ticker of
+        # the process keeps running.
+        script = '\n'.join([
+            'import eventlet',
+            'eventlet.monkey_patch()',
+            'import sys, time',
+            'from st2mistral.tests.unit import base',
+            'from st2mistral.utils import spool',
+            'ticks = []',
+            'def ticker():',
+            '    while True:',
+            '        ticks.append(time.time())',
+            '        eventlet.sleep(0.01)',
+            'eventlet.spawn(ticker)',
+            'eventlet.sleep(0)',
+            'sys.stdout.write("ready\\n")',
+            'sys.stdout.flush()',
+            'spool.Spool("test", sys.argv[1]).append({"i": 2})',
+            'sys.stdout.write("%s\\n" % len(ticks))'
+        ])
+
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+
+        process = subprocess.Popen(
+            [sys.executable, '-c', script, self.path],
+            stdout=subprocess.PIPE,
+            env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        )
+
+        try:
+            self.assertEqual(process.stdout.readline().strip(), b'ready')
+            time.sleep(0.5)
+        finally:
+            conn.execute('COMMIT')
+            conn.close()
+
+        output = process.communicate()[0]
+        self.assertEqual(process.returncode, 0)
+        self.assertGreater(int(output.strip()), 10)
+        self.assertEqual(len(self.spool), 2)
+
+    def test_persisted(self):
+        self.spool.append({'i': 1})
+
+        other = spool.Spool('test', self.path, clock=self.clock)
+        self.assertEqual(len(other), 1)
+        self.assertEqual(len(spool.Spool('other', self.path)), 0)
+
+        mode = stat.S_IMODE(os.stat(self.path).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_sender(self):
+        outcomes = {1: None, 2: ValueError('foobar'), 3: {'i': 3, 'x': 1}}
+        sent = []
+
+        def send(item):
+            sent.append(item)
+            outcome = outcomes[item['i']]
+
+            if isinstance(outcome, Exception):
+                raise outcome
+
+            return outcome
+
+        sender = spool.Sender(self.spool, send, lease_sec=600)
+
+        for i in [1, 2, 3]:
+            self.spool.append({'i': i})
+
+        self.assertEqual(sender.send_due(limit=10), 3)
+        self.assertEqual(len(self.spool), 2)
+
+        # The items which failed are deferred with backoff, updated if the
+        # send function returns the item.
+        self.clock.now += spool.BACKOFF_SEC
+        self.assertEqual(
+            [i[1:] for i in self.spool.lease(10, 10)],
+            [({'i': 2}, 1), ({'i': 3, 'x': 1}, 1)]
+        )
+
+        stats = metrics.get_stats()
+        self.assertEqual(
+            stats[('spool_sent_total',
+                   (('outcome', 'sent'), ('spool', 'test')))], 1
+        )
+
+    def test_sender_drops_after_max_attempts(self):
+        def send(item):
+            if item['i'] == 1:
+                raise ValueError('foobar')
+
+            return dict(item, error='foobar')
+
+        sender = spool.Sender(self.spool, send, max_attempts=3)
+
+        for i in [1, 2]:
+            self.spool.append({'i': i})
+
+        for attempt in range(3):
+            self.assertEqual(len(self.spool), 2)
+            self.assertEqual(sender.send_due(limit=10), 2)
+            self.clock.now += spool.BACKOFF_MAX_SEC
+
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(
+            metrics.get_stats()[('spool_sent_total', (
+                ('outcome', 'dropped'), ('spool', 'test')
+            ))], 2
+        )
+
+    def test_unsafe_file(self):
+        self.spool.append({'i': 1})
+
+        # The items of a file others can access are not used.
+        os.chmod(self.path, 0o644)
+        other = spool.Spool('test', self.path, clock=self.clock)
+
+        self.assertRaises(OSError, len, other)
+        self.assertRaises(OSError, other.append, {'i': 2})
+
+    def test_sender_started(self):
+        sent = []
+        sender = spool.Sender(
+            spool.Spool('test', self.path), lambda item: sent.append(item),
+            num_senders=2
+        )
+
+        self.override_config('eventlet_cooperative', False)
+        sender.start()
+        sender.start()
+        self.addCleanup(sender.stop)
+
+        sender.spool.append({'i': 1})
+        sender.wake()
+
+        for i in range(100):
+            if sent and not len(sender.spool):
+                break
+
+            time.sleep(0.01)
+
+        self.assertEqual(sent, [{'i': 1}])
+        self.assertEqual(len(sender.spool), 0)
@@ -0,0 +1,125 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import tokenfile
+
+
+class TokenFileTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(TokenFileTestCase, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'st2', 'token')
+
+        def handler(method, path, headers, body):
+            time.sleep(0.05)
+            return 201, {
+                'token': 'token-%s' % len(self.server.requests),
+                'expiry': '2030-01-01T00:00:00.000000Z'
+            }
+
+        self.server = base.StubServer(handler).start()
+        self.addCleanup(self.server.stop)
+
+    def mint(self):
+        return tokenfile.mint_token(self.server.url + '/auth', 'st2', 'pass')
+
+    def test_mint_token(self):
+        token, expiry = self.mint()
+
+        self.assertEqual(token, 'token-1')
+        self.assertEqual(expiry, 1893456000)
+
+        method, path, headers, body = self.server.requests[0]
+        self.assertEqual((method, path), ('POST', '/auth/tokens'))
+        self.assertEqual(
+            headers['Authorization'],
+            'Basic ' + base64.b64encode(b'st2:pass').decode('ascii')
+        )
+
+    def test_get_cache_path(self):
+        os.environ[tokenfile.CACHE_DIR_ENV] = '/c'
+        self.addCleanup(os.environ.pop, tokenfile.CACHE_DIR_ENV)
+        path = tokenfile.get_cache_path('https://st2/auth', 'st2')
+
+        self.assertTrue(path.startswith('/c/mistral-token-'))
+        self.assertNotEqual(
+            path, tokenfile.get_cache_path('https://st2/auth', 'other')
+        )
+
+    def test_token_reused(self):
+        for i in range(3):
+            token_file = tokenfile.TokenFile(self.path)
+            self.assertEqual(token_file.get_token(self.mint), 'token-1')
+
+        self.assertEqual(len(self.server.requests), 1)
+
+        mode = os.stat(self.path).st_mode
+        self.assertEqual(stat.S_IMODE(mode), 0o600)
+
+    def test_token_minted_before_expiry(self):
+        now = [1893456000 - 120]
+        token_file = tokenfile.TokenFile(
+            self.path, margin=60, clock=lambda: now[0]
+        )
+
+        self.assertEqual(token_file.get_token(self.mint), 'token-1')
+        self.assertEqual(token_file.get_token(self.mint), 'token-1')
+
+        now[0] += 60
+        self.assertEqual(token_file.get_token(self.mint), 'token-2')
+
+    def test_unsafe_file_ignored(self):
+        token_file = tokenfile.TokenFile(self.path)
+        token_file.get_token(self.mint)
+        os.chmod(self.path, 0o644)
+
+        self.assertIsNone(token_file.read())
+
+    def test_corrupted_file_ignored(self):
+        token_file = tokenfile.TokenFile(self.path)
+        token_file.get_token(self.mint)
+
+        with open(self.path, 'w') as f:
+            f.write('foobar')
+
+        self.assertIsNone(token_file.read())
+        self.assertEqual(token_file.get_token(self.mint), 'token-2')
+
+    def test_concurrent_invocations_mint_once(self):
+        def invoke():
+            tokenfile.TokenFile(self.path).get_token(self.mint)
+
+        processes = [multiprocessing.Process(target=invoke) for i in range(4)]
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(len(self.server.requests), 1)
@@ -0,0 +1,80 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+
+import requests
+
+from st2mistral.tests.unit import base
+
+from st2mistral.utils import http
+
+
+class UnixSocketTestCase(base.St2TestCase):
+
+    def setUp(self):
+        super(UnixSocketTestCase, self).setUp()
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.socket_path = os.path.join(tmp_dir, 'st2api.sock')
+
+        self.server = base.StubServer(
+            lambda *args: (201, {'id': '123'}),
+            socket_path=self.socket_path
+        ).start()
+
+        self.addCleanup(self.server.stop)
+
+    def test_unix_scheme(self):
+        resp = http.post(self.server.url + '/v1/executions', {'a': 1},
+                         token='foobar')
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertDictEqual(resp.json(), {'id': '123'})
+
+        method, path, headers, body = self.server.requests[0]
+        self.assertEqual(path, '/v1/executions')
+        self.assertEqual(headers['X-Auth-Token'], 'foobar')
+        self.assertDictEqual(json.loads(body.decode('utf-8')), {'a': 1})
+
+    def test_mapped_base_url(self):
+        self.override_config('unix_sockets', [
+            'https://st2.example.com/api=%s' % self.socket_path
+        ])
+
+        for i in range(5):
+            resp = http.get('https://st2.example.com/api/v1/keys/k1')
+            self.assertEqual(resp.status_code, 201)
+
+        self.assertEqual(self.server.requests[0][1], '/api/v1/keys/k1')
+        self.assertEqual(
+            self.server.requests[0][2]['Host'], 'st2.example.com'
+        )
+
+        stats = http.get_pool_stats()['https://st2.example.com']
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['requests'], 5)
+
+    def test_socket_not_found(self):
+        self.override_config('retry_stop_max_msec', 0)
+        url = self.server.url.replace('st2api.sock', 'foobar.sock')
+
+        self.assertRaises(
+            requests.exceptions.ConnectionError,
+            http.get, url + '/v1/keys/k1'
+        )
@@ -0,0 +1,290 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batched dispatch of the st2 action executions.
+
+The executions dispatched concurrently to the same st2 API with the same
+auth token within the batch window are sent in a single request to the
+batch endpoint. The body of the batch request is the list of the
+execution requests as {"body": ..., "context": ...} where the context is
+the st2-context header of the individual request, along with the
+"idempotency_key" of the request if any. The body of the batch
+response is the list of the individual responses as {"status": ...,
+"body": ...} in the same order. An execution without outcome in the
+response of an accepted batch gets a 502 response and is not sent again.
+If the batch endpoint is not available, the executions are sent
+individually over the keep-alive connections of the pool and the
+endpoint is not tried again for a while.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from requests import structures
+from six.moves import http_client
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from st2mistral.utils import green
+from st2mistral.utils import http
+from st2mistral.utils import jsonutils
+from st2mistral.utils import metrics
+from st2mistral.utils import retry
+
+__all__ = [
+    'dispatch',
+    'reset'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Status codes of a st2 API which does not support the batch endpoint.
+UNSUPPORTED_STATUS_CODES = frozenset([
+    http_client.NOT_FOUND,
+    http_client.METHOD_NOT_ALLOWED,
+    http_client.NOT_IMPLEMENTED
+])
+
+# Time before the batch endpoint is tried again once not supported.
+UNSUPPORTED_RECHECK_SEC = 300
+
+_BATCHES = {}
+_UNSUPPORTED = {}
+_LOCK = threading.Lock()
+_PID = os.getpid()
+
+
+class _Item(object):
+
+    def __init__(self, body, context, idempotency_key=None):
+        self.body = body
+        self.context = context
+        self.idempotency_key = idempotency_key
+        self.done = threading.Event()
+        self.resp = None
+        self.exc = None
+
+
+class _Batch(object):
+
+    def __init__(self, url, token, policy):
+        self.url = url
+        self.token = token
+        self.policy = policy
+        self.items = []
+
+
+def _make_response(batch_resp, status, content):
+    if not isinstance(content, bytes):
+        content = jsonutils.encode(content)
+
+    resp = requests.Response()
+    resp.status_code = status
+    resp.reason = http_client.responses.get(status)
+    resp.url = batch_resp.url
+    resp.encoding = 'utf-8'
+    resp.elapsed = batch_resp.elapsed
+    resp.headers = structures.CaseInsensitiveDict({
+        'Content-Type': 'application/json',
+        'Content-Length': str(len(content))
+    })
+    resp._content = content
+    resp._content_consumed = True
+
+    return resp
+
+
+def _send(batch):
+    metrics.observe(
+        'batch_dispatch_size', len(batch.items), buckets=BATCH_SIZE_BUCKETS
+    )
+
+    data = []
+
+    for item in batch.items:
+        data.append({'body': item.body, 'context': item.context})
+
+        if item.idempotency_key:
+            data[-1]['idempotency_key'] = item.idempotency_key
+
+    try:
+        resp = http.post(
+            batch.url, data, token=batch.token, policy=batch.policy
+        )
+    except Exception as e:
+        for item in batch.items:
+            item.exc = e
+
+        return
+
+    if resp.status_code in UNSUPPORTED_STATUS_CODES:
+        LOG.info(
+            '[stackstorm] The batch endpoint %s is not available. The '
+            'executions are sent individually.', batch.url
+        )
+
+        with _LOCK:
+            _UNSUPPORTED[batch.url] = time.time() + UNSUPPORTED_RECHECK_SEC
+
+        # The items without response are sent individually.
+        return
+
+    results = None
+
+    if resp.status_code in (http_client.OK, http_client.MULTI_STATUS):
+        try:
+            results = jsonutils.loads(resp.content)
+        except ValueError:
+            pass
+
+    if not isinstance(results, list) or len(results) != len(batch.items):
+        if resp.status_code >= 300:
+            # The batch request failed as a whole so every item gets the
+            # response of the batch request.
+            for item in batch.items:
+                item.resp = _make_response(
+                    resp, resp.status_code, resp.content
+                )
+
+            return
+
+        results = [None] * len(batch.items)
+
+    for item, result in zip(batch.items, results):
+        status = result.get('status') if isinstance(result, dict) else None
+
+        if not isinstance(status, int):
+            # The batch was accepted but the outcome of the execution is
+            # unknown. It is not sent again since it may be running.
+            LOG.error(
+                '[stackstorm] The response of the batch endpoint %s has no '
+                'outcome for the execution.', batch.url
+            )
+
+            item.resp = _make_response(resp, http_client.BAD_GATEWAY, {
+                'faultstring': 'The response of the batch endpoint has no '
+                               'outcome for the execution.'
+            })
+            continue
+
+        item.resp = _make_response(resp, status, result.get('body'))
+
+
+def _flush(key, batch):
+    with _LOCK:
+        if _BATCHES.get(key) is not batch:
+            return
+
+        del _BATCHES[key]
+
+    try:
+        _send(batch)
+    except Exception as e:
+        # The items are not sent individually since the batch request may
+        # have been sent.
+        for item in batch.items:
+            if item.resp is None:
+                item.exc = e
+    finally:
+        for item in batch.items:
+            item.done.set()
+
+
+def _flush_after(key, batch, window):
+    green.sleep(window)
+    _flush(key, batch)
+
+
+def dispatch(api_url, body, context, token=None, policy=None,
+             idempotency_key=None):
+    """Send the execution request in a batch with the concurrent ones.
+
+    :param api_url: Base URL of the st2 API.
+    :type api_url: ``str``
+    :param body: Body of the execution request.
+    :type body: ``dict``
+    :param context: Context of the execution (i.e. st2-context header).
+    :type context: ``dict``
+    :param idempotency_key: Key of the execution request (i.e.
+        Idempotency-Key header).
+    :type idempotency_key: ``str``
+
+    :rtype: ``requests.Response`` or None if the execution must be sent
+        individually
+    """
+    global _PID
+
+    conf = cfg.CONF.st2
+    window = conf.action_batch_window_msec / 1000.0
+
+    if window <= 0:
+        return None
+
+    url = api_url + conf.action_batch_path
+    key = (url, token)
+    item = _Item(body, context, idempotency_key)
+
+    with _LOCK:
+        if _PID != os.getpid():
+            _BATCHES.clear()
+            _UNSUPPORTED.clear()
+            _PID = os.getpid()
+
+        if _UNSUPPORTED.get(url, 0) > time.time():
+            metrics.incr('batch_dispatch_total', outcome='individual')
+            return None
+
+        batch = _BATCHES.get(key)
+        flush_later = batch is None
+
+        if batch is None:
+            batch = _Batch(url, token, policy or retry.RetryPolicy())
+            _BATCHES[key] = batch
+
+        batch.items.append(item)
+        flush_now = len(batch.items) >= conf.action_batch_max_size
+
+    if flush_now:
+        _flush(key, batch)
+    elif flush_later:
+        green.spawn(_flush_after, key, batch, window)
+
+    timeout = window + batch.policy.deadline + batch.policy.read_timeout
+
+    if not item.done.wait(timeout):
+        raise Exception('Timed out waiting for the batched execution request.')
+
+    if item.exc is not None:
+        raise item.exc
+
+    if item.resp is None:
+        metrics.incr('batch_dispatch_total', outcome='individual')
+        return None
+
+    metrics.incr('batch_dispatch_total', outcome='batched')
+
+    return item.resp
+
+
+def reset():
+    with _LOCK:
+        _BATCHES.clear()
+        _UNSUPPORTED.clear()
@@ -0,0 +1,314 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import errno
+import hashlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+import six
+
+from oslo_log import log as logging
+
+from st2mistral.utils import green
+from st2mistral.utils import jsonutils
+from st2mistral.utils import metrics
+
+__all__ = [
+    'SharedTTLCache',
+    'TTLCache',
+    'check_db_files',
+    'get_digest'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+
+def get_digest(value):
+    """Return the digest used as the cache key of a secret value.
+
+    The secret (i.e. auth token) itself is never kept in the cache.
+    """
+    if isinstance(value, six.text_type):
+        value = value.encode('utf-8')
+
+    return hashlib.sha256(value).hexdigest()
+
+
+class TTLCache(object):
+    """Bounded cache which expires the entries after a time to live.
+
+    The least recently used entry is evicted when the cache is full. The
+    expired entries are evicted when they are looked up or when they are
+    the least recently used. The hits, misses and evictions are counted
+    in the metrics with the name of the cache as label.
+    """
+
+    def __init__(self, name, max_size=1024, ttl=300, clock=time.time):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            return entry is not None and entry[1] > self._clock()
+
+    def _evict(self, key, reason):
+        del self._entries[key]
+        metrics.incr('cache_evictions_total', cache=self.name, reason=reason)
+
+    def get(self, key, default=None):
+        return self.get_with_expiry(key, default)[0]
+
+    def get_with_expiry(self, key, default=None):
+        """Return the value of the key and the time it expires at.
+
+        :rtype: ``tuple`` of (value, expires at) or (default, None)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[1] <= self._clock():
+                self._evict(key, 'expired')
+                entry = None
+
+            if entry is None:
+                metrics.incr('cache_misses_total', cache=self.name)
+                return default, None
+
+            # Move the entry to the most recently used end.
+            del self._entries[key]
+            self._entries[key] = entry
+
+        metrics.incr('cache_hits_total', cache=self.name)
+
+        return entry
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, self._clock() + ttl)
+
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                expired = self._entries[oldest][1] <= self._clock()
+                self._evict(oldest, 'expired' if expired else 'capacity')
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def check_db_files(path, mask=stat.S_IWGRP | stat.S_IWOTH):
+    """Create the SQLite file if missing and check it can be trusted.
+
+    The file is created readable by its owner only. The file and its WAL
+    must be owned by the user and have none of the mode bits of the mask.
+
+    :raises: OSError if the files cannot be trusted.
+    """
+    os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+
+    for file_path in (path, path + '-wal', path + '-shm'):
+        try:
+            info = os.stat(file_path)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+
+        if info.st_uid != os.getuid() or info.st_mode & mask:
+            raise OSError(
+                errno.EPERM, 'Not owned by the user or accessible by others',
+                file_path
+            )
+
+
+class SharedTTLCache(object):
+    """TTL cache shared by the processes of the host in a SQLite file.
+
+    The interface is the one of TTLCache. The values must be serializable
+    to JSON. The database is in WAL mode so readers are not blocked by a
+    writer, and each process and thread has its own connection. Reads do
+    not update the entries so the entries closest to expire are evicted
+    first when the cache is full instead of the least recently used. The
+    queries are run in the native thread pool under eventlet. The file is
+    created readable by its owner only and is not used if owned by another
+    user or writable by others. The cache behaves as empty if the database
+    cannot be used.
+    """
+
+    def __init__(self, name, path, max_size=1024, ttl=300, clock=time.time,
+                 busy_timeout=1.0):
+        self.name = name
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._local = threading.local()
+
+    def _get_conn(self):
+        conn = getattr(self._local, 'conn', None)
+
+        # The connections must not be used across a fork.
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        # The entries may grant access (i.e. the digests of the auth tokens
+        # validated) so the files must only be writable by their owner.
+        check_db_files(self.path)
+
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None
+        )
+
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries ('
+            'name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+            'expires REAL NOT NULL, PRIMARY KEY (name, key))'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS cache_entries_expires '
+            'ON cache_entries (name, expires)'
+        )
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        return conn
+
+    def _execute(self, query, *args):
+        try:
+            return green.call_native(self._fetch, query, args)
+        except (sqlite3.Error, OSError) as e:
+            LOG.warning(
+                '[stackstorm] Unable to use the shared cache %s at %s. %s',
+                self.name, self.path, e
+            )
+            metrics.incr('cache_errors_total', cache=self.name)
+            return None
+
+    def _fetch(self, query, args):
+        return self._get_conn().execute(query, args).fetchall()
+
+    def __len__(self):
+        rows = self._execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE name = ? '
+            'AND expires > ?', self.name, self._clock()
+        )
+
+        return rows[0][0] if rows else 0
+
+    def __contains__(self, key):
+        return bool(self._execute(
+            'SELECT 1 FROM cache_entries WHERE name = ? AND key = ? '
+            'AND expires > ?', self.name, key, self._clock()
+        ))
+
+    def get(self, key, default=None):
+        return self.get_with_expiry(key, default)[0]
+
+    def get_with_expiry(self, key, default=None):
+        """Return the value of the key and the time it expires at.
+
+        :rtype: ``tuple`` of (value, expires at) or (default, None)
+        """
+        rows = self._execute(
+            'SELECT value, expires FROM cache_entries WHERE name = ? '
+            'AND key = ? AND expires > ?', self.name, key, self._clock()
+        )
+
+        if not rows:
+            metrics.incr('cache_misses_total', cache=self.name)
+            return default, None
+
+        metrics.incr('cache_hits_total', cache=self.name)
+
+        return jsonutils.loads(rows[0][0]), rows[0][1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        now = self._clock()
+
+        self._execute(
+            'INSERT OR REPLACE INTO cache_entries (name, key, value, expires) '
+            'VALUES (?, ?, ?, ?)',
+            self.name, key, jsonutils.dumps(value), now + ttl
+        )
+
+        self._execute(
+            'DELETE FROM cache_entries WHERE name = ? AND expires <= ?',
+            self.name, now
+        )
+
+        rows = self._execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE name = ?', self.name
+        )
+
+        excess = rows[0][0] - self.max_size if rows else 0
+
+        if excess > 0:
+            self._execute(
+                'DELETE FROM cache_entries WHERE name = ? AND key IN ('
+                'SELECT key FROM cache_entries WHERE name = ? '
+                'ORDER BY expires LIMIT ?)',
+                self.name, self.name, excess
+            )
+
+            metrics.incr(
+                'cache_evictions_total',
+                value=excess,
+                cache=self.name,
+                reason='capacity'
+            )
+
+    def delete(self, key):
+        self._execute(
+            'DELETE FROM cache_entries WHERE name = ? AND key = ?',
+            self.name, key
+        )
+
+    def clear(self):
+        self._execute('DELETE FROM cache_entries WHERE name = ?', self.name)
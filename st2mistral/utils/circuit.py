@@ -0,0 +1,172 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from st2mistral.utils import metrics
+
+__all__ = [
+    'CLOSED',
+    'HALF_OPEN',
+    'OPEN',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'get_breaker',
+    'reset_breakers'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker(object):
+    """Circuit breaker which fails calls fast while an endpoint is unhealthy.
+
+    The circuit opens after the failure threshold of consecutive failures
+    is reached. While open, calls are rejected until the reset timeout
+    elapses. The circuit is then half open and a limited number of trial
+    calls are let through. A successful trial call closes the circuit and
+    a failed one opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30,
+                 half_open_max_calls=1, clock=time.time):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_calls = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._get_state()
+
+    def _get_state(self):
+        if (self._state == OPEN and
+                self._clock() - self._opened_at >= self.reset_timeout):
+            self._transition(HALF_OPEN)
+
+        return self._state
+
+    def _transition(self, state):
+        LOG.warning(
+            '[stackstorm] Circuit breaker for %s changed from %s to %s.',
+            self.name, self._state, state
+        )
+
+        metrics.incr(
+            'http_circuit_transitions_total',
+            pool=self.name,
+            from_state=self._state,
+            to_state=state
+        )
+
+        self._state = state
+        self._half_open_calls = 0
+
+        if state == OPEN:
+            self._opened_at = self._clock()
+        elif state == CLOSED:
+            self._failures = 0
+
+    def before_call(self):
+        """Check whether the call is allowed through the circuit.
+
+        :raises: CircuitOpenError if the circuit is open or if the trial
+            calls for the half open circuit are already in progress.
+        """
+        with self._lock:
+            state = self._get_state()
+
+            if state == CLOSED:
+                return
+
+            if (state == HALF_OPEN and
+                    self._half_open_calls < self.half_open_max_calls):
+                self._half_open_calls += 1
+                return
+
+            retry_in = max(
+                0, self.reset_timeout - (self._clock() - self._opened_at)
+            )
+
+        metrics.incr('http_circuit_rejected_total', pool=self.name)
+
+        raise CircuitOpenError(
+            'The st2 API at %s is unavailable. The circuit breaker is open '
+            'after %s consecutive failures. Calls are rejected for another '
+            '%.1f seconds.' % (self.name, self.failure_threshold, retry_in)
+        )
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+            elif (self._state == CLOSED and
+                    self._failures >= self.failure_threshold):
+                self._transition(OPEN)
+
+
+def get_breaker(name):
+    """Return the circuit breaker for the endpoint."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=cfg.CONF.st2.circuit_failure_threshold,
+                reset_timeout=cfg.CONF.st2.circuit_reset_timeout_sec,
+                half_open_max_calls=cfg.CONF.st2.circuit_half_open_max_calls
+            )
+
+            _BREAKERS[name] = breaker
+
+    return breaker
+
+
+def reset_breakers():
+    with _BREAKERS_LOCK:
+        _BREAKERS.clear()
@@ -0,0 +1,402 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Adaptive concurrency limit of the dispatches to a st2 API.
+
+The number of dispatches in flight to a st2 API is limited and the limit
+adapts to the signals of the st2 API (AIMD). It is increased by about
+one per round trip while the dispatches succeed within the latency
+tolerance of the baseline latency, which is the lowest latency of the
+recent window. It is decreased by the backoff ratio once per round trip
+if a dispatch fails, is throttled (i.e. 429, 503) or is slower than
+tolerated.
+
+The dispatches over the limit wait in a queue up to the max wait. The
+queue is drained with weighted fair queuing across the flows (i.e. root
+workflow executions) so a large fan-out does not starve the other
+workflows. Each dispatch queued is tagged with the virtual time its flow
+would finish at if served at its weight and the dispatch with the
+earliest tag is served first. The dispatches of the same flow are served
+in order.
+"""
+
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+from six.moves import http_client
+from six.moves.urllib import parse as urlparse
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from st2mistral.utils import metrics
+
+__all__ = [
+    'AdaptiveLimiter',
+    'LimitExceededError',
+    'Slot',
+    'get_limiter',
+    'get_weight',
+    'is_overloaded',
+    'limit',
+    'reset_limiters'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+# The baseline latency is the lowest latency of the current or previous
+# window so it follows a lasting change of the latency of the st2 API.
+BASELINE_WINDOW_SEC = 60
+
+TOO_MANY_REQUESTS = 429
+
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+class LimitExceededError(Exception):
+    pass
+
+
+def is_overloaded(status_code):
+    """Return True if the status code signals an overloaded st2 API."""
+    return (
+        status_code == TOO_MANY_REQUESTS or
+        status_code >= http_client.INTERNAL_SERVER_ERROR
+    )
+
+
+class Slot(object):
+    """Dispatch in flight, flagged as failed to decrease the limit."""
+
+    __slots__ = ('started', 'error')
+
+    def __init__(self, started):
+        self.started = started
+        self.error = False
+
+
+class _Waiter(object):
+
+    __slots__ = ('event', 'flow', 'name', 'start', 'granted')
+
+    def __init__(self, flow, name, start):
+        self.event = threading.Event()
+        self.flow = flow
+        self.name = name
+        self.start = start
+        self.granted = False
+
+
+class AdaptiveLimiter(object):
+    """Limit of the calls in flight which adapts to latency and errors."""
+
+    def __init__(self, name, initial_limit=20, min_limit=1, max_limit=200,
+                 max_wait=30, latency_tolerance=2.0, backoff_ratio=0.75,
+                 clock=time.time):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.max_wait = max_wait
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._flows = {}
+        self._depths = {}
+        self._name_depths = {}
+        self._limit = float(
+            min(self.max_limit, max(self.min_limit, initial_limit))
+        )
+        self._inflight = 0
+        self._baseline = None
+        self._window_min = None
+        self._window_started = clock()
+        self._decreased_at = None
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    @property
+    def queued(self):
+        return sum(self._depths.values())
+
+    def acquire(self, flow=None, name=None, weight=1.0):
+        """Wait for the number of calls in flight to be under the limit.
+
+        The slots are handed over to the waiting calls so the calls
+        released cannot take them over again.
+
+        :param flow: Key of the flow the call is queued fairly with.
+        :param name: Name of the flow in the metrics (i.e. workflow name).
+        :type name: ``str``
+        :param weight: Share of the slots of the flow relative to others.
+        :type weight: ``float``
+
+        :raises: LimitExceededError if the max wait elapses first.
+
+        :rtype: ``float`` time the call started
+        """
+        queued = time.time()
+
+        with self._lock:
+            if not self._depths and self._inflight < int(self._limit):
+                self._inflight += 1
+                return self._clock()
+
+            # The flow is tagged from the virtual time if it was idle so it
+            # cannot claim the slots it did not use meanwhile.
+            start = max(self._vtime, self._flows.get(flow, 0.0))
+            self._flows[flow] = start + 1.0 / weight
+            waiter = _Waiter(flow, name, start)
+
+            heapq.heappush(
+                self._queue, (start + 1.0 / weight, next(self._seq), waiter)
+            )
+
+            self._set_depth(waiter, 1)
+
+        if not waiter.event.wait(self.max_wait):
+            with self._lock:
+                # The slot may be handed over as the wait elapses.
+                timed_out = not waiter.granted
+
+                if timed_out:
+                    # The waiter is left in the queue and skipped.
+                    waiter.granted = True
+                    self._set_depth(waiter, -1)
+
+            if timed_out:
+                metrics.incr(
+                    'action_queue_timeouts_total', pool=self.name,
+                    workflow=name
+                )
+
+                raise LimitExceededError(
+                    'The st2 API at %s is overloaded. The dispatch waited %s '
+                    'seconds for one of the %s calls in flight to '
+                    'complete.' % (self.name, self.max_wait, self.limit)
+                )
+
+        metrics.observe(
+            'action_queue_seconds', time.time() - queued, pool=self.name,
+            workflow=name
+        )
+
+        return self._clock()
+
+    def _set_depth(self, waiter, delta):
+        depth = self._depths.get(waiter.flow, 0) + delta
+
+        if depth:
+            self._depths[waiter.flow] = depth
+        else:
+            del self._depths[waiter.flow]
+
+            # The tag of an idle flow is not needed anymore.
+            self._flows.pop(waiter.flow, None)
+
+        # The depth is reported per workflow name rather than per flow so
+        # the number of gauges is bounded.
+        name_depth = self._name_depths.get(waiter.name, 0) + delta
+        self._name_depths[waiter.name] = name_depth
+
+        metrics.gauge(
+            'action_queue_depth', name_depth, pool=self.name,
+            workflow=waiter.name
+        )
+
+    def _grant(self):
+        while self._queue and self._inflight < int(self._limit):
+            waiter = heapq.heappop(self._queue)[2]
+
+            if waiter.granted:
+                continue
+
+            self._vtime = waiter.start
+            self._inflight += 1
+            waiter.granted = True
+            self._set_depth(waiter, -1)
+            waiter.event.set()
+
+    def release(self, started, error=False):
+        """Release the call and adapt the limit to its latency and outcome.
+
+        :param started: Time the call started as returned by acquire.
+        :type started: ``float``
+        :param error: Whether the call failed or was throttled.
+        :type error: ``bool``
+        """
+        now = self._clock()
+        latency = now - started
+
+        with self._lock:
+            used = self._inflight
+            self._inflight -= 1
+
+            if now - self._window_started >= BASELINE_WINDOW_SEC:
+                if self._window_min is not None:
+                    self._baseline = self._window_min
+
+                self._window_min = None
+                self._window_started = now
+
+            if not error and (self._window_min is None or
+                              latency < self._window_min):
+                self._window_min = latency
+
+            baseline = min(
+                x for x in (self._baseline, self._window_min, latency)
+                if x is not None
+            )
+
+            slow = latency > baseline * self.latency_tolerance
+
+            if error or slow:
+                # The calls started before the last decrease had their
+                # latency already accounted for so the limit is decreased
+                # once per round trip instead of once per call.
+                if self._decreased_at is None or started >= self._decreased_at:
+                    self._decrease(now, 'error' if error else 'latency')
+            elif used * 2 >= int(self._limit):
+                # The limit is only increased while it is used, by one
+                # over the number of calls of a round trip.
+                self._limit = min(
+                    self.max_limit, self._limit + 1.0 / self._limit
+                )
+
+            self._grant()
+
+    def _decrease(self, now, reason):
+        limit = max(self.min_limit, self._limit * self.backoff_ratio)
+
+        LOG.debug(
+            '[stackstorm] Concurrency limit for %s decreased from %s to %s '
+            '(%s).', self.name, int(self._limit), int(limit), reason
+        )
+
+        metrics.incr(
+            'action_concurrency_decreases_total', pool=self.name, reason=reason
+        )
+
+        self._limit = limit
+        self._decreased_at = now
+
+    @contextlib.contextmanager
+    def slot(self, flow=None, name=None, weight=1.0):
+        """Hold a slot for the call, flagged as failed if an error is raised.
+
+        :rtype: :class:`Slot`
+        """
+        slot = Slot(self.acquire(flow=flow, name=name, weight=weight))
+
+        try:
+            yield slot
+        except Exception:
+            slot.error = True
+            raise
+        finally:
+            self.release(slot.started, slot.error)
+
+
+def get_limiter(url):
+    """Return the limiter for the st2 API of the url, None if disabled."""
+    if not cfg.CONF.st2.action_adaptive_concurrency:
+        return None
+
+    parts = urlparse.urlsplit(url)
+    name = '%s://%s' % (parts.scheme, parts.netloc)
+
+    with _LIMITERS_LOCK:
+        limiter = _LIMITERS.get(name)
+
+        if limiter is None:
+            limiter = AdaptiveLimiter(
+                name,
+                initial_limit=cfg.CONF.st2.action_concurrency_initial,
+                min_limit=cfg.CONF.st2.action_concurrency_min,
+                max_limit=cfg.CONF.st2.action_concurrency_max,
+                max_wait=cfg.CONF.st2.action_concurrency_max_wait_sec,
+                latency_tolerance=(
+                    cfg.CONF.st2.action_concurrency_latency_tolerance
+                ),
+                backoff_ratio=cfg.CONF.st2.action_concurrency_backoff_ratio
+            )
+
+            _LIMITERS[name] = limiter
+
+    return limiter
+
+
+def get_weight(name):
+    """Return the weight of the workflow from the action_dispatch_weights."""
+    weight = (cfg.CONF.st2.action_dispatch_weights or {}).get(name)
+
+    try:
+        weight = float(weight or 1)
+    except ValueError:
+        weight = 0
+
+    if weight <= 0:
+        LOG.warning(
+            '[stackstorm] Invalid dispatch weight "%s" for the workflow %s. '
+            'The default weight is used instead.',
+            cfg.CONF.st2.action_dispatch_weights.get(name), name
+        )
+
+        return 1.0
+
+    return weight
+
+
+@contextlib.contextmanager
+def limit(url, flow=None, name=None):
+    """Hold a slot of the limiter for the st2 API of the url.
+
+    The slot is not limited if the adaptive concurrency is disabled.
+
+    :param flow: Key of the flow the call is queued fairly with (i.e. root
+        workflow execution id).
+    :param name: Name of the workflow weighted by the
+        action_dispatch_weights option and reported in the metrics.
+    :type name: ``str``
+
+    :rtype: :class:`Slot`
+    """
+    limiter = get_limiter(url)
+
+    if limiter is None:
+        yield Slot(None)
+        return
+
+    with limiter.slot(flow=flow, name=name, weight=get_weight(name)) as slot:
+        yield slot
+
+
+def reset_limiters():
+    with _LIMITERS_LOCK:
+        _LIMITERS.clear()
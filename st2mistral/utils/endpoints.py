@@ -0,0 +1,146 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+import threading
+import time
+
+from oslo_config import cfg
+
+from st2mistral.utils import metrics
+
+__all__ = [
+    'EndpointGroup',
+    'get_group',
+    'reset_groups'
+]
+
+
+_GROUPS = {}
+_GROUPS_LOCK = threading.Lock()
+
+
+class EndpointGroup(object):
+    """Equivalent base URLs of st2 replicas picked by latency and health.
+
+    The latency of each replica is tracked as an exponentially weighted
+    moving average. A replica is picked by the power of two choices, the
+    one with the lower latency weighted by the requests in flight out of
+    two healthy replicas picked at random. A replica is considered down
+    for the cooldown period after a failed request.
+    """
+
+    def __init__(self, base_urls, alpha=0.3, cooldown=10.0,
+                 clock=time.time):
+        self.base_urls = [url.rstrip('/') for url in base_urls]
+        self.alpha = alpha
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._stats = dict(
+            (url, {'latency': None, 'inflight': 0, 'down_until': 0})
+            for url in self.base_urls
+        )
+
+    def match(self, url):
+        """Return the base URL of the group the url starts with if any."""
+        for base_url in self.base_urls:
+            if url == base_url or url.startswith(base_url + '/'):
+                return base_url
+
+        return None
+
+    def _get_score(self, base_url):
+        stats = self._stats[base_url]
+
+        return (stats['latency'] or 0.0) * (stats['inflight'] + 1)
+
+    def choose(self, exclude=None):
+        """Pick the base URL for the next request.
+
+        :param exclude: Base URLs to avoid (i.e. already tried) unless no
+            other replica is left.
+        :type exclude: ``list``
+        """
+        exclude = exclude or []
+
+        with self._lock:
+            now = self._clock()
+            candidates = [u for u in self.base_urls if u not in exclude]
+            candidates = candidates or list(self.base_urls)
+            healthy = [
+                u for u in candidates
+                if self._stats[u]['down_until'] <= now
+            ]
+
+            candidates = healthy or candidates
+
+            if len(candidates) > 1:
+                candidates = random.sample(candidates, 2)
+
+            base_url = min(candidates, key=self._get_score)
+            self._stats[base_url]['inflight'] += 1
+
+        return base_url
+
+    def record(self, base_url, latency, ok):
+        """Record the outcome of a request sent to the base URL."""
+        with self._lock:
+            stats = self._stats[base_url]
+            stats['inflight'] = max(0, stats['inflight'] - 1)
+
+            if not ok:
+                stats['down_until'] = self._clock() + self.cooldown
+                metrics.incr('http_endpoint_failures_total', endpoint=base_url)
+                return
+
+            stats['down_until'] = 0
+
+            if stats['latency'] is None:
+                stats['latency'] = latency
+            else:
+                stats['latency'] += self.alpha * (latency - stats['latency'])
+
+
+def get_group(url):
+    """Return the endpoint group and base URL matching the url if any.
+
+    :rtype: ``tuple`` of (EndpointGroup, base URL) or (None, None)
+    """
+    for option in ('api_urls', 'auth_urls'):
+        base_urls = tuple(getattr(cfg.CONF.st2, option) or [])
+
+        if len(base_urls) < 2:
+            continue
+
+        with _GROUPS_LOCK:
+            group = _GROUPS.get(base_urls)
+
+            if group is None:
+                group = EndpointGroup(base_urls)
+                _GROUPS[base_urls] = group
+
+        base_url = group.match(url)
+
+        if base_url:
+            return group, base_url
+
+    return None, None
+
+
+def reset_groups():
+    with _GROUPS_LOCK:
+        _GROUPS.clear()
@@ -0,0 +1,213 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Cooperation with the eventlet hub of the Mistral processes.
+
+The Mistral engine, executor and notifier run under eventlet. A blocking
+call on a socket which is not monkey patched stalls every green thread
+of the process so the blocking calls are sent to the eventlet native
+thread pool instead. The helpers fall back to the standard threading
+primitives if eventlet is not installed, the cooperation is disabled or
+the caller is a native thread outside of the eventlet hub (i.e. a
+threaded Mistral API) since the green primitives deadlock there.
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+from oslo_config import cfg
+
+from st2mistral.utils import metrics
+
+try:
+    import eventlet
+    from eventlet import hubs
+    from eventlet import patcher
+    from eventlet import semaphore as green_semaphore
+    from eventlet import tpool
+except ImportError:
+    eventlet = None
+
+__all__ = [
+    'is_cooperative',
+    'sleep',
+    'call',
+    'call_native',
+    'spawn',
+    'native_lock',
+    'limit',
+    'reset_limiter'
+]
+
+
+_TPOOL_PID = None
+_LIMITER = None
+_LIMITER_KEY = None
+_LIMITER_LOCK = threading.Lock()
+
+
+def _in_hub_thread():
+    # The thread module is green once monkey patched, otherwise only the
+    # native thread running the eventlet hub runs green threads.
+    return (
+        patcher.is_monkey_patched('thread') or
+        getattr(hubs._threadlocal, 'hub', None) is not None
+    )
+
+
+def is_cooperative():
+    """Return True if the calls must yield to the eventlet hub.
+
+    The calls only yield if the caller runs in the thread of the eventlet
+    hub, the native threads block as usual.
+    """
+    return (
+        eventlet is not None and cfg.CONF.st2.eventlet_cooperative and
+        _in_hub_thread()
+    )
+
+
+def sleep(seconds):
+    """Sleep without blocking the other green threads if cooperative."""
+    if is_cooperative():
+        eventlet.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def _execute(func, *args, **kwargs):
+    global _TPOOL_PID
+
+    # The native threads of the pool are not carried over to a forked
+    # process and the pool is not set up again there, so the function is
+    # called directly rather than waiting on a pool without threads.
+    if _TPOOL_PID is None:
+        _TPOOL_PID = os.getpid()
+    elif _TPOOL_PID != os.getpid():
+        return func(*args, **kwargs)
+
+    return tpool.execute(func, *args, **kwargs)
+
+
+def call(func, *args, **kwargs):
+    """Call the blocking function without blocking the other green threads.
+
+    The function is run in the native thread pool if cooperative and the
+    socket module is not monkey patched. It is called directly otherwise.
+    """
+    if is_cooperative() and not patcher.is_monkey_patched('socket'):
+        return _execute(func, *args, **kwargs)
+
+    return func(*args, **kwargs)
+
+
+def call_native(func, *args, **kwargs):
+    """Call the blocking native function without blocking the hub.
+
+    Unlike call, the function is run in the native thread pool even if the
+    modules are monkey patched since native code (i.e. SQLite waiting on
+    the lock of a database) never yields to the hub.
+    """
+    if is_cooperative():
+        return _execute(func, *args, **kwargs)
+
+    return func(*args, **kwargs)
+
+
+def spawn(func, *args, **kwargs):
+    """Run the function in the background.
+
+    The function runs in a green thread if cooperative and in a daemon
+    thread otherwise.
+    """
+    if is_cooperative():
+        eventlet.spawn_n(func, *args, **kwargs)
+        return
+
+    thread = threading.Thread(target=func, args=args, kwargs=kwargs)
+    thread.daemon = True
+    thread.start()
+
+
+def native_lock():
+    """Return a lock which may be held by the functions run by call.
+
+    The lock is a native lock even if the thread module is monkey patched
+    since the functions may run in the native thread pool. It must not be
+    held across a yield to the hub.
+    """
+    if eventlet is not None:
+        return patcher.original('threading').Lock()
+
+    return threading.Lock()
+
+
+def _get_limiter():
+    global _LIMITER, _LIMITER_KEY
+
+    size = cfg.CONF.st2.max_inflight_requests
+
+    if size <= 0:
+        return None
+
+    # The green threads of the hub and the native threads wait on their
+    # own limiter since neither may block on the semaphore of the other.
+    cooperative = is_cooperative()
+    key = (os.getpid(), size)
+
+    with _LIMITER_LOCK:
+        if _LIMITER_KEY != key:
+            _LIMITER = {}
+            _LIMITER_KEY = key
+
+        if cooperative not in _LIMITER:
+            _LIMITER[cooperative] = (
+                green_semaphore.Semaphore(size) if cooperative
+                else threading.BoundedSemaphore(size)
+            )
+
+        return _LIMITER[cooperative]
+
+
+@contextlib.contextmanager
+def limit():
+    """Hold one of the in-flight request slots of the process.
+
+    The slots are not limited if max_inflight_requests is zero.
+    """
+    limiter = _get_limiter()
+
+    if limiter is None:
+        yield
+        return
+
+    if not limiter.acquire(False):
+        metrics.incr('http_inflight_waits_total')
+        limiter.acquire()
+
+    try:
+        yield
+    finally:
+        limiter.release()
+
+
+def reset_limiter():
+    global _LIMITER, _LIMITER_KEY
+
+    with _LIMITER_LOCK:
+        _LIMITER = None
+        _LIMITER_KEY = None
@@ -13,40 +13,375 @@
 #    limitations under the License.
 
 import copy
-import json
+import os
+import re
 import requests
-import retrying
+from requests import adapters
+from six.moves import http_cookiejar
+from six.moves.urllib import parse as urlparse
+import threading
+import time
+import zlib
 
 from oslo_config import cfg
 from oslo_log import log as logging
 
+from st2mistral.utils import circuit
+from st2mistral.utils import endpoints
+from st2mistral.utils import green
+from st2mistral.utils import jsonutils
+from st2mistral.utils import metrics
+from st2mistral.utils import retry
+from st2mistral.utils import unixsocket
+
 
 LOG = logging.getLogger(__name__)
 
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+_SESSIONS_PID = os.getpid()
+
+ENDPOINT_TEMPLATES = [
+    (re.compile(r'/executions/[^/]+$'), '/executions/{id}'),
+    (re.compile(r'/executions$'), '/executions'),
+    (re.compile(r'/keys/[^/]+$'), '/keys/{key}'),
+    (re.compile(r'/tokens/validate$'), '/tokens/validate')
+]
+
+
+def get_endpoint_template(url):
+    """Return the st2 API endpoint template of the url for the metrics."""
+    path = urlparse.urlsplit(url).path.rstrip('/')
+
+    for regex, template in ENDPOINT_TEMPLATES:
+        if regex.search(path):
+            return template
+
+    return 'other'
+
+
+def _get_pool_key(url):
+    parts = urlparse.urlsplit(url)
+
+    return '%s://%s' % (parts.scheme, parts.netloc)
+
+
+def _get_breaker_key(url):
+    # The st2 API and auth may be served by the same host under their own
+    # path (i.e. behind nginx) so the failures of one must not open the
+    # circuit of the other.
+    parts = urlparse.urlsplit(url)
+    segment = parts.path.lstrip('/').split('/', 1)[0]
+
+    return '%s://%s/%s' % (parts.scheme, parts.netloc, segment)
+
+
+def _create_session():
+    session = requests.Session()
+    session.verify = False
+
+    # The session is shared across callers with different auth tokens so
+    # cookies returned by st2 must not be sent along with other requests.
+    session.cookies.set_policy(
+        http_cookiejar.DefaultCookiePolicy(allowed_domains=[])
+    )
+
+    pool_kwargs = {
+        'pool_connections': cfg.CONF.st2.pool_connections,
+        'pool_maxsize': cfg.CONF.st2.pool_maxsize,
+        'pool_block': cfg.CONF.st2.pool_block
+    }
+
+    adapter = adapters.HTTPAdapter(**pool_kwargs)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.mount(unixsocket.SCHEME + '://', unixsocket.UnixAdapter(
+        **pool_kwargs
+    ))
+
+    # The adapter mounted on the longest prefix matching the url is used so
+    # the st2 API mapped to a socket is reached over the socket.
+    for mapping in cfg.CONF.st2.unix_sockets or []:
+        base_url, socket_path = mapping.rsplit('=', 1)
+        session.mount(base_url.rstrip('/'), unixsocket.UnixAdapter(
+            socket_path=socket_path, **pool_kwargs
+        ))
+
+    return session
+
+
+def get_session(url):
+    """Return the keep-alive session shared for the host of the url.
+
+    The sessions are kept per scheme and host so connections to the st2
+    endpoints are reused across executor threads. The sessions are reset
+    if the process is forked so connections are never shared with the
+    parent process.
+    """
+    global _SESSIONS_PID
+
+    key = _get_pool_key(url)
 
-def retry_on_exceptions(exc):
-    if isinstance(exc, requests.exceptions.ConnectionError):
-        LOG.warning(
-            '[stackstorm] HTTP request returned connection error. '
-            'Retrying...'
+    with _SESSIONS_LOCK:
+        if _SESSIONS_PID != os.getpid():
+            _SESSIONS.clear()
+            _SESSIONS_PID = os.getpid()
+
+        session = _SESSIONS.get(key)
+        created = session is None
+
+        if created:
+            session = _create_session()
+            _SESSIONS[key] = session
+            metrics.incr('http_sessions_created_total', pool=key)
+
+    if created:
+        metrics.start_textfile_exporter()
+
+    return session
+
+
+def reset_sessions():
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+
+    for session in sessions:
+        session.close()
+
+
+def get_pool_stats():
+    """Return the connection pool stats of the shared sessions.
+
+    :rtype: ``dict`` of pool key to stats
+    """
+    stats = {}
+
+    with _SESSIONS_LOCK:
+        sessions = dict(_SESSIONS)
+
+    for key, session in sessions.items():
+        conn_pools = []
+
+        for adapter in set(session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            conn_pools.extend(pools.get(k) for k in pools.keys())
+
+        conn_pools = [p for p in conn_pools if p is not None]
+
+        stats[key] = {
+            'connections_created': sum(p.num_connections for p in conn_pools),
+            'requests': sum(p.num_requests for p in conn_pools)
+        }
+
+    return stats
+
+
+def _collect_pool_stats():
+    for key, stats in get_pool_stats().items():
+        metrics.gauge(
+            'http_pool_connections_created', stats['connections_created'],
+            pool=key
         )
+        metrics.gauge('http_pool_requests', stats['requests'], pool=key)
 
-        return True
-    else:
-        LOG.error(
-            '[stackstorm] HTTP request returned unexpected error. %s' %
-            str(exc.message)
+
+metrics.register_collector(_collect_pool_stats)
+
+
+def _encode_body(data, headers):
+    body = jsonutils.encode(data)
+    encoding = cfg.CONF.st2.request_compression
+
+    if (encoding == 'none' or
+            len(body) < cfg.CONF.st2.request_compression_min_bytes):
+        return body
+
+    # The wbits offset of 16 writes the gzip header and trailer instead of
+    # the zlib ones which are expected for deflate.
+    wbits = zlib.MAX_WBITS | 16 if encoding == 'gzip' else zlib.MAX_WBITS
+    compressor = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    compressed = compressor.compress(body) + compressor.flush()
+
+    metrics.incr('http_compressed_requests_total', encoding=encoding)
+    metrics.incr(
+        'http_compression_saved_bytes_total',
+        len(body) - len(compressed),
+        encoding=encoding
+    )
+
+    headers['Content-Encoding'] = encoding
+
+    return compressed
+
+
+def _send(method, url, timeout, **kwargs):
+    key = _get_pool_key(url)
+    endpoint = get_endpoint_template(url)
+    session = get_session(url)
+    breaker = None
+
+    if cfg.CONF.st2.circuit_breaker_enabled:
+        breaker = circuit.get_breaker(_get_breaker_key(url))
+        breaker.before_call()
+
+    metrics.incr('http_requests_total', method=method, pool=key)
+
+    metrics.incr(
+        'http_request_bytes_total',
+        len(kwargs.get('data') or b''),
+        method=method,
+        endpoint=endpoint
+    )
+
+    started = time.time()
+
+    try:
+        resp = session.request(method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException as e:
+        metrics.incr(
+            'http_errors_total',
+            method=method,
+            endpoint=endpoint,
+            error=e.__class__.__name__
         )
 
-        return False
+        if breaker:
+            breaker.record_failure()
+        raise
+
+    metrics.observe(
+        'http_request_duration_seconds',
+        time.time() - started,
+        method=method,
+        endpoint=endpoint
+    )
+
+    metrics.incr(
+        'http_responses_total',
+        method=method,
+        endpoint=endpoint,
+        code=resp.status_code
+    )
+
+    # The body of a streamed response is not read here and only the size
+    # advertised by the server is known.
+    if kwargs.get('stream'):
+        received = int(resp.headers.get('Content-Length') or 0)
+    else:
+        received = len(resp.content)
+
+    metrics.incr(
+        'http_response_bytes_total',
+        received,
+        method=method,
+        endpoint=endpoint
+    )
+
+    if breaker:
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    return resp
+
+
+def _send_to_group(group, tried, method, path, timeout, **kwargs):
+    rejected = set()
+
+    while True:
+        # Only idempotent requests are sent again to a replica which was
+        # tried already. Failed replicas are avoided by the group anyway.
+        exclude = rejected
+
+        if method in retry.IDEMPOTENT_METHODS:
+            exclude = rejected.union(tried)
+
+        base_url = group.choose(exclude=exclude)
+        tried.append(base_url)
+        started = time.time()
 
+        try:
+            resp = _send(method, base_url + path, timeout, **kwargs)
+        except circuit.CircuitOpenError:
+            group.record(base_url, 0, False)
+            rejected.add(base_url)
 
-@retrying.retry(
-    retry_on_exception=retry_on_exceptions,
-    wait_exponential_multiplier=cfg.CONF.st2.retry_exp_msec,
-    wait_exponential_max=cfg.CONF.st2.retry_exp_max_msec,
-    stop_max_delay=cfg.CONF.st2.retry_stop_max_msec)
-def get(url, params=None, headers=None, token=None):
+            if len(rejected) < len(group.base_urls):
+                continue
+
+            raise
+        except Exception:
+            group.record(base_url, time.time() - started, False)
+            raise
+
+        group.record(base_url, time.time() - started, resp.status_code < 500)
+
+        return resp
+
+
+def _request(method, url, policy=None, **kwargs):
+    policy = policy or retry.RetryPolicy()
+    group, base_url = endpoints.get_group(url)
+    tried = []
+
+    def send(timeout, attempt):
+        if attempt:
+            metrics.incr(
+                'http_retries_total',
+                method=method,
+                endpoint=get_endpoint_template(url)
+            )
+
+        with green.limit():
+            if group:
+                return green.call(
+                    _send_to_group, group, tried, method,
+                    url[len(base_url):], timeout, **kwargs
+                )
+
+            return green.call(_send, method, url, timeout, **kwargs)
+
+    return policy.call(method, send)
+
+
+def read_content(resp, max_bytes, chunk_size=65536):
+    """Read the body of a streamed response up to the max number of bytes.
+
+    The body is read once into a single buffer so the memory used is
+    bounded by the max number of bytes. The connection is closed instead
+    of being returned to the pool if the body is not read completely.
+
+    :param resp: Response of a request sent with stream=True.
+    :type resp: ``requests.Response``
+    :param max_bytes: Max number of bytes to read. Zero for no limit.
+    :type max_bytes: ``int``
+
+    :rtype: ``tuple`` of (content, truncated)
+    """
+    return green.call(_read_content, resp, max_bytes, chunk_size)
+
+
+def _read_content(resp, max_bytes, chunk_size):
+    content = bytearray()
+    truncated = False
+
+    try:
+        for chunk in resp.iter_content(chunk_size):
+            if max_bytes and len(content) + len(chunk) > max_bytes:
+                content.extend(chunk[:max_bytes - len(content)])
+                truncated = True
+                break
+
+            content.extend(chunk)
+    finally:
+        resp.close()
+
+    return bytes(content), truncated
+
+
+def get(url, params=None, headers=None, token=None, policy=None):
     if params and not isinstance(params, dict):
         raise TypeError('The params arg must be typeof dict.')
 
@@ -55,34 +390,30 @@ def get(url, params=None, headers=None, token=None):
     if token:
         headers['X-Auth-Token'] = str(token)
 
-    return requests.get(url, params=params, headers=headers, verify=False)
+    return _request('GET', url, policy=policy, params=params, headers=headers)
 
 
-@retrying.retry(
-    retry_on_exception=retry_on_exceptions,
-    wait_exponential_multiplier=cfg.CONF.st2.retry_exp_msec,
-    wait_exponential_max=cfg.CONF.st2.retry_exp_max_msec,
-    stop_max_delay=cfg.CONF.st2.retry_stop_max_msec)
-def post(url, data, headers=None, token=None):
+def post(url, data, headers=None, token=None, policy=None, stream=False):
     headers = copy.deepcopy(headers) if headers else {}
     headers['Content-Type'] = 'application/json'
 
     if token:
         headers['X-Auth-Token'] = str(token)
 
-    return requests.post(url, json.dumps(data), headers=headers, verify=False)
+    body = _encode_body(data, headers)
 
+    return _request('POST', url, policy=policy, data=body, headers=headers,
+                    stream=stream)
 
-@retrying.retry(
-    retry_on_exception=retry_on_exceptions,
-    wait_exponential_multiplier=cfg.CONF.st2.retry_exp_msec,
-    wait_exponential_max=cfg.CONF.st2.retry_exp_max_msec,
-    stop_max_delay=cfg.CONF.st2.retry_stop_max_msec)
-def put(url, data, headers=None, token=None):
+
+def put(url, data, headers=None, token=None, policy=None, stream=False):
     headers = copy.deepcopy(headers) if headers else {}
     headers['Content-Type'] = 'application/json'
 
     if token:
         headers['X-Auth-Token'] = str(token)
 
-    return requests.put(url, json.dumps(data), headers=headers, verify=False)
+    body = _encode_body(data, headers)
+
+    return _request('PUT', url, policy=policy, data=body, headers=headers,
+                    stream=stream)
@@ -0,0 +1,124 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Idempotency of the execution requests sent to st2.
+
+Each execution request of an action execution carries the same key in
+the Idempotency-Key header so st2 can recognize a request sent again
+(i.e. retried after the connection dropped before the response arrived).
+The executions acknowledged by st2 are recorded with their key so an
+action execution run again (i.e. message redelivered to the executor or
+spooled execution sent again) is not dispatched to st2 again. The record
+is shared with the processes of the host in the spool file if the spool
+is enabled, kept in memory otherwise.
+"""
+
+import threading
+
+from oslo_config import cfg
+
+from st2mistral.utils import cache
+
+__all__ = [
+    'HEADER',
+    'get_key',
+    'get_record',
+    'record',
+    'reset'
+]
+
+
+HEADER = 'Idempotency-Key'
+
+KEY_PREFIX = 'mistral-action-execution-'
+
+_RECORD = None
+_RECORD_KEY = None
+_RECORD_LOCK = threading.Lock()
+
+
+def get_key(action_execution_id):
+    """Return the idempotency key of the action execution, None if unknown.
+
+    :rtype: ``str``
+    """
+    if not action_execution_id:
+        return None
+
+    return KEY_PREFIX + str(action_execution_id)
+
+
+def _get_cache():
+    global _RECORD, _RECORD_KEY
+
+    conf = cfg.CONF.st2
+    key = (
+        conf.action_spool_path, conf.action_idempotency_cache_size,
+        conf.action_idempotency_ttl_sec
+    )
+
+    with _RECORD_LOCK:
+        if _RECORD_KEY != key:
+            kwargs = {
+                'max_size': conf.action_idempotency_cache_size,
+                'ttl': conf.action_idempotency_ttl_sec
+            }
+
+            if conf.action_spool_path:
+                _RECORD = cache.SharedTTLCache(
+                    'idempotency', conf.action_spool_path, **kwargs
+                )
+            else:
+                _RECORD = cache.TTLCache('idempotency', **kwargs)
+
+            _RECORD_KEY = key
+
+        return _RECORD
+
+
+def get_record(key):
+    """Return the record of the execution acknowledged for the key.
+
+    :rtype: ``dict`` or None if not acknowledged
+    """
+    if not key:
+        return None
+
+    return _get_cache().get(key)
+
+
+def record(key, status_code, content):
+    """Record the execution acknowledged by st2 for the key.
+
+    :param status_code: Status code of the st2 response.
+    :type status_code: ``int``
+    :param content: Execution returned by st2, deserialized if possible.
+    """
+    if not key:
+        return
+
+    execution_id = (
+        content.get('id') if isinstance(content, dict) else None
+    )
+
+    _get_cache().set(key, {'status': status_code, 'id': execution_id})
+
+
+def reset():
+    global _RECORD, _RECORD_KEY
+
+    with _RECORD_LOCK:
+        _RECORD = None
+        _RECORD_KEY = None
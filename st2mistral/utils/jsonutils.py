@@ -0,0 +1,171 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""JSON codec shared across st2mistral.
+
+The fastest backend available is picked when the module is imported and
+the stdlib json module is used otherwise. Output is identical whichever
+backend is used, except for non finite floats which are not valid JSON
+and are written as null by orjson. The fast backend is only used for the
+compact format it produces and any value it cannot serialize exactly like
+the stdlib json module (i.e. non string keys, floats in exponent notation
+or below 1e-04) is serialized with the stdlib json module instead.
+"""
+
+import json
+import re
+
+import six
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = [
+    'dumps',
+    'encode',
+    'get_backend',
+    'loads',
+    'set_backend'
+]
+
+
+COMPACT_SEPARATORS = (',', ':')
+
+# The stdlib json module writes the exponent of floats with a sign and at
+# least two digits (i.e. 1e+16) unlike orjson (i.e. 1e16). The exponent
+# is searched without the preceding digit since a pattern starting with a
+# literal is searched much faster.
+_EXPONENT_RE = re.compile(br'e[-\d]')
+
+# The stdlib json module writes the floats below 1e-04 in exponent notation
+# (i.e. 1e-05) unlike orjson (i.e. 0.00001). This matches any such float
+# and may also match some strings or floats in which case the value is
+# serialized by the stdlib json module.
+_SMALL_FLOAT = b'0.0000'
+
+# Integers beyond 64 bits are deserialized as floats by orjson. This
+# matches any such integer, including the 19 digits ones below -2 ** 63,
+# and may also match some strings or floats in which case the document is
+# deserialized by the stdlib json module.
+_BIG_INT_RE = re.compile(r'\d{19}')
+_BIG_INT_BYTES_RE = re.compile(br'\d{19}')
+
+_BACKEND = 'orjson' if orjson else 'json'
+
+# Types the stdlib json module cannot serialize are passed through so they
+# fail the same way whichever backend is used.
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson else None
+)
+
+
+def get_backend():
+    return _BACKEND
+
+
+def set_backend(name):
+    """Set the backend of the codec, mostly for tests and benchmarks."""
+    global _BACKEND
+
+    if name not in ('json', 'orjson'):
+        raise ValueError('Unsupported JSON backend "%s".' % name)
+
+    if name == 'orjson' and not orjson:
+        raise ValueError('The JSON backend "orjson" is not installed.')
+
+    _BACKEND = name
+
+
+def _has_exponent(out):
+    # This matches any float in exponent notation and may also match some
+    # strings in which case the value is serialized by the stdlib json.
+    for match in _EXPONENT_RE.finditer(out):
+        start = match.start()
+
+        if start and out[start - 1:start].isdigit():
+            return True
+
+    return False
+
+
+def _stdlib_encode(obj):
+    return json.dumps(
+        obj, separators=COMPACT_SEPARATORS, ensure_ascii=False
+    ).encode('utf-8')
+
+
+def encode(obj):
+    """Serialize the object to compact UTF-8 encoded JSON.
+
+    The output is the same as json.dumps(obj, separators=(',', ':'),
+    ensure_ascii=False) encoded to UTF-8.
+
+    :rtype: ``bytes``
+    """
+    if _BACKEND == 'orjson':
+        try:
+            out = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:
+            return _stdlib_encode(obj)
+
+        if _SMALL_FLOAT not in out and not _has_exponent(out):
+            return out
+
+    return _stdlib_encode(obj)
+
+
+def dumps(obj, **kwargs):
+    """Serialize the object to a JSON formatted string.
+
+    The arguments and output are the same as json.dumps. The fast backend
+    is used when the compact format without escaping of non ASCII
+    characters is requested.
+
+    :rtype: ``str``
+    """
+    if (_BACKEND != 'json' and
+            kwargs == {'separators': COMPACT_SEPARATORS,
+                       'ensure_ascii': False}):
+        return encode(obj).decode('utf-8')
+
+    return json.dumps(obj, **kwargs)
+
+
+def loads(s):
+    """Deserialize the JSON formatted string or bytes to an object.
+
+    The output is the same as json.loads. Values the fast backend rejects
+    or deserializes differently (i.e. NaN, integers beyond 64 bits) are
+    deserialized by the stdlib json module.
+    """
+    if _BACKEND == 'orjson':
+        big_int_re = (
+            _BIG_INT_BYTES_RE if isinstance(s, six.binary_type)
+            else _BIG_INT_RE
+        )
+
+        if big_int_re.search(s) is None:
+            try:
+                return orjson.loads(s)
+            except ValueError:
+                pass
+
+    if isinstance(s, six.binary_type) and not isinstance(s, str):
+        s = s.decode('utf-8')
+
+    return json.loads(s)
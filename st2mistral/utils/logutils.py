@@ -0,0 +1,191 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Logging helpers for the hot paths.
+
+The log lines are formatted only if the level is enabled and only once
+they are emitted. The fields which may be large (i.e. parameters, st2
+context and response body) are capped. The repetitive lines may be
+sampled so at most a burst of lines with the same message is emitted per
+interval, the number of lines suppressed meanwhile is added to the next
+line emitted.
+"""
+
+import threading
+import time
+
+try:
+    from collections import abc as collections_abc
+except ImportError:
+    import collections as collections_abc
+
+import six
+
+from oslo_config import cfg
+
+__all__ = [
+    'Capped',
+    'cap',
+    'log',
+    'reset_sampling'
+]
+
+
+_SAMPLES = {}
+_SAMPLES_LOCK = threading.Lock()
+
+
+def _iter_repr(value, limit):
+    # The repr of the containers is generated piece by piece so it can be
+    # stopped once long enough and the long strings are cut beforehand.
+    if isinstance(value, collections_abc.Mapping):
+        yield '{'
+
+        for i, (k, v) in enumerate(value.items()):
+            if i:
+                yield ', '
+
+            for piece in _iter_repr(k, limit):
+                yield piece
+
+            yield ': '
+
+            for piece in _iter_repr(v, limit):
+                yield piece
+
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '[' if isinstance(value, list) else '('
+
+        for i, item in enumerate(value):
+            if i:
+                yield ', '
+
+            for piece in _iter_repr(item, limit):
+                yield piece
+
+        if isinstance(value, tuple) and len(value) == 1:
+            yield ','
+
+        yield ']' if isinstance(value, list) else ')'
+    elif isinstance(value, (six.string_types, bytes)) and len(value) > limit:
+        yield repr(value[:limit])
+    else:
+        yield repr(value)
+
+
+class Capped(object):
+    """Field formatted up to a max number of characters when logged."""
+
+    __slots__ = ('value', 'max_chars')
+
+    def __init__(self, value, max_chars=None):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self):
+        max_chars = self.max_chars
+
+        if max_chars is None:
+            max_chars = cfg.CONF.st2.log_max_field_chars
+
+        if max_chars <= 0:
+            return '%s' % (self.value,)
+
+        if isinstance(self.value, (six.string_types, bytes)):
+            text = '%s' % (self.value[:max_chars + 1],)
+        else:
+            pieces = []
+            length = 0
+
+            for piece in _iter_repr(self.value, max_chars + 1):
+                pieces.append(piece)
+                length += len(piece)
+
+                if length > max_chars:
+                    break
+
+            text = ''.join(pieces)
+
+        if len(text) <= max_chars:
+            return text
+
+        return text[:max_chars] + '...(truncated)'
+
+    __repr__ = __str__
+
+
+def cap(value, max_chars=None):
+    """Return the value capped to the max number of characters when logged.
+
+    :param max_chars: Defaults to the log_max_field_chars option. Zero for
+        no limit.
+    :type max_chars: ``int``
+    """
+    return Capped(value, max_chars)
+
+
+def _sample(msg, clock=time.time):
+    burst = cfg.CONF.st2.log_sample_burst
+
+    if burst <= 0:
+        return True, 0
+
+    now = clock()
+    interval = cfg.CONF.st2.log_sample_interval_sec
+
+    with _SAMPLES_LOCK:
+        sample = _SAMPLES.get(msg)
+
+        if sample is None or now - sample[0] >= interval:
+            suppressed = sample[2] if sample else 0
+            _SAMPLES[msg] = [now, 1, 0]
+            return True, suppressed
+
+        if sample[1] < burst:
+            sample[1] += 1
+            suppressed, sample[2] = sample[2], 0
+            return True, suppressed
+
+        sample[2] += 1
+
+        return False, 0
+
+
+def log(logger, level, msg, *args, **kwargs):
+    """Log the message if the level is enabled.
+
+    :param sample: Sample the lines with this message if the sampling is
+        enabled with the log_sample_burst option.
+    :type sample: ``bool``
+    """
+    if not logger.isEnabledFor(level):
+        return
+
+    if kwargs.pop('sample', False):
+        emit, suppressed = _sample(msg)
+
+        if not emit:
+            return
+
+        if suppressed:
+            msg += ' (%s similar lines suppressed)' % suppressed
+
+    logger.log(level, msg, *args, **kwargs)
+
+
+def reset_sampling():
+    with _SAMPLES_LOCK:
+        _SAMPLES.clear()
@@ -0,0 +1,311 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+__all__ = [
+    'collect',
+    'dump_prometheus',
+    'gauge',
+    'get_gauges',
+    'get_histograms',
+    'get_stats',
+    'incr',
+    'observe',
+    'register_collector',
+    'reset',
+    'start_textfile_exporter',
+    'write_textfile'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+PREFIX = 'st2mistral_'
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+_LOCK = threading.Lock()
+_COUNTERS = {}
+_GAUGES = {}
+_HISTOGRAMS = {}
+_COLLECTORS = []
+_EXPORTER_PID = None
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def incr(name, value=1, **labels):
+    """Increment the counter identified by name and labels.
+
+    :param name: Name of the counter (i.e. http_requests_total).
+    :type name: ``str``
+    :param value: Amount to increment the counter by.
+    :type value: ``int``
+    """
+    key = _key(name, labels)
+
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + value
+
+
+def gauge(name, value, **labels):
+    """Set the gauge identified by name and labels to the value.
+
+    :param name: Name of the gauge (i.e. action_queue_depth).
+    :type name: ``str``
+    :param value: Current value of the gauge.
+    :type value: ``int``
+    """
+    key = _key(name, labels)
+
+    with _LOCK:
+        _GAUGES[key] = value
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Record the value in the histogram identified by name and labels.
+
+    :param name: Name of the histogram (i.e. http_request_duration_seconds).
+    :type name: ``str``
+    :param value: Value observed.
+    :type value: ``float``
+    """
+    key = _key(name, labels)
+
+    with _LOCK:
+        histogram = _HISTOGRAMS.get(key)
+
+        if histogram is None:
+            histogram = {
+                'buckets': buckets,
+                'counts': [0] * (len(buckets) + 1),
+                'count': 0,
+                'sum': 0.0
+            }
+
+            _HISTOGRAMS[key] = histogram
+
+        histogram['counts'][bisect.bisect_left(buckets, value)] += 1
+        histogram['count'] += 1
+        histogram['sum'] += value
+
+
+def get_stats():
+    """Return a snapshot of all the counters in the registry.
+
+    :rtype: ``dict`` of (name, labels) to value
+    """
+    with _LOCK:
+        return dict(_COUNTERS)
+
+
+def get_gauges():
+    """Return a snapshot of all the gauges in the registry.
+
+    :rtype: ``dict`` of (name, labels) to value
+    """
+    with _LOCK:
+        return dict(_GAUGES)
+
+
+def get_histograms():
+    """Return a snapshot of all the histograms in the registry.
+
+    :rtype: ``dict`` of (name, labels) to histogram
+    """
+    with _LOCK:
+        return dict(
+            (key, dict(histogram, counts=list(histogram['counts'])))
+            for key, histogram in _HISTOGRAMS.items()
+        )
+
+
+def register_collector(func):
+    """Register a function which updates gauges when the metrics are written.
+
+    The collectors export the stats kept elsewhere (i.e. by the connection
+    pools) without updating the gauges on each request.
+    """
+    with _LOCK:
+        if func not in _COLLECTORS:
+            _COLLECTORS.append(func)
+
+
+def collect():
+    """Update the gauges of the registered collectors."""
+    with _LOCK:
+        collectors = list(_COLLECTORS)
+
+    for func in collectors:
+        try:
+            func()
+        except Exception as e:
+            LOG.warning('[stackstorm] Unable to collect metrics. %s', e)
+
+
+def reset():
+    with _LOCK:
+        _COUNTERS.clear()
+        _GAUGES.clear()
+        _HISTOGRAMS.clear()
+
+
+def _escape(value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+    return value.replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    labels = list(labels) + (extra or [])
+
+    if not labels:
+        return ''
+
+    return '{%s}' % ','.join('%s="%s"' % (k, _escape(v)) for k, v in labels)
+
+
+def dump_prometheus():
+    """Return the metrics in the Prometheus text exposition format.
+
+    :rtype: ``str``
+    """
+    counters = get_stats()
+    gauges = get_gauges()
+    histograms = get_histograms()
+    lines = []
+
+    for kind, values in [('counter', counters), ('gauge', gauges)]:
+        for name in sorted(set(key[0] for key in values)):
+            lines.append('# TYPE %s%s %s' % (PREFIX, name, kind))
+
+            for key in sorted(k for k in values if k[0] == name):
+                lines.append('%s%s%s %s' % (
+                    PREFIX, name, _format_labels(key[1]), values[key]
+                ))
+
+    for name in sorted(set(key[0] for key in histograms)):
+        lines.append('# TYPE %s%s histogram' % (PREFIX, name))
+
+        for key in sorted(k for k in histograms if k[0] == name):
+            histogram = histograms[key]
+            cumulative = 0
+
+            bounds = list(histogram['buckets']) + ['+Inf']
+
+            for bound, count in zip(bounds, histogram['counts']):
+                cumulative += count
+                lines.append('%s%s_bucket%s %s' % (
+                    PREFIX, name,
+                    _format_labels(key[1], [('le', bound)]),
+                    cumulative
+                ))
+
+            lines.append('%s%s_sum%s %s' % (
+                PREFIX, name, _format_labels(key[1]), histogram['sum']
+            ))
+
+            lines.append('%s%s_count%s %s' % (
+                PREFIX, name, _format_labels(key[1]), histogram['count']
+            ))
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path):
+    """Write the metrics to the file for the node exporter textfile collector.
+
+    The file is replaced atomically so the collector never reads a partial
+    file.
+    """
+    collect()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.st2mistral')
+
+    try:
+        # The collector usually runs as another user and the temporary
+        # file is only readable by its owner.
+        os.fchmod(fd, 0o644)
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(dump_prometheus())
+
+        os.rename(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+
+def _export_textfile(path, interval):
+    while True:
+        time.sleep(interval)
+
+        try:
+            write_textfile(path)
+        except Exception as e:
+            LOG.warning('[stackstorm] Unable to write metrics to %s. %s',
+                        path, e)
+
+
+def _get_textfile_path(path, pid):
+    # The path is not %-formatted so any other % is kept as is.
+    return path.replace('%(pid)s', str(pid))
+
+
+def start_textfile_exporter():
+    """Start writing the metrics periodically if a textfile is configured.
+
+    The %(pid)s placeholder in the configured path is replaced with the
+    process id so each Mistral process writes its own file.
+    """
+    global _EXPORTER_PID
+
+    path = cfg.CONF.st2.metrics_textfile
+    pid = os.getpid()
+
+    with _LOCK:
+        # The exporter thread is not carried over to forked processes.
+        if not path or _EXPORTER_PID == pid:
+            return
+
+        # The exporter is not started again if it fails to start so the
+        # requests which create the sessions never fail because of it.
+        _EXPORTER_PID = pid
+
+        try:
+            exporter = threading.Thread(
+                target=_export_textfile,
+                args=(_get_textfile_path(path, pid),
+                      cfg.CONF.st2.metrics_textfile_interval_sec)
+            )
+
+            exporter.daemon = True
+            exporter.start()
+        except Exception as e:
+            LOG.error('[stackstorm] Unable to start writing metrics to %s. '
+                      '%s', path, e)
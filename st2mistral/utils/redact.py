@@ -0,0 +1,63 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+try:
+    from collections import abc as collections_abc
+except ImportError:
+    import collections as collections_abc
+
+__all__ = [
+    'REDACTED_KEYS',
+    'RedactedView'
+]
+
+
+# Keys of the st2 context which must never be logged.
+REDACTED_KEYS = frozenset(['auth_token'])
+
+
+class RedactedView(collections_abc.Mapping):
+    """Read-only view of a dict without the secret keys.
+
+    The dict is not copied. The view is formatted as the dict without the
+    secret keys when it is logged, so it reflects the dict at the time it
+    is formatted.
+    """
+
+    __slots__ = ('_data', '_keys')
+
+    def __init__(self, data, keys=REDACTED_KEYS):
+        self._data = data if data is not None else {}
+        self._keys = keys
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            raise KeyError(key)
+
+        return self._data[key]
+
+    def __iter__(self):
+        return (k for k in self._data if k not in self._keys)
+
+    def __len__(self):
+        return sum(1 for k in self._data if k not in self._keys)
+
+    def __repr__(self):
+        return '{%s}' % ', '.join(
+            '%r: %r' % (k, v) for k, v in self._data.items()
+            if k not in self._keys
+        )
+
+    __str__ = __repr__
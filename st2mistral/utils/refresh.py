@@ -0,0 +1,84 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from oslo_log import log as logging
+
+from st2mistral.utils import green
+from st2mistral.utils import metrics
+
+__all__ = [
+    'Refresher'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+
+class Refresher(object):
+    """Refresh the cache entries in the background ahead of their expiry.
+
+    A key is refreshed once at a time and at most max_concurrency keys
+    are refreshed at the same time. The refreshes over the limit are
+    skipped, the entry is refreshed on a next hit or validated again once
+    expired. The refresh function returns the name of the outcome (i.e.
+    valid or rejected) which is counted in the metrics with the error and
+    skipped outcomes.
+    """
+
+    def __init__(self, name, max_concurrency=2):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        self._inflight = set()
+
+    def submit(self, key, func):
+        """Refresh the key in the background.
+
+        :rtype: ``bool`` True if the refresh is started
+        """
+        with self._lock:
+            if key in self._inflight:
+                return False
+
+            if len(self._inflight) >= self.max_concurrency:
+                metrics.incr(
+                    'cache_refresh_total', cache=self.name, outcome='skipped'
+                )
+                return False
+
+            self._inflight.add(key)
+
+        try:
+            green.spawn(self._run, key, func)
+        except Exception:
+            with self._lock:
+                self._inflight.discard(key)
+            raise
+
+        return True
+
+    def _run(self, key, func):
+        try:
+            outcome = func()
+        except Exception as e:
+            LOG.warning('[stackstorm] Unable to refresh %s. %s', self.name, e)
+            outcome = 'error'
+        finally:
+            with self._lock:
+                self._inflight.discard(key)
+
+        metrics.incr('cache_refresh_total', cache=self.name, outcome=outcome)
@@ -0,0 +1,99 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Results of the st2.action action persisted by Mistral.
+
+Mistral stores the result of every action execution and copies it into
+the task results and the notifier payloads. The full profile keeps the
+whole st2 response. The compact profile keeps only the content, status
+and reason which is what st2 and the workflows use, and the content may
+be truncated to a size budget.
+"""
+
+from oslo_config import cfg
+
+__all__ = [
+    'FULL',
+    'COMPACT',
+    'PROFILES',
+    'build',
+    'truncate'
+]
+
+
+FULL = 'full'
+COMPACT = 'compact'
+
+PROFILES = (FULL, COMPACT)
+
+
+def truncate(content, profile=None):
+    """Truncate the raw content to the budget of the compact profile.
+
+    The truncated content is decoded as text without the character cut at
+    the end of the budget so the result can be serialized by Mistral.
+
+    :param content: Body of the st2 response.
+    :type content: ``bytes``
+
+    :rtype: ``tuple`` of (content, truncated)
+    """
+    profile = profile or cfg.CONF.st2.action_result_profile
+    max_bytes = cfg.CONF.st2.action_result_content_max_bytes
+
+    if profile != COMPACT or not max_bytes or len(content) <= max_bytes:
+        return content, False
+
+    return content[:max_bytes].decode('utf-8', 'ignore'), True
+
+
+def build(resp, content, truncated=False, profile=None):
+    """Return the result of the action for the st2 response.
+
+    :param resp: Response of st2.
+    :type resp: ``requests.Response``
+    :param content: Content of the result, deserialized if possible.
+    :param truncated: Flag the content as truncated.
+    :type truncated: ``bool``
+    :param profile: Defaults to the action_result_profile option.
+    :type profile: ``str``
+
+    :rtype: ``dict``
+    """
+    profile = profile or cfg.CONF.st2.action_result_profile
+
+    if profile == COMPACT:
+        result = {
+            'content': content,
+            'status': resp.status_code,
+            'reason': resp.reason
+        }
+    else:
+        result = {
+            'content': content,
+            'status': resp.status_code,
+            'headers': dict(resp.headers.items()),
+            'url': resp.url,
+            'history': resp.history,
+            'encoding': resp.encoding,
+            'reason': resp.reason,
+            'cookies': dict(resp.cookies.items()),
+            'elapsed': resp.elapsed.total_seconds()
+        }
+
+    if truncated:
+        result['truncated'] = True
+
+    return result
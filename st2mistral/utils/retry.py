@@ -0,0 +1,208 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from email import utils as email_utils
+import random
+import time
+
+import requests
+from six.moves import http_client
+
+from oslo_config import cfg
+from oslo_log import log as logging
+
+from st2mistral.utils import green
+from st2mistral.utils import logutils
+
+__all__ = [
+    'RetryPolicy'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# The timeouts are not capped below this so the last attempt before the
+# deadline is not sent with a timeout it cannot possibly meet.
+MIN_TIMEOUT_SEC = 1.0
+
+RETRY_STATUS_CODES = frozenset([
+    http_client.TOO_MANY_REQUESTS
+    if hasattr(http_client, 'TOO_MANY_REQUESTS') else 429,
+    http_client.SERVICE_UNAVAILABLE
+])
+
+
+def parse_retry_after(value, now=None):
+    """Return the delay in seconds given by a Retry-After header value.
+
+    The value is either a number of seconds or a HTTP date.
+
+    :rtype: ``float`` or None if the value cannot be parsed
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parsed = email_utils.parsedate_tz(value)
+
+    if not parsed:
+        return None
+
+    now = time.time() if now is None else now
+
+    return max(0.0, email_utils.mktime_tz(parsed) - now)
+
+
+class RetryPolicy(object):
+    """Timeouts and retries for a call to the st2 API.
+
+    Each call is given a deadline budget. Connection errors are retried
+    with exponential backoff and full jitter until the deadline is spent.
+    Read timeouts are retried only for idempotent methods so a request
+    which may have been processed by st2 is not sent twice. Responses
+    with status 429 or 503 are retried after the delay given by the
+    Retry-After header if any. The backoff yields to the other green
+    threads under eventlet. Values which are not provided are read from
+    the st2 config when the policy is created.
+    """
+
+    def __init__(self, deadline_msec=None, connect_timeout=None,
+                 read_timeout=None, backoff_msec=None,
+                 backoff_max_msec=None, clock=time.time, sleep=green.sleep):
+        conf = cfg.CONF.st2
+
+        self.deadline = (
+            deadline_msec if deadline_msec is not None
+            else conf.retry_stop_max_msec
+        ) / 1000.0
+
+        self.connect_timeout = (
+            connect_timeout if connect_timeout is not None
+            else conf.connect_timeout_sec
+        )
+
+        self.read_timeout = (
+            read_timeout if read_timeout is not None
+            else conf.read_timeout_sec
+        )
+
+        self.backoff = (
+            backoff_msec if backoff_msec is not None
+            else conf.retry_exp_msec
+        ) / 1000.0
+
+        self.backoff_max = (
+            backoff_max_msec if backoff_max_msec is not None
+            else conf.retry_exp_max_msec
+        ) / 1000.0
+
+        self._clock = clock
+        self._sleep = sleep
+
+    def get_backoff(self, attempt):
+        """Return the full jitter backoff delay for the retry attempt."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff * (2 ** attempt))
+        )
+
+    def get_timeout(self, remaining):
+        """Return the connect and read timeouts capped by the deadline."""
+        remaining = max(remaining, MIN_TIMEOUT_SEC)
+
+        return (
+            min(self.connect_timeout, remaining),
+            min(self.read_timeout, remaining)
+        )
+
+    def is_retriable(self, method, exc):
+        if isinstance(exc, requests.exceptions.ConnectionError):
+            return True
+
+        if isinstance(exc, requests.exceptions.ReadTimeout):
+            return method in IDEMPOTENT_METHODS
+
+        return False
+
+    def call(self, method, func):
+        """Call the function until it succeeds or the deadline is spent.
+
+        :param method: HTTP method of the request.
+        :type method: ``str``
+        :param func: Function which sends the request. It takes the
+            timeout tuple and the attempt number and returns the response.
+        :type func: ``callable``
+        """
+        started = self._clock()
+        attempt = 0
+
+        while True:
+            remaining = self.deadline - (self._clock() - started)
+            timeout = self.get_timeout(remaining)
+
+            try:
+                resp = func(timeout, attempt)
+            except Exception as e:
+                if not self.is_retriable(method, e):
+                    raise
+
+                delay = self.get_backoff(attempt)
+                remaining = self.deadline - (self._clock() - started)
+
+                if delay >= remaining:
+                    LOG.error(
+                        '[stackstorm] HTTP request returned connection error '
+                        'and the retry deadline is exceeded. %s', e
+                    )
+                    raise
+
+                logutils.log(
+                    LOG, logging.WARNING,
+                    '[stackstorm] HTTP request returned connection error. '
+                    'Retrying in %.2f seconds...', delay,
+                    sample=True
+                )
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES:
+                    return resp
+
+                delay = parse_retry_after(resp.headers.get('Retry-After'))
+
+                if delay is None:
+                    delay = self.get_backoff(attempt)
+
+                remaining = self.deadline - (self._clock() - started)
+
+                if delay >= remaining:
+                    return resp
+
+                # The response is not returned so its connection must be
+                # released to the pool, i.e. if the request is streamed.
+                resp.close()
+
+                logutils.log(
+                    LOG, logging.WARNING,
+                    '[stackstorm] HTTP request returned status code %s. '
+                    'Retrying in %.2f seconds...', resp.status_code, delay,
+                    sample=True
+                )
+
+            self._sleep(delay)
+            attempt += 1
@@ -0,0 +1,97 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import threading
+
+import six
+
+from st2mistral.utils import metrics
+
+__all__ = [
+    'CallTimeoutError',
+    'SingleFlight'
+]
+
+
+class CallTimeoutError(Exception):
+    pass
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """Coalesce the concurrent calls for the same key into a single call.
+
+    The first caller for a key runs the function. The callers arriving
+    while it is in flight wait for it and get its result or its exception.
+    The next caller after the call is done runs the function again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, timeout=None):
+        """Run the function or wait for the call in flight for the key.
+
+        :param key: Key of the call.
+        :type key: ``str``
+        :param func: Function which takes no argument.
+        :type func: ``callable``
+        :param timeout: Max time in seconds to wait for the call in flight.
+            Only the callers which did not run the function time out.
+        :type timeout: ``float``
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if leader:
+            try:
+                call.result = func()
+            except Exception:
+                call.exc_info = sys.exc_info()
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+
+                call.done.set()
+
+            return call.result
+
+        metrics.incr('singleflight_shared_total', group=self.name)
+
+        if not call.done.wait(timeout):
+            raise CallTimeoutError(
+                'Timed out waiting for the %s call in flight.' % self.name
+            )
+
+        if call.exc_info:
+            six.reraise(*call.exc_info)
+
+        return call.result
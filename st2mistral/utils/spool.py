@@ -0,0 +1,342 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Durable spool of the items sent in the background.
+
+The items are appended to a SQLite file in WAL mode. An item is in the
+WAL once appended so it survives a crash or a restart of the process,
+the WAL is synced to disk on the checkpoints. The senders lease the
+items which are due, send them and delete them once sent. An item leased
+by a sender which dies is leased again once the lease expires so the
+items are sent at least once. An item which fails to be sent is deferred
+with exponential backoff. The spool may be shared by the processes of
+the host.
+"""
+
+import os
+import sqlite3
+import stat
+import threading
+import time
+
+import six
+
+from oslo_log import log as logging
+
+from st2mistral.utils import cache
+from st2mistral.utils import green
+from st2mistral.utils import jsonutils
+from st2mistral.utils import metrics
+
+__all__ = [
+    'Sender',
+    'Spool'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+BACKOFF_SEC = 1.0
+BACKOFF_MAX_SEC = 60.0
+POLL_INTERVAL_SEC = 1.0
+
+
+def _dumps(item):
+    # The values JSON cannot serialize (i.e. the responses of the redirect
+    # history of a result) are kept as strings.
+    return jsonutils.dumps(item, default=six.text_type)
+
+
+class Spool(object):
+    """Items to send persisted in a SQLite file.
+
+    The database is in WAL mode and each process and thread has its own
+    connection. The writes of the threads of a process are serialized by
+    a lock so they do not back off on the lock of the database. The
+    queries may wait on the lock of the database so they are run in the
+    native thread pool under eventlet. The file is only readable by its
+    owner since the items may hold auth tokens, and is not used if owned
+    by another user or accessible by others.
+    """
+
+    def __init__(self, name, path, busy_timeout=5.0, clock=time.time):
+        self.name = name
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        self._local = threading.local()
+        self._write_lock = green.native_lock()
+
+    def _get_conn(self):
+        conn = getattr(self._local, 'conn', None)
+
+        # The connections must not be used across a fork.
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        # The items may hold auth tokens so the files must only be readable
+        # and writable by their owner.
+        cache.check_db_files(self.path, mask=stat.S_IRWXG | stat.S_IRWXO)
+
+        conn = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, isolation_level=None
+        )
+
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool_items ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, '
+            'item TEXT NOT NULL, attempts INTEGER NOT NULL, '
+            'due REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS spool_items_due '
+            'ON spool_items (name, due)'
+        )
+
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+
+        return conn
+
+    def _execute(self, query, *args):
+        return green.call_native(self._fetch, query, args)
+
+    def _fetch(self, query, args):
+        return self._get_conn().execute(query, args).fetchall()
+
+    def _write(self, query, *args):
+        """Run the write query.
+
+        :rtype: ``int`` id of the last row inserted
+        """
+        return green.call_native(self._write_native, query, args)
+
+    def _write_native(self, query, args):
+        conn = self._get_conn()
+
+        with self._write_lock:
+            return conn.execute(query, args).lastrowid
+
+    def __len__(self):
+        return self._execute(
+            'SELECT COUNT(*) FROM spool_items WHERE name = ?', self.name
+        )[0][0]
+
+    def append(self, item):
+        """Append the item, durably once returned.
+
+        :raises: sqlite3.Error or OSError if the item cannot be persisted.
+
+        :rtype: ``int`` id of the item
+        """
+        item_id = self._write(
+            'INSERT INTO spool_items (name, item, attempts, due) '
+            'VALUES (?, ?, 0, ?)', self.name, _dumps(item), self._clock()
+        )
+
+        metrics.incr('spool_appended_total', spool=self.name)
+
+        return item_id
+
+    def lease(self, limit, lease_sec):
+        """Lease the items which are due so no other sender sends them.
+
+        :rtype: ``list`` of (id, item, attempts)
+        """
+        rows = green.call_native(self._lease, limit, lease_sec)
+
+        return [(row[0], jsonutils.loads(row[1]), row[2]) for row in rows]
+
+    def _lease(self, limit, lease_sec):
+        conn = self._get_conn()
+        now = self._clock()
+
+        with self._write_lock:
+            conn.execute('BEGIN IMMEDIATE')
+
+            try:
+                rows = conn.execute(
+                    'SELECT id, item, attempts FROM spool_items '
+                    'WHERE name = ? AND due <= ? ORDER BY due, id LIMIT ?',
+                    (self.name, now, limit)
+                ).fetchall()
+
+                conn.executemany(
+                    'UPDATE spool_items SET due = ? WHERE id = ?',
+                    [(now + lease_sec, row[0]) for row in rows]
+                )
+
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+        return rows
+
+    def delete(self, item_id):
+        self._write('DELETE FROM spool_items WHERE id = ?', item_id)
+
+    def defer(self, item_id, delay, item=None):
+        """Make the item due again after the delay, updated if provided."""
+        if item is None:
+            self._write(
+                'UPDATE spool_items SET attempts = attempts + 1, due = ? '
+                'WHERE id = ?', self._clock() + delay, item_id
+            )
+        else:
+            self._write(
+                'UPDATE spool_items SET attempts = attempts + 1, due = ?, '
+                'item = ? WHERE id = ?',
+                self._clock() + delay, _dumps(item), item_id
+            )
+
+
+class Sender(object):
+    """Send the items of the spool in the background.
+
+    The send function takes the item and returns None once it is sent. It
+    returns the item updated with the progress made (i.e. the outcome to
+    report) or raises an error to be called again with the item later. An
+    item which is not sent after max_attempts is dropped, never if zero.
+    """
+
+    def __init__(self, spool, send, num_senders=4, lease_sec=300,
+                 max_attempts=0):
+        self.spool = spool
+        self.send = send
+        self.num_senders = num_senders
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stopped = None
+
+    def start(self):
+        """Start the senders once per process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._stopped = threading.Event()
+
+            for i in range(self.num_senders):
+                green.spawn(self._run, self._stopped)
+
+            self._pid = os.getpid()
+
+    def stop(self):
+        """Stop the senders once done with the items they are sending."""
+        with self._lock:
+            if self._stopped is not None:
+                self._stopped.set()
+
+            self._pid = None
+
+        self._wake.set()
+
+    def wake(self):
+        """Wake the senders up to send the items appended."""
+        self._wake.set()
+
+    def _run(self, stopped):
+        while not stopped.is_set():
+            try:
+                sent = self.send_due()
+            except Exception as e:
+                LOG.warning(
+                    '[stackstorm] Unable to send the items of the spool %s '
+                    'at %s. %s', self.spool.name, self.spool.path, e
+                )
+                sent = 0
+
+            if not sent:
+                self._wake.wait(POLL_INTERVAL_SEC)
+                self._wake.clear()
+
+    def send_due(self, limit=1):
+        """Send the items which are due.
+
+        :rtype: ``int`` number of items leased
+        """
+        leased = self.spool.lease(limit, self.lease_sec)
+
+        for item_id, item, attempts in leased:
+            try:
+                updated = self.send(item)
+            except Exception as e:
+                if self._drop(item_id, attempts, e):
+                    continue
+
+                delay = min(BACKOFF_MAX_SEC, BACKOFF_SEC * 2 ** attempts)
+
+                LOG.warning(
+                    '[stackstorm] Unable to send item %s of the spool %s. '
+                    'Retrying in %.2f seconds... %s',
+                    item_id, self.spool.name, delay, e
+                )
+
+                metrics.incr(
+                    'spool_sent_total', spool=self.spool.name,
+                    outcome='error'
+                )
+
+                self.spool.defer(item_id, delay)
+                continue
+
+            if updated is not None:
+                if self._drop(item_id, attempts, updated):
+                    continue
+
+                delay = min(BACKOFF_MAX_SEC, BACKOFF_SEC * 2 ** attempts)
+
+                metrics.incr(
+                    'spool_sent_total', spool=self.spool.name,
+                    outcome='deferred'
+                )
+
+                self.spool.defer(item_id, delay, item=updated)
+                continue
+
+            metrics.incr(
+                'spool_sent_total', spool=self.spool.name, outcome='sent'
+            )
+
+            self.spool.delete(item_id)
+
+        return len(leased)
+
+    def _drop(self, item_id, attempts, outcome):
+        """Drop the item if it is not sent after the max attempts.
+
+        :rtype: ``bool`` True if dropped
+        """
+        if not self.max_attempts or attempts + 1 < self.max_attempts:
+            return False
+
+        LOG.error(
+            '[stackstorm] Dropping item %s of the spool %s not sent after %s '
+            'attempts. %s', item_id, self.spool.name, attempts + 1, outcome
+        )
+
+        metrics.incr(
+            'spool_sent_total', spool=self.spool.name, outcome='dropped'
+        )
+
+        self.spool.delete(item_id)
+
+        return True
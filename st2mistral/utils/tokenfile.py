@@ -0,0 +1,199 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-user auth token cache file of the mistralclient plugin.
+
+The token minted with the st2 auth credentials is kept in a file only
+readable by the user so the next invocations of the mistral CLI reuse
+it until shortly before it expires. The file is locked while a token is
+minted so concurrent invocations mint a single token. This module is
+used by the client process and does not depend on the st2 config.
+"""
+
+import calendar
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import time
+
+import requests
+
+__all__ = [
+    'TokenFile',
+    'get_cache_path',
+    'mint_token'
+]
+
+
+LOG = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = 'ST2_MISTRAL_TOKEN_CACHE_DIR'
+DEFAULT_CACHE_DIR = '~/.st2'
+DEFAULT_EXPIRY_MARGIN_SEC = 60
+
+
+def get_cache_path(auth_url, username):
+    """Return the path of the token cache file of the user.
+
+    The file is specific to the st2 auth endpoint and the username.
+    """
+    cache_dir = os.path.expanduser(
+        os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+    )
+
+    digest = hashlib.sha256(
+        ('%s\n%s' % (auth_url, username)).encode('utf-8')
+    ).hexdigest()
+
+    return os.path.join(cache_dir, 'mistral-token-%s' % digest[:16])
+
+
+def _parse_expiry(value):
+    value = value.rstrip('Z')
+    fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in value else '%Y-%m-%dT%H:%M:%S'
+
+    return calendar.timegm(
+        datetime.datetime.strptime(value, fmt).utctimetuple()
+    )
+
+
+def mint_token(auth_url, username, password, verify=True, timeout=30):
+    """Mint a token with the credentials of the user from st2 auth.
+
+    :rtype: ``tuple`` of (token, expiry timestamp)
+    """
+    resp = requests.post(
+        auth_url.rstrip('/') + '/tokens',
+        json={},
+        auth=(username, password),
+        verify=verify,
+        timeout=timeout
+    )
+
+    resp.raise_for_status()
+    body = resp.json()
+
+    return body['token'], _parse_expiry(body['expiry'])
+
+
+class TokenFile(object):
+    """Token and expiry kept in a file only readable by the user.
+
+    :param path: Path of the cache file.
+    :type path: ``str``
+    :param margin: The token is not reused within this number of seconds
+        before it expires.
+    :type margin: ``int``
+    """
+
+    def __init__(self, path, margin=DEFAULT_EXPIRY_MARGIN_SEC,
+                 clock=time.time):
+        self.path = path
+        self.margin = margin
+        self._clock = clock
+
+    def read(self):
+        """Return the cached token unless it is about to expire."""
+        try:
+            with open(self.path, 'r') as f:
+                info = os.fstat(f.fileno())
+
+                # Ignore a file the user does not own or others can read.
+                if (info.st_uid != os.getuid() or
+                        info.st_mode & (stat.S_IRWXG | stat.S_IRWXO)):
+                    LOG.warning('Ignoring unsafe token cache %s.', self.path)
+                    return None
+
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if not isinstance(data, dict) or not data.get('token'):
+            return None
+
+        if data.get('expiry', 0) - self.margin <= self._clock():
+            return None
+
+        return data['token']
+
+    def write(self, token, expiry):
+        """Replace the cached token atomically."""
+        cache_dir = os.path.dirname(self.path)
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.tmp-')
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'token': token, 'expiry': expiry}, f)
+
+            os.rename(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold the exclusive lock of the cache file."""
+        cache_dir = os.path.dirname(self.path)
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def get_token(self, mint):
+        """Return the cached token or mint and cache a new one.
+
+        :param mint: Function which takes no argument and returns a tuple
+            of token and expiry timestamp.
+        :type mint: ``callable``
+        """
+        token = self.read()
+
+        if token:
+            return token
+
+        with self.lock():
+            # Another invocation may have minted the token meanwhile.
+            token = self.read()
+
+            if token:
+                return token
+
+            token, expiry = mint()
+
+            try:
+                self.write(token, expiry)
+            except (IOError, OSError) as e:
+                LOG.warning('Unable to cache the token in %s. %s',
+                            self.path, e)
+
+            return token
@@ -0,0 +1,130 @@
+# Licensed to the StackStorm, Inc ('StackStorm') under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Transport adapter sending HTTP requests over a Unix domain socket.
+
+The adapter is mounted on the http+unix:// scheme where the host is the
+percent encoded path of the socket (i.e. http+unix://%2Frun%2Fst2api.sock)
+or on the base URL of a st2 API which is mapped to a socket path.
+"""
+
+import socket
+
+from requests import adapters
+from six.moves.urllib import parse as urlparse
+import urllib3
+from urllib3 import connection
+from urllib3 import poolmanager
+
+__all__ = [
+    'SCHEME',
+    'UnixAdapter'
+]
+
+
+SCHEME = 'http+unix'
+
+
+class UnixHTTPConnection(connection.HTTPConnection):
+
+    def __init__(self, *args, **kwargs):
+        self.socket_path = kwargs.pop('socket_path')
+        super(UnixHTTPConnection, self).__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        if isinstance(self.timeout, (int, float)):
+            sock.settimeout(self.timeout)
+
+        try:
+            sock.connect(self.socket_path)
+        except socket.error as e:
+            sock.close()
+            raise urllib3.exceptions.NewConnectionError(
+                self, 'Failed to connect to %s. %s' % (self.socket_path, e)
+            )
+
+        return sock
+
+
+class UnixHTTPConnectionPool(urllib3.HTTPConnectionPool):
+
+    ConnectionCls = UnixHTTPConnection
+
+    socket_path = None
+
+    def __init__(self, host, port=None, **kwargs):
+        # The host of http+unix URLs is the percent encoded socket path.
+        # The host of base URLs mapped to a socket is kept for the Host
+        # header of the requests.
+        socket_path = self.socket_path or urlparse.unquote(host)
+        host = host if self.socket_path else 'localhost'
+
+        super(UnixHTTPConnectionPool, self).__init__(host, **kwargs)
+        self.conn_kw['socket_path'] = socket_path
+
+
+class UnixAdapter(adapters.HTTPAdapter):
+    """Send the requests over the Unix domain socket.
+
+    :param socket_path: Path of the socket. Defaults to the percent encoded
+        host of the http+unix URLs.
+    :type socket_path: ``str``
+    """
+
+    def __init__(self, socket_path=None, **kwargs):
+        self.socket_path = socket_path
+        super(UnixAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False,
+                         **pool_kwargs):
+        super(UnixAdapter, self).init_poolmanager(
+            connections, maxsize, block=block, **pool_kwargs
+        )
+
+        pool_cls = UnixHTTPConnectionPool
+
+        if self.socket_path:
+            pool_cls = type(
+                'UnixHTTPConnectionPool',
+                (UnixHTTPConnectionPool,),
+                {'socket_path': self.socket_path}
+            )
+
+        key_fn = poolmanager.key_fn_by_scheme['http']
+
+        self.poolmanager.pool_classes_by_scheme = dict(
+            (scheme, pool_cls) for scheme in ('http', 'https', SCHEME)
+        )
+
+        self.poolmanager.key_fn_by_scheme = dict(
+            (scheme, key_fn) for scheme in ('http', 'https', SCHEME)
+        )
+
+    def _get_pool(self, url):
+        parts = urllib3.util.parse_url(url)
+
+        # The socket carries plain HTTP whatever the scheme of the URL.
+        return self.poolmanager.connection_from_host(
+            parts.host, port=parts.port, scheme='http'
+        )
+
+    def get_connection(self, url, proxies=None):
+        return self._get_pool(url)
+
+    def get_connection_with_tls_context(self, request, verify,
+                                        proxies=None, cert=None):
+        return self._get_pool(request.url)